@@ -0,0 +1,70 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Empacotamento do Multi Chrome Tester: pyinstaller --noconfirm MultiChromeTester.spec
+#
+# Modo onedir: o programa fica em dist\MultiChromeTester\ (MultiChromeTester.exe e _internal\) e abre
+# direto dos arquivos instalados, em vez de descompactar tudo numa pasta temporária a cada abertura
+# como no modo onefile. Sem UPX, pelo mesmo motivo: cada DLL comprimida precisaria ser descomprimida.
+# Para medir a abertura: dist\MultiChromeTester\MultiChromeTester.exe --profile-startup
+# (sem console, o relatório vai para %TEMP%\multi_chrome_tester_startup.txt).
+import encodings
+import pkgutil
+
+# Módulos que o programa não usa, mas que o PyInstaller incluiria por dependências opcionais
+EXCLUDES = [
+    '_distutils_hack', '_pyrepl', 'curses', 'distutils', 'doctest', 'IPython', 'lib2to3', 'matplotlib',
+    'numpy', 'pdb', 'pkg_resources', 'pydoc', 'pydoc_data', 'setuptools', 'test', 'tkinter.test', 'unittest',
+    'wheel', 'xmlrpc',
+]
+
+# base_library.zip leva todos os codecs da biblioteca padrão (mais de 100 dos ~150 módulos);
+# o programa só precisa dos usados pelo Windows, pelo console e pelo HTTP
+KEEP_ENCODINGS = {
+    'aliases', 'ascii', 'charmap', 'cp1252', 'cp437', 'cp850', 'idna', 'latin_1', 'mbcs', 'oem', 'punycode',
+    'raw_unicode_escape', 'unicode_escape', 'utf_16', 'utf_16_be', 'utf_16_le', 'utf_32', 'utf_8', 'utf_8_sig',
+}
+EXCLUDES += ['encodings.' + module.name for module in pkgutil.iter_modules(encodings.__path__)
+             if module.name not in KEEP_ENCODINGS]
+
+a = Analysis(
+    ['multi_chrome_tester.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    # Importados só no primeiro uso (session_engine.load_webdriver e detect_monitors)
+    hiddenimports=[
+        'selenium.webdriver',
+        'selenium.webdriver.chrome.options',
+        'selenium.webdriver.chrome.remote_connection',
+        'selenium.webdriver.chrome.service',
+        'webdriver_manager.chrome',
+        'screeninfo',
+    ],
+    hookspath=[],
+    runtime_hooks=[],
+    excludes=EXCLUDES,
+    noarchive=False,
+    optimize=1,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='MultiChromeTester',
+    icon='icon.ico',
+    console=False,
+    debug=False,
+    strip=False,
+    upx=False,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    name='MultiChromeTester',
+)
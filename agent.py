@@ -0,0 +1,518 @@
+"""Modo agente e coordenador: várias máquinas abrindo sessões para a mesma execução.
+
+Cada máquina roda um agente, que expõe o SessionManager por uma API HTTP/JSON:
+    GET  /status                   sessões ativas, capacidade e detecções
+    GET  /events?since=N&timeout=S eventos a partir do número N (espera até S segundos por um novo)
+    POST /launch                   {'url', 'sessions', opções do SessionManager.launch}
+    POST /close                    fecha todas as sessões do agente
+    POST /promote                  traz para frente a janela que passou da fila
+
+O coordenador (na interface ou na linha de comando) divide a execução entre os agentes, soma as
+contagens e, assim que um agente detecta a passagem, manda os demais fecharem as suas sessões.
+
+Uso:
+    python agent.py serve --port 8765                     # agente (só localhost)
+    python agent.py serve --host 0.0.0.0 --token SEGREDO  # agente acessível na rede
+Fora do localhost o agente sempre exige token; sem --token ele gera um e o mostra ao iniciar.
+    python agent.py run 127.0.0.1:8765 127.0.0.1:8766 --url fila.com -n 40
+"""
+import argparse
+import collections
+import hmac
+import http.server
+import ipaddress
+import json
+import secrets
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from session_engine import DEFAULT_PROFILE, LAUNCH_PROFILES, SessionManager, maximize_window_on_primary
+
+try:
+    import psutil  # Opcional: estimar a capacidade do agente pela memória livre
+except ImportError:
+    psutil = None
+
+DEFAULT_PORT = 8765
+SESSION_MEMORY_MB = 300  # Memória estimada por sessão para calcular a capacidade do agente
+
+# Opções de SessionManager.launch aceitas pela API
+LAUNCH_OPTIONS = ('auto_close', 'incognito', 'auto_arrange', 'headless', 'profile', 'use_template',
+                  'event_detection', 'rules', 'governor', 'supervisor', 'fire_at', 'snapshot')
+
+def is_loopback(host):
+    """Se o endereço de escuta só aceita conexões desta máquina"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # Nome de máquina ou '' (todas as interfaces)
+
+class AgentServer:
+    """Expõe um SessionManager por HTTP para o coordenador"""
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, token=None, max_sessions=0, manager=None, name=None,
+                 verbose=False):
+        # Acessível pela rede sem token, qualquer um abriria o Chrome desta máquina em qualquer URL
+        self.generated_token = not token and not is_loopback(host)
+        if self.generated_token:
+            token = secrets.token_urlsafe(16)
+        self.token = token
+        self.verbose = verbose
+        self.max_sessions = max_sessions
+        self.name = name or socket.gethostname()
+        self.manager = manager or SessionManager()
+        self.manager.listener = self._on_event
+        self.last_status = "Pronto para iniciar"
+        self.launching = False
+        self._launch_lock = threading.Lock()  # Duas chamadas a /launch ao mesmo tempo iniciariam duas execuções
+        self.detections = []  # URLs que passaram da fila na execução atual
+        self._events = collections.deque(maxlen=1000)  # (número, evento, dados)
+        self._seq = 0
+        self._changed = threading.Condition()
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._dispatch(self, 'GET')
+
+            def do_POST(self):
+                server._dispatch(self, 'POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def start(self):
+        """Atende em segundo plano; útil para rodar vários agentes no mesmo processo"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        return self.manager.shutdown()
+
+    def capacity(self):
+        """Quantas sessões este agente aguenta: o limite configurado ou uma estimativa pela memória livre"""
+        if self.max_sessions:
+            return self.max_sessions
+        if psutil is not None:
+            return max(1, int(psutil.virtual_memory().available / (1024 * 1024) // SESSION_MEMORY_MB))
+        return 0  # Desconhecida
+
+    def status(self):
+        return {
+            'name': self.name,
+            'sessions': len(self.manager.drivers),
+            'launching': self.launching,
+            'capacity': self.capacity(),
+            'detections': list(self.detections),
+            'groups': self.manager.groups,
+            'memory': self.manager.memory_summary,
+            'status': self.last_status,
+            'seq': self._seq,
+        }
+
+    def _on_event(self, event, data):
+        if event == 'status':
+            self.last_status = data['message']
+            if self.verbose:
+                print(f"[{time.strftime('%H:%M:%S')}] {data['message']}", flush=True)
+            return
+
+        if event == 'url_changed':
+            detection = {'url': data['url'], 'group': data['group'], 'rule': data['rule']}
+            self.detections.append(detection)
+            self._publish(event, detection)
+        elif event == 'launched':
+            self._publish(event, {'count': data['count']})
+        elif event == 'closed':
+            self._publish(event, {'clean': data['clean'], 'killed': data['killed']})
+
+    def _publish(self, event, data):
+        with self._changed:
+            self._seq += 1
+            self._events.append((self._seq, event, data))
+            self._changed.notify_all()
+
+    def events(self, since, timeout):
+        """Eventos com número maior que `since`, esperando até `timeout` segundos se não houver nenhum"""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while self._seq <= since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            events = [{'seq': seq, 'event': event, 'data': data}
+                      for seq, event, data in self._events if seq > since]
+            return {'seq': self._seq, 'events': events}
+
+    def launch(self, request):
+        url = request.get('url')
+        sessions = int(request.get('sessions') or 0)
+        if not url or sessions <= 0:
+            raise ValueError("Informe 'url' e 'sessions'")
+        options = {key: request[key] for key in LAUNCH_OPTIONS if key in request}
+        if options.get('profile', DEFAULT_PROFILE) not in LAUNCH_PROFILES:
+            raise ValueError(f"Perfil desconhecido: {options['profile']}")
+
+        with self._launch_lock:
+            if self.launching:
+                raise ValueError("O agente ainda está abrindo as sessões da execução anterior")
+            self.launching = True
+            self.detections = []
+
+        def run():
+            try:
+                self.manager.launch(url, sessions, **options)
+            except Exception as e:
+                print(f"Erro ao abrir sessões: {e}")
+            finally:
+                self.launching = False
+
+        threading.Thread(target=run, daemon=True).start()
+        return {'accepted': True, 'sessions': sessions}
+
+    def promote(self):
+        """Traz para frente as janelas que passaram da fila"""
+        promoted = 0
+        for driver in list(self.manager.drivers):
+            if driver in self.manager.detected:
+                try:
+                    maximize_window_on_primary(driver)
+                    promoted += 1
+                except Exception as e:
+                    print(f"Erro ao maximizar janela: {e}")
+        return {'promoted': promoted}
+
+    def _dispatch(self, handler, method):
+        parsed = urllib.parse.urlsplit(handler.path)
+        query = urllib.parse.parse_qs(parsed.query)
+
+        if self.token and not hmac.compare_digest(handler.headers.get('X-Agent-Token', '').encode('utf-8'),
+                                                  self.token.encode('utf-8')):
+            self._respond(handler, 403, {'error': "Token inválido"})
+            return
+
+        try:
+            body = {}
+            if method == 'POST':
+                length = int(handler.headers.get('Content-Length') or 0)
+                body = json.loads(handler.rfile.read(length) or b'{}') if length else {}
+
+            route = (method, parsed.path)
+            if route == ('GET', '/status'):
+                result = self.status()
+            elif route == ('GET', '/events'):
+                since = int(query.get('since', ['0'])[0])
+                timeout = min(float(query.get('timeout', ['20'])[0]), 60)
+                result = self.events(since, timeout)
+            elif route == ('POST', '/launch'):
+                result = self.launch(body)
+            elif route == ('POST', '/close'):
+                # Fechar em segundo plano; o coordenador não precisa esperar os processos do Chrome
+                threading.Thread(target=self.manager.close, daemon=True).start()
+                result = {'closing': len(self.manager.drivers)}
+            elif route == ('POST', '/promote'):
+                result = self.promote()
+            else:
+                self._respond(handler, 404, {'error': f"Rota desconhecida: {method} {parsed.path}"})
+                return
+        except (ValueError, TypeError) as e:
+            self._respond(handler, 400, {'error': str(e)})
+            return
+        except Exception as e:
+            self._respond(handler, 500, {'error': str(e)})
+            return
+
+        self._respond(handler, 200, result)
+
+    @staticmethod
+    def _respond(handler, code, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        try:
+            handler.send_response(code)
+            handler.send_header('Content-Type', 'application/json; charset=utf-8')
+            handler.send_header('Content-Length', str(len(data)))
+            handler.end_headers()
+            handler.wfile.write(data)
+        except OSError:
+            pass  # O coordenador desistiu da requisição
+
+class AgentClient:
+    """Acesso à API de um agente"""
+
+    def __init__(self, address, token=None, timeout=5):
+        if '://' not in address:
+            address = 'http://' + address
+        if urllib.parse.urlsplit(address).port is None:
+            address = f"{address.rstrip('/')}:{DEFAULT_PORT}"
+        self.address = address.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+
+    def __repr__(self):
+        return self.address.split('://', 1)[-1]
+
+    def request(self, method, path, payload=None, timeout=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(self.address + path, data=data, method=method)
+        request.add_header('Content-Type', 'application/json')
+        if self.token:
+            request.add_header('X-Agent-Token', self.token)
+        try:
+            with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get('error')
+            except Exception:
+                message = None
+            raise RuntimeError(f"{self}: {message or e}")
+
+    def status(self):
+        return self.request('GET', '/status')
+
+    def events(self, since, timeout=20):
+        return self.request('GET', f"/events?since={since}&timeout={timeout}", timeout=timeout + 5)
+
+    def launch(self, url, sessions, **options):
+        return self.request('POST', '/launch', dict(options, url=url, sessions=sessions))
+
+    def close(self):
+        return self.request('POST', '/close', {})
+
+    def promote(self):
+        return self.request('POST', '/promote', {})
+
+def split_sessions(num_sessions, capacities):
+    """Divide as sessões entre os agentes proporcionalmente à capacidade (método do maior resto)"""
+    if not capacities:
+        return []
+    # Com alguma capacidade desconhecida, dividir igualmente
+    weights = capacities if all(c > 0 for c in capacities) else [1] * len(capacities)
+    total = sum(weights)
+    shares = [num_sessions * w / total for w in weights]
+    counts = [int(share) for share in shares]
+    leftover = num_sessions - sum(counts)
+    for i in sorted(range(len(shares)), key=lambda i: int(shares[i]) - shares[i])[:leftover]:
+        counts[i] += 1
+    return counts
+
+class Coordinator:
+    """Divide uma execução entre vários agentes e fecha os demais quando um deles passa da fila
+
+    O `listener` recebe os mesmos eventos de status do SessionManager, mais:
+      - 'agent_detected': {'agent', 'url', 'group', 'rule'} — um agente passou da fila
+      - 'agents': {'agents'} — situação de cada agente (ver AgentServer.status)
+    """
+
+    def __init__(self, addresses, listener=None, token=None):
+        self.agents = [AgentClient(address, token) for address in addresses]
+        self.listener = listener
+        self.auto_close = True
+        self.winners = set()  # Agentes que passaram da fila na execução atual
+        self.lock = threading.Lock()
+        self._run = 0  # Threads de execuções anteriores se encerram sozinhas
+
+    def emit(self, event, **data):
+        if self.listener is not None:
+            try:
+                self.listener(event, data)
+            except Exception as e:
+                print(f"Erro ao tratar evento {event}: {e}")
+
+    def status(self, message):
+        self.emit('status', message=message)
+
+    def _each(self, action):
+        """Executa `action(agente)` em todos os agentes em paralelo; retorna {agente: resultado ou exceção}"""
+        results = {}
+
+        def call(agent):
+            try:
+                results[agent] = action(agent)
+            except Exception as e:
+                results[agent] = e
+
+        threads = [threading.Thread(target=call, args=(agent,), daemon=True) for agent in self.agents]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def launch(self, url, num_sessions, auto_close=True, **options):
+        """Divide as sessões entre os agentes disponíveis e inicia o acompanhamento. Retorna quantas pediu"""
+        self._run += 1
+        run = self._run
+        self.auto_close = auto_close
+        self.winners = set()
+
+        statuses = self._each(lambda agent: agent.status())
+        available = [agent for agent in self.agents if not isinstance(statuses[agent], Exception)]
+        for agent in self.agents:
+            if agent not in available:
+                print(f"Agente {agent} indisponível: {statuses[agent]}")
+        if not available:
+            self.status("Erro: nenhum agente disponível")
+            return 0
+
+        counts = split_sessions(num_sessions, [statuses[agent]['capacity'] for agent in available])
+        self.status(f"Iniciando {num_sessions} sessões em {len(available)} agentes...")
+
+        requested = 0
+        for agent, count in zip(available, counts):
+            if run != self._run:
+                return requested  # close() cancelou a execução enquanto os agentes eram iniciados
+            if count <= 0:
+                continue
+            try:
+                agent.launch(url, count, auto_close=auto_close, **options)
+                requested += count
+            except Exception as e:
+                print(f"Erro ao iniciar sessões no agente {agent}: {e}")
+                continue
+            # Acompanhar os eventos a partir do último já publicado, para não reagir a execuções anteriores
+            threading.Thread(target=self._follow, args=(agent, statuses[agent]['seq'], run), daemon=True).start()
+
+        threading.Thread(target=self._watch_status, args=(run,), daemon=True).start()
+        return requested
+
+    def _follow(self, agent, since, run):
+        """Acompanha os eventos de um agente por long polling"""
+        failures = 0
+        while run == self._run:
+            try:
+                response = agent.events(since)
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if failures == 3:
+                    print(f"Agente {agent} sem resposta: {e}")
+                time.sleep(min(5, failures))
+                continue
+
+            if run != self._run:
+                return
+            since = response['seq']
+            for item in response['events']:
+                if item['event'] == 'url_changed':
+                    self._on_detected(agent, item['data'])
+
+    def _on_detected(self, agent, detection):
+        with self.lock:
+            first = not self.winners
+            self.winners.add(agent)
+            # Agentes que também já passaram mantêm as suas janelas
+            losers = [a for a in self.agents if a not in self.winners]
+
+        self.status(f"Agente {agent} passou da fila: {detection['url']}")
+        self.emit('agent_detected', agent=str(agent), **detection)
+
+        if first and self.auto_close:
+            for other in losers:
+                threading.Thread(target=self._close_agent, args=(other,), daemon=True).start()
+        try:
+            agent.promote()
+        except Exception as e:
+            print(f"Erro ao promover a janela no agente {agent}: {e}")
+
+    @staticmethod
+    def _close_agent(agent):
+        try:
+            agent.close()
+        except Exception as e:
+            print(f"Erro ao fechar as sessões do agente {agent}: {e}")
+
+    def _watch_status(self, run):
+        """Soma as sessões de todos os agentes para a barra de status"""
+        while run == self._run:
+            statuses = self._each(lambda agent: agent.status())
+            if run != self._run:
+                return
+
+            online = {str(agent): s for agent, s in statuses.items() if not isinstance(s, Exception)}
+            total = sum(s['sessions'] for s in online.values())
+            parts = [f"{name}: {s['sessions']}" for name, s in online.items()]
+            status = f"{total} sessões ativas em {len(online)}/{len(self.agents)} agentes"
+            if parts:
+                status += f" ({', '.join(parts)})"
+            if self.winners:
+                status += f" · passou: {', '.join(str(a) for a in self.winners)}"
+            self.status(status)
+            self.emit('agents', agents=online)
+            time.sleep(1)
+
+    def close(self):
+        """Fecha as sessões de todos os agentes e encerra o acompanhamento"""
+        self._run += 1
+        self._each(lambda agent: agent.close())
+        self.status("Todas as sessões foram fechadas")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agente e coordenador do Multi Chrome Tester")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="rodar um agente nesta máquina")
+    serve.add_argument('--host', default='127.0.0.1', help="endereço de escuta (0.0.0.0 para aceitar da rede)")
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve.add_argument('--token', help="exigir este token no cabeçalho X-Agent-Token "
+                                       "(obrigatório fora do localhost; sem ele um token é gerado)")
+    serve.add_argument('--max-sessions', type=int, default=0, help="capacidade informada ao coordenador")
+    serve.add_argument('--name', help="nome do agente (padrão: nome da máquina)")
+
+    run = commands.add_parser('run', help="coordenar uma execução entre agentes")
+    run.add_argument('agents', nargs='+', metavar='HOST:PORTA')
+    run.add_argument('--url', required=True, help="URL ou especificação de URLs (ver session_engine)")
+    run.add_argument('-n', '--sessions', type=int, required=True, help="total de sessões")
+    run.add_argument('--token')
+    run.add_argument('--headless', action='store_true')
+    run.add_argument('--profile', choices=list(LAUNCH_PROFILES), default=DEFAULT_PROFILE)
+    run.add_argument('--rule', action='append', metavar='REGRA', help="regra de detecção (pode repetir)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        agent = AgentServer(args.host, args.port, args.token, args.max_sessions, name=args.name, verbose=True)
+        print(f"Agente {agent.name} escutando em {args.host}:{agent.port}")
+        if agent.generated_token:
+            print(f"Token gerado (informe-o no coordenador, ou escolha um com --token): {agent.token}")
+        try:
+            agent.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            clean, killed = agent.shutdown()
+            print(f"Sessões fechadas: {clean} normalmente, {killed} à força")
+        return
+
+    def listener(event, data):
+        if event == 'status':
+            print(f"[{time.strftime('%H:%M:%S')}] {data['message']}", flush=True)
+
+    coordinator = Coordinator(args.agents, listener=listener, token=args.token)
+    try:
+        if coordinator.launch(args.url, args.sessions, headless=args.headless, profile=args.profile,
+                              rules='\n'.join(args.rule or [])):
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        coordinator.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""Benchmark dos caminhos de abertura, monitoramento e fechamento de sessões.
+
+Mede, para cada quantidade de sessões:
+  - tempo até todas as sessões estarem prontas (SessionManager.launch)
+  - latência de detecção do redirecionamento (SessionManager.watch)
+  - tempo de fechamento (SessionManager.close)
+  - pico de memória (RSS) do processo e dos seus filhos
+
+Com --scheduled, mede o disparo agendado contra o servidor local com o relógio adiantado em --skew
+segundos: erro da medição do relógio e dispersão dos driver.get entre as sessões.
+
+Uso:
+    python benchmark.py                                # WebDriver falso, N = 1, 5, 10, 20, 30, 40, 50
+    python benchmark.py --sessions 1 5 10 --output resultado.json
+    python benchmark.py --chrome --sessions 1 5        # Chrome headless real contra o servidor local
+    python benchmark.py --compare antigo.json novo.json
+    python benchmark.py --scheduled --skew 3.7 --sessions 5 20
+"""
+import argparse
+import datetime
+import http.server
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+import session_engine
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_SESSIONS = [1, 5, 10, 20, 30, 40, 50]
+
+# Página de fila: consulta o servidor a cada 100 ms e redireciona para outro domínio quando liberada
+QUEUE_PAGE = """<!doctype html>
+<html><head><title>Fila</title></head>
+<body><h1>Você está na fila</h1>
+<script>
+setInterval(function () {
+  fetch('/status').then(function (r) { return r.text(); }).then(function (t) {
+    if (t === 'go') { location.href = 'http://localhost:%(port)d/checkout'; }
+  });
+}, 100);
+</script></body></html>
+"""
+
+class QueueServer:
+    """Servidor HTTP local que simula uma página de fila e libera uma única sessão
+
+    `skew` adianta (ou atrasa) o relógio do servidor no cabeçalho Date, em segundos.
+    """
+
+    def __init__(self, skew=0.0):
+        self.skew = skew
+        self.released_at = None
+        self.arrivals = []  # time.time() de cada abertura da página de fila
+        self._winner_taken = False
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def date_time_string(self, timestamp=None):
+                return super().date_time_string(time.time() + server.skew if timestamp is None else timestamp)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_GET(self):
+                path = urllib.parse.urlparse(self.path).path
+                if path == '/queue':
+                    with server._lock:
+                        server.arrivals.append(time.time())
+                if path == '/status':
+                    body = server._status()
+                elif path == '/checkout':
+                    body = "<html><body><h1>Checkout</h1></body></html>"
+                else:
+                    body = QUEUE_PAGE % {'port': server.port}
+
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def queue_url(self):
+        return f"http://127.0.0.1:{self.port}/queue"
+
+    def reset(self):
+        with self._lock:
+            self.released_at = None
+            self.arrivals = []
+            self._winner_taken = False
+
+    def release(self):
+        """Libera a próxima sessão que consultar o status"""
+        with self._lock:
+            self.released_at = time.perf_counter()
+
+    def _status(self):
+        with self._lock:
+            if self.released_at is not None and not self._winner_taken:
+                self._winner_taken = True
+                return 'go'
+        return 'wait'
+
+    def shutdown(self):
+        self.httpd.shutdown()
+
+class FakeWebDriver:
+    """WebDriver falso com latências configuráveis, com a mesma assinatura de create_driver"""
+
+    latencies = {'startup': 0.8, 'get': 0.15, 'poll': 0.005, 'quit': 0.2}
+    jitter = 0.2
+
+    def __init__(self, position, incognito, service=None, headless=False, profile=None, user_data_dir=None):
+        self._sleep('startup')
+        self._url = 'about:blank'
+        self.redirect_to = None
+        self.capabilities = {}  # Sem debuggerAddress: o monitor usa polling
+        self.service = None
+
+    def _sleep(self, name):
+        latency = self.latencies[name]
+        time.sleep(latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def get(self, url):
+        self._sleep('get')
+        self._url = url
+
+    @property
+    def current_url(self):
+        self._sleep('poll')
+        return self.redirect_to or self._url
+
+    def execute_cdp_cmd(self, cmd, params):
+        return {}
+
+    def execute_script(self, script, *args):
+        return None
+
+    def set_window_position(self, x, y):
+        pass
+
+    def set_window_size(self, width, height):
+        pass
+
+    def maximize_window(self):
+        pass
+
+    def quit(self):
+        self._sleep('quit')
+
+class BenchmarkManager(session_engine.SessionManager):
+    """SessionManager que só registra o momento da detecção"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.detection_event = threading.Event()
+        self.detections = []
+
+    def handle_url_change(self, driver, url, rule=None):
+        # Maximizar e fechar janelas não fazem parte da medição
+        self.detections.append(time.perf_counter())
+        self.detection_event.set()
+
+class RssSampler:
+    """Amostra o RSS do processo atual e dos filhos (chromedriver e Chrome) em segundo plano"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        if psutil is not None:
+            self.peak_mb = 0
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        return self.peak_mb
+
+    def _run(self):
+        process = psutil.Process()
+        while not self._stop.is_set():
+            total = process.memory_info().rss
+            for child in process.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.peak_mb = max(self.peak_mb, total / (1024 * 1024))
+            self._stop.wait(self.interval)
+
+def run_once(manager, num_sessions, server, use_chrome, detection_timeout):
+    """Executa abertura, detecção e fechamento para uma quantidade de sessões"""
+    server.reset()
+    manager.detection_event.clear()
+    manager.detections.clear()
+
+    sampler = RssSampler()
+    sampler.start()
+
+    started = time.perf_counter()
+    manager.launch(server.queue_url, num_sessions, auto_close=False, incognito=False,
+                   auto_arrange=False, headless=use_chrome, profile='lean',
+                   event_detection=use_chrome, watch=False)
+    ready_s = time.perf_counter() - started
+    opened = len(manager.drivers)
+
+    threading.Thread(target=manager.watch, daemon=True).start()
+
+    time.sleep(0.5)  # Deixar o monitor entrar em regime
+
+    if use_chrome:
+        server.release()
+        released = server.released_at
+    elif manager.drivers:
+        random.choice(manager.drivers).redirect_to = f"http://localhost:{server.port}/checkout"
+        released = time.perf_counter()
+    else:
+        released = None
+
+    detection_ms = None
+    if released is not None and manager.detection_event.wait(detection_timeout):
+        detection_ms = (manager.detections[0] - released) * 1000
+
+    started = time.perf_counter()
+    manager.close()
+    teardown_s = time.perf_counter() - started
+
+    return {
+        'sessions': num_sessions,
+        'opened': opened,
+        'time_to_ready_s': round(ready_s, 3),
+        'detection_latency_ms': round(detection_ms, 1) if detection_ms is not None else None,
+        'teardown_s': round(teardown_s, 3),
+        'peak_rss_mb': round(sampler.stop(), 1) if psutil is not None else None,
+    }
+
+def run_scheduled(manager, num_sessions, server, use_chrome, lead):
+    """Disparo agendado para daqui a `lead` segundos do servidor: erro do relógio e dispersão dos get"""
+    server.reset()
+    events = {}
+    manager.listener = lambda event, data: events.update({event: data}) if event in ('scheduled', 'fired') else None
+
+    fire_at = time.time() + server.skew + lead
+    manager.launch(server.queue_url, num_sessions, auto_close=False, incognito=False,
+                   auto_arrange=False, headless=use_chrome, profile='lean',
+                   event_detection=use_chrome, watch=False, fire_at=fire_at)
+    opened = len(manager.drivers)
+    scheduled = events.get('scheduled', {})
+    fired = events.get('fired', {})
+    delays = [row['fire_ms'] for row in manager.metrics.rows() if row['fire_ms'] is not None]
+    manager.close()
+
+    offset = scheduled.get('offset')
+    uncertainty = scheduled.get('uncertainty')
+    # Com o Chrome real, a chegada das requisições no servidor mostra o disparo visto do outro lado
+    arrivals = [t + server.skew for t in server.arrivals if t + server.skew >= fire_at - 1]
+    return {
+        'sessions': num_sessions,
+        'opened': opened,
+        'clock_error_ms': round((offset - server.skew) * 1000, 1) if offset is not None else None,
+        'clock_uncertainty_ms': round(uncertainty * 1000, 1) if uncertainty is not None else None,
+        'fire_delay_ms': round(min(delays), 1) if delays else None,
+        'spread_ms': round(fired['spread_ms'], 1) if fired else None,
+        'server_spread_ms': round((max(arrivals) - min(arrivals)) * 1000, 1) if use_chrome and arrivals else None,
+        'server_delay_ms': round((min(arrivals) - fire_at) * 1000, 1) if use_chrome and arrivals else None,
+    }
+
+def print_scheduled(results):
+    print(f"{'N':>4} {'abertas':>8} {'erro relógio (ms)':>18} {'incerteza (ms)':>15} {'atraso (ms)':>12} "
+          f"{'dispersão (ms)':>15} {'no servidor (ms)':>17}")
+    for r in results:
+        cells = [r['clock_error_ms'], r['clock_uncertainty_ms'], r['fire_delay_ms'], r['spread_ms'],
+                 r['server_spread_ms']]
+        cells = ['-' if value is None else f"{value:.1f}" for value in cells]
+        print(f"{r['sessions']:>4} {r['opened']:>8} {cells[0]:>18} {cells[1]:>15} {cells[2]:>12} "
+              f"{cells[3]:>15} {cells[4]:>17}")
+
+def get_version():
+    """Commit atual do repositório, para identificar os resultados"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def print_results(results):
+    print(f"{'N':>4} {'abertas':>8} {'prontas (s)':>12} {'detecção (ms)':>14} {'fechamento (s)':>15} {'pico RSS (MB)':>14}")
+    for r in results:
+        detection = '-' if r['detection_latency_ms'] is None else f"{r['detection_latency_ms']:.1f}"
+        rss = '-' if r['peak_rss_mb'] is None else f"{r['peak_rss_mb']:.1f}"
+        print(f"{r['sessions']:>4} {r['opened']:>8} {r['time_to_ready_s']:>12.3f} {detection:>14} "
+              f"{r['teardown_s']:>15.3f} {rss:>14}")
+
+def compare(old_file, new_file):
+    """Mostra a variação de cada métrica entre dois arquivos de resultados"""
+    with open(old_file, 'r', encoding='utf-8') as f:
+        old = {r['sessions']: r for r in json.load(f)['results']}
+    with open(new_file, 'r', encoding='utf-8') as f:
+        new = {r['sessions']: r for r in json.load(f)['results']}
+
+    metrics = ['time_to_ready_s', 'detection_latency_ms', 'teardown_s', 'peak_rss_mb']
+    print(f"{'N':>4} " + ' '.join(f"{m:>24}" for m in metrics))
+    for n in sorted(set(old) & set(new)):
+        cells = []
+        for metric in metrics:
+            a, b = old[n].get(metric), new[n].get(metric)
+            if a is None or b is None:
+                cells.append(f"{'-':>24}")
+            else:
+                delta = (b - a) / a * 100 if a else 0
+                cells.append(f"{f'{a:g} -> {b:g} ({delta:+.0f}%)':>24}")
+        print(f"{n:>4} " + ' '.join(cells))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do Multi Chrome Tester")
+    parser.add_argument('--sessions', type=int, nargs='+', default=DEFAULT_SESSIONS,
+                        help="quantidades de sessões a medir")
+    parser.add_argument('--chrome', action='store_true',
+                        help="usar Chrome headless real em vez do WebDriver falso")
+    parser.add_argument('--output', default='benchmark_results.json', help="arquivo JSON de saída")
+    parser.add_argument('--startup-ms', type=float, default=800, help="latência de abertura do driver falso")
+    parser.add_argument('--get-ms', type=float, default=150, help="latência de driver.get do driver falso")
+    parser.add_argument('--poll-ms', type=float, default=5, help="latência de current_url do driver falso")
+    parser.add_argument('--quit-ms', type=float, default=200, help="latência de quit do driver falso")
+    parser.add_argument('--detection-timeout', type=float, default=30, help="espera máxima pela detecção (s)")
+    parser.add_argument('--scheduled', action='store_true', help="medir o disparo agendado")
+    parser.add_argument('--skew', type=float, default=3.7, help="adiantamento do relógio do servidor local (s)")
+    parser.add_argument('--lead', type=float, default=10, help="antecedência do disparo agendado (s)")
+    parser.add_argument('--compare', nargs=2, metavar=('ANTIGO', 'NOVO'), help="comparar dois resultados")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.chrome:
+        manager = BenchmarkManager()
+    else:
+        FakeWebDriver.latencies = {
+            'startup': args.startup_ms / 1000,
+            'get': args.get_ms / 1000,
+            'poll': args.poll_ms / 1000,
+            'quit': args.quit_ms / 1000,
+        }
+        # O driver falso não usa o chromedriver; qualquer arquivo existente serve como caminho
+        manager = BenchmarkManager(driver_factory=FakeWebDriver,
+                                   resolver=session_engine.DriverResolver(None, configured_path=sys.executable))
+
+    server = QueueServer(skew=args.skew if args.scheduled else 0.0)
+    results = []
+    try:
+        for n in args.sessions:
+            print(f"Medindo {n} sessões...")
+            if args.scheduled:
+                results.append(run_scheduled(manager, n, server, args.chrome, args.lead))
+            else:
+                results.append(run_once(manager, n, server, args.chrome, args.detection_timeout))
+    finally:
+        manager.shutdown()
+        server.shutdown()
+
+    if args.scheduled:
+        print_scheduled(results)
+    else:
+        print_results(results)
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'version': get_version(),
+        'mode': ('chrome' if args.chrome else 'fake') + ('-scheduled' if args.scheduled else ''),
+        'latencies_ms': None if args.chrome else {k: v * 1000 for k, v in FakeWebDriver.latencies.items()},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados salvos em {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -65,6 +65,7 @@ def check_and_install():
         ("selenium", "selenium"),
         ("webdriver_manager", "webdriver-manager"),
         ("screeninfo", "screeninfo"),
+        ("psutil", "psutil"),  # Opcional: medição de memória das sessões
         ("tkinter", "")  # tkinter geralmente já vem com Python, não precisa instalar via pip
     ]
 
@@ -1,16 +1,39 @@
+import sys
+
+import startup_profile
+
+# --profile-startup: medir os imports daqui em diante e imprimir o relatório quando a interface carregar
+if '--profile-startup' in sys.argv:
+    startup_profile.install()
+
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import threading
-import math
+import queue
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import concurrent.futures
-import ctypes
-import sys
-from screeninfo import get_monitors
+
+import session_engine
+from agent import Coordinator
+from session_engine import (
+    DEFAULT_PROFILE,
+    DetectionRules,
+    GOVERNOR_DEFAULTS,
+    SUPERVISOR_DEFAULTS,
+    GridBackend,
+    create_driver,
+    LAUNCH_PROFILES,
+    SessionManager,
+    SessionMetrics,
+    assign_urls,
+    calculate_positions,
+    get_display_signature,
+    get_oriented_monitors,
+    get_screen_info,
+    load_webdriver,
+    monitor_topology,
+    parse_fire_time,
+    parse_url_targets,
+)
 
 # Temas de cores
 THEMES = {
@@ -40,341 +63,139 @@ THEMES = {
     }
 }
 
-# Função para detectar monitores com identificação
-def get_screen_info():
-    monitors_info = []
-    taskbar_height = 40  # Altura estimada da taskbar
-
-    # Usar screeninfo para obter informações dos monitores
-    screen_monitors = get_monitors()
-
-    for i, monitor in enumerate(screen_monitors):
-        # Definir o primeiro monitor como primário (ou usar propriedade is_primary se disponível)
-        is_primary = getattr(monitor, 'is_primary', i == 0)
-
-        # Extrair o identificador do monitor
-        # Screeninfo não fornece os nomes DISPLAY1, DISPLAY2, então usamos números sequenciais
-        monitor_id = str(i + 1)
-
-        # Detectar orientação
-        if monitor.width > monitor.height:
-            default_orientation = "Paisagem"
-        else:
-            default_orientation = "Retrato"
-
-        # Adicionar informações do monitor à lista
-        monitors_info.append({
-            'width': monitor.width,
-            'height': monitor.height - taskbar_height if is_primary else monitor.height,
-            'x_offset': monitor.x,
-            'y_offset': monitor.y,
-            'is_primary': is_primary,
-            'id': monitor_id,
-            'default_orientation': default_orientation,
-            'orientation': default_orientation  # Orientação atual (pode ser modificada pelo usuário)
-        })
-
-    # Ordenar para que o monitor principal seja o primeiro
-    monitors_info.sort(key=lambda x: not x['is_primary'])
-
-    return monitors_info
-
-# Variáveis globais
-drivers = []  # Lista de drivers
-driver_urls = {}  # Dicionário para armazenar URLs atuais de cada driver
-stop_monitor = False
+status_var = None  # StringVar da interface
 closing_in_progress = False
 current_theme = 'light'
-monitor_orientations = {}  # Armazenar orientações selecionadas
-
-def open_session(url, position, incognito, service=None):
-    chrome_options = Options()
-    chrome_options.add_argument(f"--window-size={position[0]},{position[1]}")
-    chrome_options.add_argument(f"--window-position={position[2]},{position[3]}")
-    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
-
-    if incognito:
-        chrome_options.add_argument('--incognito')
-
-    try:
-        if service:
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-        else:
-            driver = webdriver.Chrome(options=chrome_options)
-
-        driver.get(url)
-        return driver
-    except Exception as e:
-        print(f"Erro ao abrir sessão: {e}")
-        return None
-
-def maximize_window_on_primary(driver):
-    """Maximiza a janela no monitor principal"""
-    monitors = get_screen_info()
-    primary = monitors[0]
-
-    # Primeiro mover para o monitor principal
-    driver.set_window_position(primary['x_offset'], primary['y_offset'])
-
-    # Pequena pausa para permitir que a janela seja movida
-    time.sleep(0.1)
-
-    # Depois maximizar
-    driver.maximize_window()
-
-    # Trazer para frente
-    driver.execute_script("window.focus();")
-
-def calculate_positions(num_sessions, auto_arrange):
-    if not auto_arrange:
-        return [(800, 600, 0, 0)] * num_sessions
-
-    # Detectar monitores e aplicar orientações selecionadas pelo usuário
-    monitors = get_screen_info()
-
-    # Aplicar orientações selecionadas pelo usuário
-    for i, monitor in enumerate(monitors):
-        monitor_id = monitor['id']
-        if monitor_id in monitor_orientations:
-            monitors[i]['orientation'] = monitor_orientations[monitor_id]
-
-            # Ajustar dimensões se a orientação for diferente da padrão
-            if monitor['orientation'] != monitor['default_orientation']:
-                monitors[i]['width'], monitors[i]['height'] = monitors[i]['height'], monitors[i]['width']
-
-    monitor_principal = monitors[0]
-    monitor_secundario = monitors[1] if len(monitors) > 1 else None
-
-    positions = []
-
-    # Distribuir no monitor principal ou em ambos os monitores
-    if num_sessions <= 9 or not monitor_secundario:
-        # Usar apenas o monitor principal
-        cols = rows = math.ceil(math.sqrt(num_sessions))
-        margin = 5
-
-        width = (monitor_principal['width'] - (cols+1)*margin) // cols
-        height = (monitor_principal['height'] - (rows+1)*margin) // rows
-
-        for i in range(num_sessions):
-            row = i // cols
-            col = i % cols
-            x = monitor_principal['x_offset'] + margin + col * (width + margin)
-            y = monitor_principal['y_offset'] + margin + row * (height + margin)
-            positions.append((width, height, x, y))
-    else:
-        # Primeiras 9 sessões no monitor principal
-        cols = rows = 3
-        margin = 5
-
-        width = (monitor_principal['width'] - (cols+1)*margin) // cols
-        height = (monitor_principal['height'] - (rows+1)*margin) // rows
-
-        for i in range(9):
-            row = i // cols
-            col = i % cols
-            x = monitor_principal['x_offset'] + margin + col * (width + margin)
-            y = monitor_principal['y_offset'] + margin + row * (height + margin)
-            positions.append((width, height, x, y))
-
-        # Restante no monitor secundário
-        remaining = num_sessions - 9
-
-        # Ajustar a grade com base na orientação do monitor secundário
-        if monitor_secundario['orientation'] == "Retrato":
-            rows_s = max(2, math.ceil(math.sqrt(remaining) * 2))
-            cols_s = math.ceil(remaining / rows_s)
-        else:
-            rows_s = math.ceil(math.sqrt(remaining))
-            cols_s = math.ceil(remaining / rows_s)
-
-        width = (monitor_secundario['width'] - (cols_s+1)*margin) // cols_s
-        height = (monitor_secundario['height'] - (rows_s+1)*margin) // rows_s
-
-        for i in range(remaining):
-            row = i // cols_s
-            col = i % cols_s
-            x = monitor_secundario['x_offset'] + margin + col * (width + margin)
-            y = monitor_secundario['y_offset'] + margin + row * (height + margin)
-            positions.append((width, height, x, y))
-
-    return positions
-
-def launch_sessions(url, num_sessions, auto_close, incognito, auto_arrange):
-    global drivers, driver_urls, stop_monitor
-    stop_monitor = False
-
-    if not url:
-        messagebox.showerror("Erro", "Por favor, insira uma URL válida")
-        return
-
-    if not url.startswith(('http://', 'https://')):
-        url = 'http://' + url
-
-    # Limpar sessões anteriores
-    close_sessions()
-    drivers.clear()
-    driver_urls.clear()
-
-    # Calcular posições
-    positions = calculate_positions(num_sessions, auto_arrange)
-
-    # Atualizar status
-    status_var.set(f"Iniciando {num_sessions} sessões...")
-    root.update()
-
-    # Preparar o serviço Chrome uma única vez para reuso
-    service = Service(ChromeDriverManager().install())
-
-    # Iniciar sessões com ThreadPoolExecutor para máxima velocidade
-    with concurrent.futures.ThreadPoolExecutor(max_workers=num_sessions) as executor:
-        batch_size = min(5, num_sessions)  # Processar em lotes de 5 para evitar sobrecarga
-
-        for i in range(0, num_sessions, batch_size):
-            batch_positions = positions[i:i+batch_size]
-
-            # Iniciar este lote em paralelo
-            batch_futures = []
-            for pos in batch_positions:
-                future = executor.submit(open_session, url, pos, incognito, service)
-                batch_futures.append(future)
-
-            # Coletar resultados deste lote
-            for future in concurrent.futures.as_completed(batch_futures):
-                driver = future.result()
-                if driver:
-                    drivers.append(driver)
-                    # Armazenar a URL inicial
-                    driver_urls[driver] = driver.current_url
-
-            # Pequena pausa entre lotes
-            if i + batch_size < num_sessions:
-                time.sleep(0.2)
-
-    status_var.set(f"{len(drivers)} sessões ativas")
-
-    # Iniciar monitoramento
-    if auto_close:
-        threading.Thread(target=monitor_refresh, daemon=True).start()
-
-def monitor_refresh():
-    global drivers, driver_urls, stop_monitor
+latest_metrics = []  # Últimas medições por sessão recebidas do motor
+dashboard_window = None  # Janela do painel de sessões, quando aberta
+dashboard_tree = None
+dashboard_sort = ('session', False)  # Coluna e ordem (decrescente?) do painel
+
+# Títulos das colunas do painel de sessões
+METRIC_HEADINGS = {
+    'session': ('#', 40),
+    'status': ('Status', 70),
+    'group': ('URL inicial', 150),
+    'slot': ('Lugar', 50),
+    'restarts': ('Reinícios', 70),
+    'launch_start_s': ('Início (s)', 70),
+    'launch_end_s': ('Pronta (s)', 70),
+    'startup_ms': ('Abertura (ms)', 90),
+    'first_get_ms': ('1º get (ms)', 80),
+    'fire_ms': ('Disparo (ms)', 80),
+    'ttfb_ms': ('TTFB (ms)', 70),
+    'dom_content_loaded_ms': ('DOM (ms)', 70),
+    'load_ms': ('Load (ms)', 70),
+    'poll_latency_ms': ('Polling (ms)', 80),
+    'rss_mb': ('RSS (MB)', 70),
+    'cpu_percent': ('CPU (%)', 60),
+    'governor': ('Governador', 80),
+    'url': ('URL', 250),
+}
 
-    while not stop_monitor:
-        time.sleep(1)
+# Eventos das threads de trabalho; só a thread do Tk toca nos widgets
+ui_events = queue.Queue()
+UI_REFRESH_MS = 33  # No máximo ~30 atualizações da interface por segundo
+UI_MAX_EVENTS = 2000  # Limite de eventos tratados por quadro, para não travar a janela numa rajada
 
-        if stop_monitor:
-            break
+def on_engine_event(event, data):
+    """Recebe os eventos do SessionManager (em qualquer thread) e os enfileira para a interface"""
+    ui_events.put((event, data))
 
-        active_drivers = []
-        url_changed = False
-        changed_driver = None
+def drain_ui_events():
+    """Aplica na interface os eventos pendentes, juntando as rajadas em uma única atualização"""
+    global latest_metrics
 
-        # Primeiro, verificar se há alguma mudança de URL
-        for driver in drivers:
-            try:
-                current_url = driver.current_url
-                # Se o driver existe no dicionário e a URL mudou
-                if driver in driver_urls and driver_urls[driver] != current_url:
-                    # Verificar se é apenas um reload ou uma mudança para outro site
-                    base_url_old = driver_urls[driver].split('://')[1].split('/')[0] if '://' in driver_urls[driver] else ""
-                    base_url_new = current_url.split('://')[1].split('/')[0] if '://' in current_url else ""
-
-                    # Se o domínio mudou, considerar como mudança de URL
-                    if base_url_old != base_url_new:
-                        url_changed = True
-                        changed_driver = driver
-                        status_var.set(f"URL alterada: {current_url}")
-                        # Atualizar a URL no dicionário
-                        driver_urls[driver] = current_url
-                        break  # Encontramos uma mudança significativa, interromper a verificação
-
-                # Atualizar URL atual em todos os casos
-                driver_urls[driver] = current_url
-                active_drivers.append(driver)
-            except:
-                try:
-                    driver.quit()
-                except:
-                    pass
+    status = None
+    metrics = None
+    pending = []
+    try:
+        for _ in range(UI_MAX_EVENTS):
+            event, data = ui_events.get_nowait()
+            if event == 'status':
+                # Só a última mensagem de status do quadro importa
+                status = data['message']
+            elif event == 'metrics':
+                # Cada evento traz todas as sessões; basta a última tabela
+                metrics = data['rows']
+            else:
+                pending.append((event, data))
+    except queue.Empty:
+        pass
+
+    if status is not None:
+        status_var.set(status)
+
+    if metrics is not None:
+        latest_metrics = metrics
+        refresh_dashboard()
+
+    for event, data in pending:
+        if event == 'exit':
+            # Fechamento concluído: destruir a janela encerra o mainloop
+            root.destroy()
+            return
+        handle_ui_event(event, data)
 
-        # Se uma URL mudou significativamente
-        if url_changed and changed_driver:
-            # Maximizar a janela que mudou
-            try:
-                maximize_window_on_primary(changed_driver)
-
-                # Se auto_close estiver ativado, fecha as outras janelas
-                if auto_close_var.get():
-                    for driver in drivers:
-                        if driver != changed_driver:
-                            try:
-                                driver.quit()
-                            except:
-                                pass
-                    # Manter apenas o driver que mudou
-                    drivers = [changed_driver]
-                    active_drivers = [changed_driver]
-            except Exception as e:
-                print(f"Erro ao maximizar janela: {e}")
+    root.after(UI_REFRESH_MS, drain_ui_events)
 
-        # Atualizar a lista de drivers ativos
-        drivers.clear()
-        drivers.extend(active_drivers)
+def handle_ui_event(event, data):
+    """Trata um evento já na thread da interface"""
+    if event == 'launch_finished':
+        start_button.config(state=tk.NORMAL)
+        stop_button.config(state=tk.NORMAL)
+        restore_button.config(state=tk.NORMAL)
 
-        status_var.set(f"{len(drivers)} sessões ativas")
-        root.update_idletasks()
+# O motor de sessões não conhece o Tk; a interface só envia comandos e recebe eventos
+manager = SessionManager(listener=on_engine_event)
+coordinator = None  # Coordenador da execução atual, quando ela é distribuída entre agentes
 
-        if not active_drivers:
-            status_var.set("Todas as sessões foram fechadas")
-            stop_monitor = True
-            break
+def finish_startup():
+    """Inicialização que não precisa atrasar a primeira pintura da janela"""
+    startup_profile.mark('primeira pintura')
 
-def close_sessions():
-    global drivers, driver_urls, stop_monitor
-    stop_monitor = True
+    # selenium e webdriver_manager (e o chromedriver) carregam em segundo plano
+    threading.Thread(target=load_engine, daemon=True).start()
 
-    if drivers:
-        for driver in drivers:
-            try:
-                driver.quit()
-            except:
-                pass
+    # Inicializar as configurações de monitor e a prévia
+    refresh_monitor_settings()
+    watch_display_changes()
+    update_preview()
+    startup_profile.mark('monitores e prévia')
 
-        drivers.clear()
-        driver_urls.clear()
+def load_engine():
+    """Carrega o que o primeiro teste precisa enquanto o usuário preenche a janela"""
+    try:
+        load_webdriver()
+        startup_profile.mark('selenium carregado')
+        # Resolver o chromedriver em segundo plano, fora do caminho do primeiro teste
+        manager.resolver.prefetch()
+        manager.status("Pronto para iniciar")
+    except Exception as e:
+        manager.status(f"Erro ao carregar o selenium: {e}")
+    startup_profile.print_report()
 
-    status_var.set("Todas as sessões foram fechadas")
+def close_all():
+    """Fecha as sessões locais e as dos agentes da última execução distribuída"""
+    manager.close()
+    if coordinator is not None:
+        coordinator.close()
 
-def draw_grid(canvas, num_sessions, width, height, auto_arrange):
-    canvas.delete("all")
-    theme = THEMES[current_theme]
+def preview_scene(num_sessions, width, height, auto_arrange):
+    """Calcula o que a prévia deve mostrar: (mensagem, monitores, janelas, legenda)
 
+    Monitores e janelas são listas de (retângulo, rótulo, posição do rótulo) em coordenadas do canvas.
+    """
     if num_sessions <= 0:
-        canvas.create_text(width/2, height/2, text="Insira o número de sessões", fill=theme['fg'])
-        return
+        return "Insira o número de sessões", [], [], None
 
     if not auto_arrange:
-        canvas.create_text(width/2, height/2,
-                         text=f"{num_sessions} janelas serão abertas\nsem organização automática",
-                         fill=theme['fg'], justify=tk.CENTER)
-        return
-
-    # Detectar monitores para a prévia e aplicar orientações selecionadas
-    monitors = get_screen_info()
+        return f"{num_sessions} janelas serão abertas\nsem organização automática", [], [], None
 
-    # Aplicar orientações selecionadas pelo usuário
-    for i, monitor in enumerate(monitors):
-        monitor_id = monitor['id']
-        if monitor_id in monitor_orientations:
-            monitors[i]['orientation'] = monitor_orientations[monitor_id]
-
-            # Ajustar dimensões se a orientação for diferente da padrão
-            if monitor['orientation'] != monitor['default_orientation']:
-                monitors[i]['width'], monitors[i]['height'] = monitors[i]['height'], monitors[i]['width']
+    # Monitores do cache para a prévia, com as orientações selecionadas
+    monitors = get_oriented_monitors()
+    positions = calculate_positions(num_sessions, auto_arrange)
 
-    # Se temos múltiplos monitores, garantir que renderizamos todos
     if len(monitors) > 1:
         # Determinar dimensões totais considerando todos os monitores
         min_x = min([m['x_offset'] for m in monitors])
@@ -391,80 +212,135 @@ def draw_grid(canvas, num_sessions, width, height, auto_arrange):
         scale = min(scale_x, scale_y) * 0.9  # Ligeira redução para garantir espaço
 
         # Calcular deslocamento para centralizar
-        offset_x = (width - (total_width * scale)) / 2
-        offset_y = 30  # Espaço para os rótulos dos monitores
-
-        # Desenhar cada monitor
-        for i, monitor in enumerate(monitors):
-            # Ajustar coordenadas relativas ao canto superior esquerdo
-            mon_x = offset_x + (monitor['x_offset'] - min_x) * scale
-            mon_y = offset_y + (monitor['y_offset'] - min_y) * scale
-            mon_w = monitor['width'] * scale
-            mon_h = monitor['height'] * scale
-
-            # Desenhar contorno do monitor
-            canvas.create_rectangle(mon_x, mon_y, mon_x + mon_w, mon_y + mon_h,
-                                outline=theme['monitor_outline'], fill=theme['monitor_fill'])
-
-            # Rótulo do monitor
-            label = f"Monitor {monitor['id']}" + (" (Principal)" if monitor['is_primary'] else "")
-            canvas.create_text(mon_x + mon_w/2, mon_y - 15, text=label, fill=theme['fg'])
-
-        # Desenhar posições das janelas
-        positions = calculate_positions(num_sessions, auto_arrange)
-
-        for i, (w, h, x, y) in enumerate(positions):
-            # Ajustar coordenadas conforme a mesma escala dos monitores
-            win_x = offset_x + (x - min_x) * scale
-            win_y = offset_y + (y - min_y) * scale
-            win_w = w * scale
-            win_h = h * scale
-
-            canvas.create_rectangle(win_x, win_y, win_x + win_w, win_y + win_h,
-                                outline=theme['grid_outline'], fill=theme['grid_fill'])
-            canvas.create_text(win_x + win_w/2, win_y + win_h/2, text=f"{i+1}", fill=theme['fg'])
-
-        # Adicionar legenda explicativa quando há mais de 9 sessões
-        if num_sessions > 9:
-            canvas.create_text(width/2, height - 15,
-                               text=f"Sessões 1-9 no Monitor Principal, 10-{num_sessions} no Monitor Secundário",
-                               fill=theme['fg'], font=('Helvetica', 8))
+        offset_x = (width - (total_width * scale)) / 2 - min_x * scale
+        offset_y = 30 - min_y * scale  # Espaço para os rótulos dos monitores
     else:
-        # Código original para um único monitor
-        # ...resto do código para um monitor...
-        total_width = monitors[0]['width']
-        total_height = monitors[0]['height']
-
-        scale_x = width / total_width
-        scale_y = (height - 30) / total_height
+        monitor = monitors[0]
+        scale_x = width / monitor['width']
+        scale_y = (height - 30) / monitor['height']
         scale = min(scale_x, scale_y)
 
-        # Desenhar monitor
-        monitor = monitors[0]
-        mon_x = (width - monitor['width'] * scale) / 2
-        mon_y = 30
+        offset_x = (width - monitor['width'] * scale) / 2 - monitor['x_offset'] * scale
+        offset_y = 30 - monitor['y_offset'] * scale
+
+    monitor_shapes = []
+    for monitor in monitors:
+        mon_x = offset_x + monitor['x_offset'] * scale
+        mon_y = offset_y + monitor['y_offset'] * scale
         mon_w = monitor['width'] * scale
         mon_h = monitor['height'] * scale
+        label = f"Monitor {monitor['id']}" + (" (Principal)" if monitor['is_primary'] else "")
+        monitor_shapes.append(((mon_x, mon_y, mon_x + mon_w, mon_y + mon_h), label, (mon_x + mon_w/2, mon_y - 15)))
+
+    # Janelas na mesma escala dos monitores
+    tile_shapes = []
+    for i, (w, h, x, y) in enumerate(positions):
+        win_x = offset_x + x * scale
+        win_y = offset_y + y * scale
+        win_w = w * scale
+        win_h = h * scale
+        tile_shapes.append(((win_x, win_y, win_x + win_w, win_y + win_h), f"{i+1}", (win_x + win_w/2, win_y + win_h/2)))
+
+    # Legenda explicativa quando as sessões ocupam mais de um monitor
+    legend = None
+    if len(positions.monitor_counts) > 1:
+        parts = []
+        first = 1
+        for monitor_id, count in positions.monitor_counts:
+            parts.append(f"Monitor {monitor_id}: {first}-{first + count - 1}")
+            first += count
+        legend = ", ".join(parts)
+
+    return None, monitor_shapes, tile_shapes, legend
+
+preview_items = {}  # canvas -> itens já desenhados, reaproveitados entre as atualizações
+
+def sync_boxes(canvas, items, shapes, tag, theme, relabel):
+    """Move os retângulos e rótulos existentes e cria ou remove só a diferença"""
+    for i, (box, label, label_pos) in enumerate(shapes):
+        if i < len(items):
+            rect, text = items[i]
+            canvas.coords(rect, *box)
+            canvas.coords(text, *label_pos)
+            if relabel:
+                canvas.itemconfigure(text, text=label)
+        else:
+            rect = canvas.create_rectangle(*box, tags=(tag + '_box',), outline=theme[tag + '_outline'],
+                                           fill=theme[tag + '_fill'])
+            text = canvas.create_text(*label_pos, text=label, tags=(tag + '_label',), fill=theme['fg'])
+            items.append((rect, text))
+
+    for rect, text in items[len(shapes):]:
+        canvas.delete(rect, text)
+    del items[len(shapes):]
+
+def sync_text(canvas, item, position, text, theme, **options):
+    """Mostra, move ou remove um texto avulso; retorna o id do item ou None"""
+    if text is None:
+        if item is not None:
+            canvas.delete(item)
+        return None
+    if item is None:
+        return canvas.create_text(*position, text=text, tags=('preview_text',), fill=theme['fg'], **options)
+    canvas.coords(item, *position)
+    canvas.itemconfigure(item, text=text)
+    return item
 
-        canvas.create_rectangle(mon_x, mon_y, mon_x + mon_w, mon_y + mon_h,
-                              outline=theme['monitor_outline'], fill=theme['monitor_fill'])
-        canvas.create_text(mon_x + mon_w/2, mon_y - 15, text=f"Monitor {monitor['id']} (Principal)",
-                          fill=theme['fg'])
-
-        # Desenhar posições das janelas
-        positions = calculate_positions(num_sessions, auto_arrange)
-        for i, (w, h, x, y) in enumerate(positions):
-            # Ajustar para centralizar no canvas
-            win_x = mon_x + (x - monitor['x_offset']) * scale
-            win_y = mon_y + (y - monitor['y_offset']) * scale
-            win_w = w * scale
-            win_h = h * scale
+def draw_grid(canvas, num_sessions, width, height, auto_arrange):
+    theme = THEMES[current_theme]
+    state = preview_items.setdefault(canvas, {
+        'key': None, 'theme': None, 'monitors': [], 'tiles': [], 'message': None, 'legend': None,
+    })
+
+    # Nada mudou desde o último desenho: não mexer no canvas
+    monitors_key = tuple((m['id'], m['x_offset'], m['y_offset'], m['width'], m['height'])
+                         for m in get_oriented_monitors()) if auto_arrange else None
+    key = (num_sessions, width, height, auto_arrange, monitors_key)
+    if key == state['key'] and current_theme == state['theme']:
+        return
 
-            canvas.create_rectangle(win_x, win_y, win_x + win_w, win_y + win_h,
-                                 outline=theme['grid_outline'], fill=theme['grid_fill'])
-            canvas.create_text(win_x + win_w/2, win_y + win_h/2, text=f"{i+1}", fill=theme['fg'])
+    message, monitor_shapes, tile_shapes, legend = preview_scene(num_sessions, width, height, auto_arrange)
+
+    if current_theme != state['theme']:
+        # Trocar as cores de todos os itens de uma vez pelas tags
+        canvas.itemconfigure('grid_box', outline=theme['grid_outline'], fill=theme['grid_fill'])
+        canvas.itemconfigure('monitor_box', outline=theme['monitor_outline'], fill=theme['monitor_fill'])
+        canvas.itemconfigure('grid_label', fill=theme['fg'])
+        canvas.itemconfigure('monitor_label', fill=theme['fg'])
+        canvas.itemconfigure('preview_text', fill=theme['fg'])
+
+    created_monitors = len(monitor_shapes) > len(state['monitors'])
+    sync_boxes(canvas, state['monitors'], monitor_shapes, 'monitor', theme, relabel=True)
+    # Os rótulos das janelas são só o número da posição, que não muda para um item reaproveitado
+    sync_boxes(canvas, state['tiles'], tile_shapes, 'grid', theme, relabel=False)
+    if created_monitors:
+        # Monitores sempre por baixo das janelas
+        canvas.tag_lower('monitor_box')
+
+    state['message'] = sync_text(canvas, state['message'], (width/2, height/2), message, theme,
+                                 justify=tk.CENTER)
+    state['legend'] = sync_text(canvas, state['legend'], (width/2, height - 15), legend, theme,
+                                font=('Helvetica', 8))
+
+    state['key'] = key
+    state['theme'] = current_theme
+
+PREVIEW_DEBOUNCE_MS = 120  # Espera após a última tecla antes de redesenhar a prévia
+preview_job = None
+
+def schedule_preview(event=None):
+    """Redesenha a prévia só quando a digitação para por um instante"""
+    global preview_job
+    if preview_job is not None:
+        root.after_cancel(preview_job)
+    preview_job = root.after(PREVIEW_DEBOUNCE_MS, update_preview)
 
 def update_preview(event=None):
+    global preview_job
+    if preview_job is not None:
+        root.after_cancel(preview_job)
+        preview_job = None
+
     try:
         num_sessions = int(num_entry.get()) if num_entry.get() else 0
         auto_arrange = auto_arrange_var.get()
@@ -474,12 +350,14 @@ def update_preview(event=None):
 
 def update_monitor_orientation(monitor_id, orientation):
     """Atualiza a orientação de um monitor específico"""
-    global monitor_orientations
-    monitor_orientations[monitor_id] = orientation
+    session_engine.monitor_orientations[monitor_id] = orientation
     update_preview()
 
 def refresh_monitor_settings():
     """Atualiza as configurações dos monitores na interface"""
+    # Forçar nova leitura dos monitores
+    monitor_topology.invalidate()
+
     # Limpar frame de configurações
     for widget in monitor_settings_frame.winfo_children():
         widget.destroy()
@@ -519,7 +397,7 @@ def refresh_monitor_settings():
             orientation_combo.pack(side=tk.LEFT)
 
             # Definir valor padrão
-            current_orientation = monitor_orientations.get(
+            current_orientation = session_engine.monitor_orientations.get(
                 monitor['id'],
                 monitor['default_orientation']
             )
@@ -538,38 +416,145 @@ def refresh_monitor_settings():
     # Atualizar a prévia
     update_preview()
 
+def update_pool_settings(event=None):
+    """Aplica o tamanho do pool de janelas pré-carregadas definido na interface"""
+    try:
+        size = max(0, int(pool_size_entry.get()) if pool_size_entry.get() else 0)
+    except ValueError:
+        return
+
+    positions = calculate_positions(size, auto_arrange_var.get()) if size > 0 else []
+    incognito = incognito_var.get()
+    profile = profile_var.get()
+
+    def configure():
+        driver_path = None
+        if size > 0 and manager.pool.driver_path is None:
+            try:
+                driver_path = manager.resolver.resolve()
+            except Exception as e:
+                print(f"Erro ao preparar o chromedriver para o pool: {e}")
+                return
+        manager.pool.configure(size=size, driver_path=driver_path, incognito=incognito,
+                              positions=positions, profile=profile)
+
+    # A resolução do chromedriver pode envolver rede, então não bloquear a interface
+    threading.Thread(target=configure, daemon=True).start()
+
+def watch_display_changes(signature=None):
+    """Verifica periodicamente se a disposição de monitores mudou e atualiza o cache"""
+    current = get_display_signature(root)
+    if signature is not None and current != signature:
+        refresh_monitor_settings()
+    root.after(2000, lambda: watch_display_changes(current))
+
 def start():
+    global coordinator
+
     try:
         url = url_entry.get()
         num = int(num_entry.get()) if num_entry.get() else 0
 
+        if not url:
+            messagebox.showerror("Erro", "Por favor, insira uma URL válida")
+            return
+
         if num <= 0:
             messagebox.showerror("Erro", "O número de sessões deve ser maior que zero")
             return
 
+        # Validar a especificação de URLs aqui, para mostrar o erro antes de abrir qualquer janela
+        try:
+            targets = parse_url_targets(url)
+            assign_urls(targets, num)
+            rules = DetectionRules(rules_entry.get())
+            fire_at = parse_fire_time(fire_at_entry.get())
+            governor = None
+            if governor_var.get():
+                try:
+                    memory_high = float(memory_high_entry.get())
+                    cpu_high = float(cpu_high_entry.get())
+                except ValueError:
+                    raise ValueError("Os limites de memória e CPU devem ser números (em %)")
+                # Limites baixos a 15 pontos dos altos, para não ficar alternando perto do limite
+                governor = {'memory_high': memory_high, 'memory_low': memory_high - 15,
+                            'cpu_high': cpu_high, 'cpu_low': cpu_high - 15}
+            supervisor = None
+            if supervisor_var.get():
+                try:
+                    max_failures = int(max_failures_entry.get())
+                except ValueError:
+                    raise ValueError("O número de tentativas deve ser um número inteiro")
+                supervisor = {'max_failures': max_failures}
+        except ValueError as e:
+            messagebox.showerror("Erro", str(e))
+            return
+
         auto_close = auto_close_var.get()
         incognito = incognito_var.get()
         auto_arrange = auto_arrange_var.get()
-
-        # Desativar botões temporariamente
+        headless = headless_var.get()
+        profile = profile_var.get()
+        use_template = use_template_var.get()
+        snapshot = snapshot_var.get()
+        event_detection = event_detection_var.get()
+
+        # Selenium Grid informado: as sessões são criadas nos nós em vez de nesta máquina
+        grid = grid_entry.get().split()
+        if grid:
+            manager.set_driver_factory(GridBackend(grid))
+        elif not manager.local_backend:
+            manager.set_driver_factory(create_driver)
+
+        # Agentes informados: a execução é dividida entre eles em vez de abrir as janelas aqui
+        agents = agents_entry.get().split()
+        if coordinator is not None:
+            threading.Thread(target=coordinator.close, daemon=True).start()
+        token = agents_token_entry.get().strip() or None
+        coordinator = Coordinator(agents, listener=on_engine_event, token=token) if agents else None
+        run_coordinator = coordinator
+
+        # Desativar o início durante a abertura; "Fechar Todas" continua disponível e cancela as sessões
+        # que ainda não abriram (SessionManager.close)
         start_button.config(state=tk.DISABLED)
-        stop_button.config(state=tk.DISABLED)
 
-        # Iniciar em thread separada
-        threading.Thread(
-            target=lambda: launch_sessions(url, num, auto_close, incognito, auto_arrange),
-            daemon=True
-        ).start()
-
-        # Reativar botões após um curto período
-        root.after(1000, lambda: [
-            start_button.config(state=tk.NORMAL),
-            stop_button.config(state=tk.NORMAL)
-        ])
+        def launch():
+            try:
+                if run_coordinator is not None:
+                    run_coordinator.launch(url, num, auto_close=auto_close, incognito=incognito,
+                                           auto_arrange=auto_arrange, headless=headless, profile=profile,
+                                           use_template=use_template, event_detection=event_detection,
+                                           rules=rules.text, governor=governor, supervisor=supervisor,
+                                           fire_at=fire_at, snapshot=snapshot)
+                else:
+                    manager.launch(targets, num, auto_close, incognito, auto_arrange, headless, profile,
+                                   use_template, event_detection, rules=rules, governor=governor,
+                                   supervisor=supervisor, fire_at=fire_at, snapshot=snapshot)
+            finally:
+                # Reativar os botões quando a abertura terminar
+                on_engine_event('launch_finished', {})
+
+        # Iniciar em thread separada; a interface continua respondendo durante a abertura
+        threading.Thread(target=launch, daemon=True).start()
+        stop_button.config(state=tk.NORMAL)
 
     except ValueError:
         messagebox.showerror("Erro", "Por favor, insira um número válido de sessões")
 
+def restore_run():
+    """Reabre a última execução salva, com cookies e storage de cada sessão"""
+    start_button.config(state=tk.DISABLED)
+    restore_button.config(state=tk.DISABLED)
+
+    def restore():
+        try:
+            manager.restore()
+        finally:
+            on_engine_event('launch_finished', {})
+
+    threading.Thread(target=restore, daemon=True).start()
+    stop_button.config(state=tk.NORMAL)
+
 def toggle_theme():
     global current_theme
     current_theme = 'dark' if current_theme == 'light' else 'light'
@@ -603,7 +588,7 @@ def apply_theme():
 
 def perform_safe_close():
     """Implementa um fechamento seguro para evitar que a interface trave"""
-    global closing_in_progress, drivers, stop_monitor
+    global closing_in_progress
 
     if closing_in_progress:
         return
@@ -645,140 +630,374 @@ def perform_safe_close():
 
     # Executar o fechamento em uma thread
     def close_thread():
-        global drivers, stop_monitor
+        # Fechar todos os drivers em paralelo, dentro do limite de 3 segundos abaixo. Os agentes fecham
+        # numa thread à parte: um agente inacessível (5 s de timeout) não pode deixar o Chrome local aberto
+        started = time.monotonic()
+        agents_thread = None
+        if coordinator is not None:
+            agents_thread = threading.Thread(target=coordinator.close, daemon=True)
+            agents_thread.start()
+        clean, killed = manager.shutdown(deadline=2.0)
+        print(f"Sessões fechadas: {clean} normalmente, {killed} à força")
+        if agents_thread is not None:
+            agents_thread.join(max(0, 2.5 - (time.monotonic() - started)))
+
+        # Fechar as janelas pela thread da interface
+        on_engine_event('exit', {})
 
-        stop_monitor = True
+    # Iniciar thread de fechamento
+    threading.Thread(target=close_thread, daemon=True).start()
 
-        # Fechar cada driver com timeout
-        for driver in list(drivers):
-            try:
-                driver.quit()
-            except:
-                pass
+    # Definir um timeout para forçar o fechamento se demorar muito
+    root.after(3000, lambda: sys.exit(0))
 
-        drivers.clear()
+def open_dashboard():
+    """Abre o painel com as medições de cada sessão"""
+    global dashboard_window, dashboard_tree
 
-        # Fechar janelas
-        progress_window.destroy()
-        root.destroy()
+    if dashboard_window is not None:
+        dashboard_window.lift()
+        return
 
-        # Forçar saída em caso de bloqueio
-        try:
-            sys.exit(0)
-        except:
-            pass
+    dashboard_window = tk.Toplevel(root)
+    dashboard_window.title("Painel de Sessões")
+    dashboard_window.geometry("1000x400")
+    dashboard_window.configure(bg=THEMES[current_theme]['bg'])
 
-    # Iniciar thread de fechamento
-    threading.Thread(target=close_thread, daemon=True).start()
+    def on_close():
+        global dashboard_window, dashboard_tree
+        dashboard_window.destroy()
+        dashboard_window = dashboard_tree = None
 
-    # Definir um timeout para forçar o fechamento se demorar muito
-    root.after(3000, lambda: sys.exit(0))
+    dashboard_window.protocol("WM_DELETE_WINDOW", on_close)
+
+    frame = ttk.Frame(dashboard_window, padding=10)
+    frame.pack(fill=tk.BOTH, expand=True)
+
+    buttons = ttk.Frame(frame)
+    buttons.pack(fill=tk.X, pady=(0, 5))
+    ttk.Button(buttons, text='Exportar CSV', command=lambda: export_metrics('.csv')).pack(side=tk.LEFT, padx=5)
+    ttk.Button(buttons, text='Exportar JSONL', command=lambda: export_metrics('.jsonl')).pack(side=tk.LEFT, padx=5)
+
+    columns = SessionMetrics.COLUMNS
+    dashboard_tree = ttk.Treeview(frame, columns=columns, show='headings')
+    for column in columns:
+        heading, width = METRIC_HEADINGS[column]
+        dashboard_tree.heading(column, text=heading, command=lambda c=column: sort_dashboard(c))
+        dashboard_tree.column(column, width=width, stretch=(column == 'url'),
+                              anchor=tk.W if column in ('status', 'url') else tk.E)
+
+    scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=dashboard_tree.yview)
+    dashboard_tree.configure(yscrollcommand=scrollbar.set)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    dashboard_tree.pack(fill=tk.BOTH, expand=True)
+
+    refresh_dashboard()
+
+def refresh_dashboard():
+    """Atualiza as linhas do painel sem recriá-las, mantendo a ordenação escolhida"""
+    if dashboard_tree is None:
+        return
+
+    existing = set(dashboard_tree.get_children())
+    for row in latest_metrics:
+        iid = str(row['session'])
+        values = ['' if row[c] is None else row[c] for c in SessionMetrics.COLUMNS]
+        if iid in existing:
+            dashboard_tree.item(iid, values=values)
+            existing.discard(iid)
+        else:
+            dashboard_tree.insert('', tk.END, iid=iid, values=values)
+
+    # Sessões de uma execução anterior
+    if existing:
+        dashboard_tree.delete(*existing)
+
+    apply_dashboard_sort()
+
+def sort_dashboard(column):
+    """Ordena pela coluna clicada; um segundo clique inverte a ordem"""
+    global dashboard_sort
+    current, descending = dashboard_sort
+    dashboard_sort = (column, not descending if column == current else False)
+    apply_dashboard_sort()
+
+def apply_dashboard_sort():
+    column, descending = dashboard_sort
+    rows = {str(row['session']): row[column] for row in latest_metrics}
+
+    def key(iid):
+        value = rows.get(iid)
+        # Valores ausentes sempre no fim
+        return (value is None, value if value is not None else 0)
+
+    items = sorted(dashboard_tree.get_children(), key=key, reverse=descending)
+    if descending:
+        # Manter os valores ausentes no fim também na ordem decrescente
+        items = [i for i in items if rows.get(i) is not None] + [i for i in items if rows.get(i) is None]
+    for index, iid in enumerate(items):
+        dashboard_tree.move(iid, '', index)
+
+def export_metrics(extension):
+    """Salva as medições por sessão em CSV ou JSONL"""
+    path = filedialog.asksaveasfilename(
+        parent=dashboard_window or root,
+        defaultextension=extension,
+        filetypes=[('CSV', '*.csv')] if extension == '.csv' else [('JSON Lines', '*.jsonl')],
+        initialfile=f"sessoes{extension}"
+    )
+    if not path:
+        return
+    try:
+        manager.metrics.export(path)
+        status_var.set(f"Medições salvas em {path}")
+    except Exception as e:
+        messagebox.showerror("Erro", f"Não foi possível salvar as medições: {e}")
+
+if __name__ == "__main__":
+    # Configuração da interface
+    root = tk.Tk()
+    root.geometry('560x1020')  # Aumentado para acomodar as configurações de monitor
+    root.title('Multi Chrome Tester')
+    root.protocol("WM_DELETE_WINDOW", perform_safe_close)
+
+    # Variáveis
+    auto_close_var = tk.BooleanVar(value=True)
+    incognito_var = tk.BooleanVar(value=False)
+    auto_arrange_var = tk.BooleanVar(value=True)
+    event_detection_var = tk.BooleanVar(value=True)
+    headless_var = tk.BooleanVar(value=False)
+    profile_var = tk.StringVar(value=DEFAULT_PROFILE)
+    use_template_var = tk.BooleanVar(value=False)
+    snapshot_var = tk.BooleanVar(value=False)
+    governor_var = tk.BooleanVar(value=False)
+    supervisor_var = tk.BooleanVar(value=False)
+    status_var = tk.StringVar(value="Carregando...")
+
+    # Estilo
+    style = ttk.Style(root)
+    style.theme_use('clam')
+
+    # Layout
+    main_frame = ttk.Frame(root, padding=20)
+    main_frame.pack(fill=tk.BOTH, expand=True)
+
+    # URL
+    url_frame = ttk.Frame(main_frame)
+    url_frame.pack(fill=tk.X, pady=5)
+
+    ttk.Label(url_frame, text='URLs do site (peso ou quantidade opcional, ex.: fila.com 60% espelho.com 40%):',
+              wraplength=440).pack(anchor=tk.W)
+    url_entry = ttk.Entry(url_frame, width=50)
+    url_entry.pack(fill=tk.X, pady=5)
+
+    # Sessões
+    num_frame = ttk.Frame(main_frame)
+    num_frame.pack(fill=tk.X, pady=5)
+
+    ttk.Label(num_frame, text='Número de sessões:').pack(anchor=tk.W)
+    num_entry = ttk.Entry(num_frame)
+    num_entry.pack(fill=tk.X, pady=5)
+    num_entry.bind('<KeyRelease>', schedule_preview)
+
+    # Regras de detecção
+    rules_frame = ttk.Frame(main_frame)
+    rules_frame.pack(fill=tk.X, pady=5)
+
+    ttk.Label(rules_frame, text='Regras de detecção (opcional, separadas por ";", ex.: path:/checkout; css:"div .pagamento"):',
+              wraplength=440).pack(anchor=tk.W)
+    rules_entry = ttk.Entry(rules_frame)
+    rules_entry.pack(fill=tk.X, pady=5)
+
+    # Disparo agendado: sessões esperam em about:blank e navegam juntas no horário do servidor
+    fire_frame = ttk.Frame(main_frame)
+    fire_frame.pack(fill=tk.X, pady=5)
+
+    ttk.Label(fire_frame, text='Disparar às (opcional, hora do servidor, HH:MM:SS ou +segundos):',
+              wraplength=440).pack(anchor=tk.W)
+    fire_at_entry = ttk.Entry(fire_frame)
+    fire_at_entry.pack(fill=tk.X, pady=5)
+
+    # Agentes em outras máquinas (modo coordenador)
+    agents_frame = ttk.Frame(main_frame)
+    agents_frame.pack(fill=tk.X, pady=5)
+
+    ttk.Label(agents_frame, text='Agentes (opcional, host:porta separados por espaço; vazio abre aqui):',
+              wraplength=440).pack(anchor=tk.W)
+    agents_entry = ttk.Entry(agents_frame)
+    agents_entry.pack(fill=tk.X, pady=5)
+
+    agents_token_frame = ttk.Frame(agents_frame)
+    agents_token_frame.pack(fill=tk.X)
+    ttk.Label(agents_token_frame, text='Token dos agentes (o mesmo de --token):').pack(side=tk.LEFT)
+    agents_token_entry = ttk.Entry(agents_token_frame, show='*')
+    agents_token_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+
+    # Selenium Grid ou standalone (backend remoto)
+    grid_frame = ttk.Frame(main_frame)
+    grid_frame.pack(fill=tk.X, pady=5)
+
+    ttk.Label(grid_frame, text='Selenium Grid (opcional, URLs dos nós separadas por espaço, ex.: servidor:4444):',
+              wraplength=440).pack(anchor=tk.W)
+    grid_entry = ttk.Entry(grid_frame)
+    grid_entry.pack(fill=tk.X, pady=5)
+
+    # Opções
+    options_frame = ttk.Frame(main_frame)
+    options_frame.pack(fill=tk.X, pady=5)
+
+    ttk.Checkbutton(
+        options_frame,
+        text='Organizar janelas automaticamente',
+        variable=auto_arrange_var,
+        command=update_preview
+    ).pack(anchor=tk.W, pady=2)
+
+    ttk.Checkbutton(
+        options_frame,
+        text='Fechar outras janelas quando uma recarregar',
+        variable=auto_close_var
+    ).pack(anchor=tk.W, pady=2)
+
+    ttk.Checkbutton(
+        options_frame,
+        text='Detectar mudanças por eventos do navegador (mais rápido)',
+        variable=event_detection_var
+    ).pack(anchor=tk.W, pady=2)
+
+    ttk.Checkbutton(
+        options_frame,
+        text='Sessões sem janela (headless); só a que passar da fila é exibida',
+        variable=headless_var
+    ).pack(anchor=tk.W, pady=2)
+
+    ttk.Checkbutton(
+        options_frame,
+        text='Modo anônimo',
+        variable=incognito_var,
+        command=update_pool_settings
+    ).pack(anchor=tk.W, pady=2)
+
+    ttk.Checkbutton(
+        options_frame,
+        text='Usar perfil modelo com cache aquecido',
+        variable=use_template_var
+    ).pack(anchor=tk.W, pady=2)
+
+    ttk.Checkbutton(
+        options_frame,
+        text='Salvar o estado das sessões para restaurar após uma queda',
+        variable=snapshot_var
+    ).pack(anchor=tk.W, pady=2)
+
+    # Perfil de recursos das sessões
+    profile_frame = ttk.Frame(options_frame)
+    profile_frame.pack(fill=tk.X, pady=2)
+
+    ttk.Label(profile_frame, text='Perfil de recursos:').pack(side=tk.LEFT, padx=(0, 10))
+    profile_combo = ttk.Combobox(
+        profile_frame,
+        textvariable=profile_var,
+        values=list(LAUNCH_PROFILES),
+        width=10,
+        state="readonly"
+    )
+    profile_combo.pack(side=tk.LEFT)
+    profile_combo.bind("<<ComboboxSelected>>", update_pool_settings)
+
+    # Pool de janelas pré-carregadas
+    pool_frame = ttk.Frame(options_frame)
+    pool_frame.pack(fill=tk.X, pady=2)
+
+    ttk.Label(pool_frame, text='Janelas pré-carregadas:').pack(side=tk.LEFT, padx=(0, 10))
+    pool_size_entry = ttk.Entry(pool_frame, width=6)
+    pool_size_entry.insert(0, '0')
+    pool_size_entry.pack(side=tk.LEFT)
+    pool_size_entry.bind('<FocusOut>', update_pool_settings)
+    pool_size_entry.bind('<Return>', update_pool_settings)
+
+    # Governador de recursos: limites de memória e CPU do sistema
+    governor_frame = ttk.Frame(options_frame)
+    governor_frame.pack(fill=tk.X, pady=2)
+
+    ttk.Checkbutton(
+        governor_frame,
+        text='Economizar sob pressão · memória %',
+        variable=governor_var
+    ).pack(side=tk.LEFT, padx=(0, 5))
+    memory_high_entry = ttk.Entry(governor_frame, width=4)
+    memory_high_entry.insert(0, str(GOVERNOR_DEFAULTS['memory_high']))
+    memory_high_entry.pack(side=tk.LEFT)
+    ttk.Label(governor_frame, text='CPU %').pack(side=tk.LEFT, padx=(10, 5))
+    cpu_high_entry = ttk.Entry(governor_frame, width=4)
+    cpu_high_entry.insert(0, str(GOVERNOR_DEFAULTS['cpu_high']))
+    cpu_high_entry.pack(side=tk.LEFT)
+
+    # Supervisor: reabre as sessões que falham ou morrem, no mesmo lugar da grade
+    supervisor_frame = ttk.Frame(options_frame)
+    supervisor_frame.pack(fill=tk.X, pady=2)
+
+    ttk.Checkbutton(
+        supervisor_frame,
+        text='Reabrir sessões que caírem · tentativas',
+        variable=supervisor_var
+    ).pack(side=tk.LEFT, padx=(0, 5))
+    max_failures_entry = ttk.Entry(supervisor_frame, width=4)
+    max_failures_entry.insert(0, str(SUPERVISOR_DEFAULTS['max_failures']))
+    max_failures_entry.pack(side=tk.LEFT)
+
+    # Botão de tema
+    theme_button = ttk.Button(options_frame, text="Tema Escuro", command=toggle_theme)
+    theme_button.pack(anchor=tk.W, pady=5)
+
+    # Botão para atualizar as configurações de monitor
+    refresh_button = ttk.Button(options_frame, text="Atualizar Monitores", command=refresh_monitor_settings)
+    refresh_button.pack(anchor=tk.W, pady=5)
+
+    # Frame para configurações de monitor
+    monitor_settings_frame = ttk.Frame(main_frame)
+    # Será exibido apenas se houver mais de um monitor
+
+    # Prévia
+    preview_frame = ttk.Frame(main_frame)
+    preview_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+
+    ttk.Label(preview_frame, text='Prévia da distribuição:').pack(anchor=tk.W)
+    preview_canvas = tk.Canvas(preview_frame, width=350, height=250, bg=THEMES['light']['canvas_bg'])
+    preview_canvas.pack(pady=5)
+
+    # Botões
+    button_frame = ttk.Frame(main_frame)
+    button_frame.pack(fill=tk.X, pady=10)
+
+    start_button = ttk.Button(button_frame, text='Iniciar Teste', command=start)
+    start_button.pack(side=tk.LEFT, padx=5)
+
+    stop_button = ttk.Button(button_frame, text='Fechar Todas', command=lambda: threading.Thread(target=close_all, daemon=True).start())
+    stop_button.pack(side=tk.LEFT, padx=5)
+
+    restore_button = ttk.Button(button_frame, text='Restaurar Execução', command=restore_run)
+    restore_button.pack(side=tk.LEFT, padx=5)
+
+    dashboard_button = ttk.Button(button_frame, text='Painel de Sessões', command=open_dashboard)
+    dashboard_button.pack(side=tk.LEFT, padx=5)
+
+    # Status
+    status_frame = ttk.Frame(main_frame)
+    status_frame.pack(fill=tk.X, pady=5)
+
+    status_label = ttk.Label(status_frame, textvariable=status_var)
+    status_label.pack(anchor=tk.W)
+
+    # Aplicar tema inicial
+    apply_theme()
 
-# Configuração da interface
-root = tk.Tk()
-root.geometry('500x700')  # Aumentado para acomodar as configurações de monitor
-root.title('Multi Chrome Tester')
-root.protocol("WM_DELETE_WINDOW", perform_safe_close)
+    # Começar a aplicar os eventos das threads de trabalho
+    drain_ui_events()
+    startup_profile.mark('janela criada')
 
-# Variáveis
-auto_close_var = tk.BooleanVar(value=True)
-incognito_var = tk.BooleanVar(value=False)
-auto_arrange_var = tk.BooleanVar(value=True)
-status_var = tk.StringVar(value="Pronto para iniciar")
-
-# Estilo
-style = ttk.Style(root)
-style.theme_use('clam')
-
-# Layout
-main_frame = ttk.Frame(root, padding=20)
-main_frame.pack(fill=tk.BOTH, expand=True)
-
-# URL
-url_frame = ttk.Frame(main_frame)
-url_frame.pack(fill=tk.X, pady=5)
-
-ttk.Label(url_frame, text='URL do site:').pack(anchor=tk.W)
-url_entry = ttk.Entry(url_frame, width=50)
-url_entry.pack(fill=tk.X, pady=5)
-
-# Sessões
-num_frame = ttk.Frame(main_frame)
-num_frame.pack(fill=tk.X, pady=5)
-
-ttk.Label(num_frame, text='Número de sessões:').pack(anchor=tk.W)
-num_entry = ttk.Entry(num_frame)
-num_entry.pack(fill=tk.X, pady=5)
-num_entry.bind('<KeyRelease>', update_preview)
-
-# Opções
-options_frame = ttk.Frame(main_frame)
-options_frame.pack(fill=tk.X, pady=5)
-
-ttk.Checkbutton(
-    options_frame,
-    text='Organizar janelas automaticamente',
-    variable=auto_arrange_var,
-    command=update_preview
-).pack(anchor=tk.W, pady=2)
-
-ttk.Checkbutton(
-    options_frame,
-    text='Fechar outras janelas quando uma recarregar',
-    variable=auto_close_var
-).pack(anchor=tk.W, pady=2)
-
-ttk.Checkbutton(
-    options_frame,
-    text='Modo anônimo',
-    variable=incognito_var
-).pack(anchor=tk.W, pady=2)
-
-# Botão de tema
-theme_button = ttk.Button(options_frame, text="Tema Escuro", command=toggle_theme)
-theme_button.pack(anchor=tk.W, pady=5)
-
-# Botão para atualizar as configurações de monitor
-refresh_button = ttk.Button(options_frame, text="Atualizar Monitores", command=refresh_monitor_settings)
-refresh_button.pack(anchor=tk.W, pady=5)
-
-# Frame para configurações de monitor
-monitor_settings_frame = ttk.Frame(main_frame)
-# Será exibido apenas se houver mais de um monitor
-
-# Prévia
-preview_frame = ttk.Frame(main_frame)
-preview_frame.pack(fill=tk.BOTH, expand=True, pady=10)
-
-ttk.Label(preview_frame, text='Prévia da distribuição:').pack(anchor=tk.W)
-preview_canvas = tk.Canvas(preview_frame, width=350, height=250, bg=THEMES['light']['canvas_bg'])
-preview_canvas.pack(pady=5)
-
-# Botões
-button_frame = ttk.Frame(main_frame)
-button_frame.pack(fill=tk.X, pady=10)
-
-start_button = ttk.Button(button_frame, text='Iniciar Teste', command=start)
-start_button.pack(side=tk.LEFT, padx=5)
-
-stop_button = ttk.Button(button_frame, text='Fechar Todas', command=close_sessions)
-stop_button.pack(side=tk.LEFT, padx=5)
-
-# Status
-status_frame = ttk.Frame(main_frame)
-status_frame.pack(fill=tk.X, pady=5)
-
-status_label = ttk.Label(status_frame, textvariable=status_var)
-status_label.pack(anchor=tk.W)
-
-# Aplicar tema inicial
-apply_theme()
-
-# Inicializar as configurações de monitor
-refresh_monitor_settings()
-
-# Inicializar a prévia
-update_preview()
+    # O resto da inicialização roda depois que a janela for desenhada
+    root.after_idle(lambda: root.after(0, finish_startup))
 
-# Iniciar a interface
-root.mainloop()
\ No newline at end of file
+    # Iniciar a interface
+    root.mainloop()
\ No newline at end of file
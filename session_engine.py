@@ -0,0 +1,3371 @@
+"""Motor de sessões do Multi Chrome Tester: abre, monitora e fecha as sessões do Chrome.
+
+Não depende do tkinter; a interface gráfica (multi_chrome_tester.py) e a linha de comando
+(python -m session_engine) são apenas clientes do SessionManager.
+"""
+import argparse
+import array
+import collections
+import concurrent.futures
+import csv
+import ctypes
+import datetime
+import email.utils
+import hashlib
+import http.client
+import json
+import math
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import types
+import urllib.parse
+import urllib.request
+
+# selenium e webdriver_manager só são importados no primeiro uso (ver load_webdriver)
+webdriver = Options = ChromeRemoteConnection = Service = ChromeDriverManager = None
+SharedConnection = GridDriver = None
+_webdriver_lock = threading.Lock()
+
+try:
+    import psutil  # Opcional: usado para medir memória dos processos do Chrome
+except ImportError:
+    psutil = None
+
+try:
+    import websocket  # websocket-client, instalado junto com o selenium
+except ImportError:
+    websocket = None
+
+# Perfis de recursos das sessões: argumentos do Chrome, preferências e recursos bloqueados
+BLOCKED_IMAGES = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico']
+BLOCKED_FONTS = ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot']
+
+BALANCED_ARGS = [
+    '--no-first-run',
+    '--disable-sync',
+    '--disable-component-update',
+    '--disable-background-networking',
+    '--disable-default-apps',
+    '--disable-extensions',
+    '--disable-features=Translate,MediaRouter,OptimizationHints',
+    # A aba observada não pode ter timers atrasados por estar em segundo plano
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--disable-backgrounding-occluded-windows',
+]
+
+LAUNCH_PROFILES = {
+    'lean': {
+        'args': BALANCED_ARGS + [
+            '--disable-gpu',
+            '--renderer-process-limit=1',
+            '--mute-audio',
+        ],
+        'prefs': {
+            'profile.default_content_setting_values.notifications': 2,
+            'profile.default_content_setting_values.geolocation': 2,
+        },
+        'blocked_urls': BLOCKED_IMAGES + BLOCKED_FONTS,
+    },
+    'balanced': {
+        'args': BALANCED_ARGS,
+        'prefs': {
+            'profile.default_content_setting_values.notifications': 2,
+        },
+        'blocked_urls': [],
+    },
+    'full': {
+        'args': [],
+        'prefs': {},
+        'blocked_urls': [],
+    },
+}
+DEFAULT_PROFILE = 'balanced'
+
+# Monitor usado quando não há tela (servidores e execuções pela linha de comando)
+VIRTUAL_MONITOR = types.SimpleNamespace(width=1920, height=1080, x=0, y=0, is_primary=True)
+
+# Função para detectar monitores com identificação
+def detect_monitors():
+    monitors_info = []
+    taskbar_height = 40  # Altura estimada da taskbar
+
+    # Usar screeninfo para obter informações dos monitores
+    try:
+        from screeninfo import get_monitors
+        screen_monitors = get_monitors()
+    except Exception:
+        screen_monitors = []
+    if not screen_monitors:
+        screen_monitors = [VIRTUAL_MONITOR]
+
+    for i, monitor in enumerate(screen_monitors):
+        # Definir o primeiro monitor como primário (ou usar propriedade is_primary se disponível)
+        is_primary = getattr(monitor, 'is_primary', i == 0)
+
+        # Extrair o identificador do monitor
+        # Screeninfo não fornece os nomes DISPLAY1, DISPLAY2, então usamos números sequenciais
+        monitor_id = str(i + 1)
+
+        # Detectar orientação
+        if monitor.width > monitor.height:
+            default_orientation = "Paisagem"
+        else:
+            default_orientation = "Retrato"
+
+        # Adicionar informações do monitor à lista
+        monitors_info.append({
+            'width': monitor.width,
+            'height': monitor.height - taskbar_height if is_primary else monitor.height,
+            'x_offset': monitor.x,
+            'y_offset': monitor.y,
+            'is_primary': is_primary,
+            'id': monitor_id,
+            'default_orientation': default_orientation,
+            'orientation': default_orientation  # Orientação atual (pode ser modificada pelo usuário)
+        })
+
+    # Ordenar para que o monitor principal seja o primeiro
+    monitors_info.sort(key=lambda x: not x['is_primary'])
+
+    return monitors_info
+
+def get_display_signature(widget=None):
+    """Assinatura barata da área de trabalho, usada para perceber mudanças de monitores"""
+    if sys.platform.startswith('win'):
+        metrics = ctypes.windll.user32.GetSystemMetrics
+        # SM_CMONITORS e a posição/tamanho da tela virtual
+        return tuple(metrics(i) for i in (80, 76, 77, 78, 79))
+    if widget is not None:
+        # No X11 com RandR a tela raiz muda de tamanho quando monitores entram ou saem
+        return (widget.winfo_screenwidth(), widget.winfo_screenheight())
+    return None
+
+class MonitorTopology:
+    """Cache imutável da disposição dos monitores, atualizado apenas quando necessário"""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._snapshot = None
+        self._taken_at = 0
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Retorna a disposição atual; só consulta o sistema se o cache expirou ou foi invalidado"""
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._taken_at > self.ttl:
+                self._snapshot = tuple(types.MappingProxyType(m) for m in detect_monitors())
+                self._taken_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+monitor_topology = MonitorTopology()
+
+def get_screen_info():
+    """Cópia dos monitores do cache, que pode ser alterada livremente por quem chama"""
+    return [dict(monitor) for monitor in monitor_topology.snapshot()]
+
+def get_oriented_monitors():
+    """Monitores com as orientações selecionadas pelo usuário aplicadas"""
+    monitors = get_screen_info()
+
+    for monitor in monitors:
+        monitor_id = monitor['id']
+        if monitor_id in monitor_orientations:
+            monitor['orientation'] = monitor_orientations[monitor_id]
+
+            # Ajustar dimensões se a orientação for diferente da padrão
+            if monitor['orientation'] != monitor['default_orientation']:
+                monitor['width'], monitor['height'] = monitor['height'], monitor['width']
+
+    return monitors
+
+monitor_orientations = {}  # Orientações selecionadas pelo usuário, por id do monitor
+
+def load_webdriver():
+    """Importa selenium e webdriver_manager na primeira chamada; as seguintes não fazem nada
+
+    Os dois levam a maior parte do tempo de abertura do programa: a interface chama esta função em
+    segundo plano depois de desenhar a janela, e o motor antes de criar a primeira sessão.
+    """
+    global webdriver, Options, ChromeRemoteConnection, Service, ChromeDriverManager, SharedConnection, GridDriver
+    if GridDriver is not None:
+        return
+    with _webdriver_lock:
+        if GridDriver is not None:
+            return
+        from selenium import webdriver as selenium_webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.remote_connection import ChromeRemoteConnection
+        from selenium.webdriver.chrome.service import Service
+        from webdriver_manager.chrome import ChromeDriverManager
+        webdriver = selenium_webdriver
+
+        class SharedConnection(ChromeRemoteConnection):
+            """Conexão HTTP de um nó, compartilhada por todas as sessões abertas nele
+
+            O quit de cada driver fecha a conexão do seu command_executor; aqui isso é ignorado para que
+            as outras sessões continuem reaproveitando as conexões abertas.
+            """
+
+            def close(self):
+                pass
+
+            def close_all(self):
+                super().close()
+
+        # Definida por último: GridDriver preenchido indica que tudo já foi carregado
+        class GridDriver(webdriver.Remote):
+            """Sessão remota do Chrome que devolve a vaga ao GridBackend ao fechar"""
+
+            def __init__(self, backend, node, options):
+                self._backend = backend
+                self._node = node
+                super().__init__(command_executor=node.connection, options=options)
+                if not node.local:
+                    # O endereço do DevTools é da máquina do nó; a detecção dessas sessões fica no polling
+                    self.caps.get('goog:chromeOptions', {}).pop('debuggerAddress', None)
+
+            def execute_cdp_cmd(self, cmd, cmd_args):
+                return self.execute('executeCdpCommand', {'cmd': cmd, 'params': cmd_args})['value']
+
+            def quit(self):
+                try:
+                    super().quit()
+                finally:
+                    self._backend.release(self._node)
+
+def build_chrome_options(position, incognito, headless=False, profile=DEFAULT_PROFILE, user_data_dir=None):
+    """Opções do Chrome para uma sessão: posição, modo e perfil de recursos"""
+    load_webdriver()
+    launch_profile = LAUNCH_PROFILES[profile]
+    chrome_options = Options()
+    chrome_options.add_argument(f"--window-size={position[0]},{position[1]}")
+    chrome_options.add_argument(f"--window-position={position[2]},{position[3]}")
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
+
+    if incognito:
+        chrome_options.add_argument('--incognito')
+
+    if headless:
+        # Sem janela: a posição vira apenas um layout virtual
+        chrome_options.add_argument('--headless=new')
+
+    if user_data_dir:
+        chrome_options.add_argument(f"--user-data-dir={user_data_dir}")
+
+    for argument in launch_profile['args']:
+        chrome_options.add_argument(argument)
+    if launch_profile['prefs']:
+        chrome_options.add_experimental_option('prefs', launch_profile['prefs'])
+
+    return chrome_options
+
+def block_resources(driver, profile):
+    """Aplica os bloqueios de recursos do perfil"""
+    blocked_urls = LAUNCH_PROFILES[profile]['blocked_urls']
+    if blocked_urls:
+        # Bloqueio via DevTools para poder ser desfeito na janela que passar da fila
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_urls})
+
+def create_driver(position, incognito, service=None, headless=False, profile=DEFAULT_PROFILE,
+                  user_data_dir=None):
+    """Cria um driver Chrome já posicionado, sem navegar para nenhuma URL"""
+    chrome_options = build_chrome_options(position, incognito, headless, profile, user_data_dir)
+
+    if service:
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+    else:
+        driver = webdriver.Chrome(options=chrome_options)
+
+    block_resources(driver, profile)
+    return driver
+
+def reset_browser_state(driver, profile):
+    """Apaga cookies, cache e storage de todas as origens visitadas e troca a aba por uma nova.
+
+    delete_all_cookies só alcança o domínio da página atual; cookies de terceiros, de redirecionamentos e
+    tokens de fila no localStorage/IndexedDB passariam para a próxima sessão que reaproveitasse o driver.
+    """
+    origins = set()
+    try:
+        # Origem da página atual e de tudo que ela carregou
+        origins.update(driver.execute_script(
+            "return [window.location.origin].concat(performance.getEntriesByType('resource')"
+            ".map(function (entry) { try { return new URL(entry.name).origin; } catch (e) { return null; } }));"))
+    except Exception:
+        pass
+    for cookie in driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies']:
+        domain = cookie['domain'].lstrip('.')
+        origins.update((f"https://{domain}", f"http://{domain}"))
+
+    driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+    driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+    for origin in origins:
+        if origin and origin.startswith('http'):
+            driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+
+    # sessionStorage e histórico pertencem à aba: abrir uma nova em about:blank e fechar a antiga
+    old_tab = driver.current_window_handle
+    driver.switch_to.new_window('tab')
+    new_tab = driver.current_window_handle
+    driver.switch_to.window(old_tab)
+    driver.close()
+    driver.switch_to.window(new_tab)
+    # A sessão DevTools é por aba, então os bloqueios do perfil precisam ser refeitos
+    block_resources(driver, profile)
+
+def unblock_resources(driver):
+    """Libera imagens e fontes bloqueadas pelo perfil de recursos"""
+    try:
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': []})
+    except Exception:
+        pass
+
+class GridBackend:
+    """Cria as sessões por webdriver.Remote em nós do Selenium Grid ou standalone
+
+    Usado como `driver_factory` do SessionManager. Cada nó (URL do hub, do standalone ou do nó)
+    tem uma conexão HTTP reaproveitada por todas as suas sessões e um limite de sessões simultâneas;
+    cada abertura vai para o nó com mais vagas livres anunciadas em /status.
+    """
+
+    local = False  # Não usa chromedriver nem perfis locais
+
+    def __init__(self, urls, max_sessions_per_node=0, status_ttl=2.0, wait_timeout=120):
+        load_webdriver()
+        self.max_sessions_per_node = max_sessions_per_node
+        self.status_ttl = status_ttl
+        self.wait_timeout = wait_timeout
+        self.nodes = []
+        for url in urls:
+            if '://' not in url:
+                url = 'http://' + url
+            url = url.rstrip('/')
+            if urllib.parse.urlsplit(url).port is None:
+                url += ':4444'
+            self.nodes.append(types.SimpleNamespace(
+                url=url,
+                connection=SharedConnection(url, keep_alive=True),
+                local=urllib.parse.urlsplit(url).hostname in ('localhost', '127.0.0.1', '::1'),
+                online=False,
+                free=0,  # Vagas livres anunciadas na última consulta
+                reserved=0,  # Aberturas em andamento
+                opened=collections.deque(),  # Horários das aberturas que terminaram depois da última consulta
+                active=0,  # Sessões desta execução no nó (abrindo ou abertas)
+            ))
+        self._changed = threading.Condition()
+        self._refreshed_at = 0
+        self._refreshing = False
+
+    def __call__(self, position, incognito, service=None, headless=False, profile=DEFAULT_PROFILE,
+                 user_data_dir=None):
+        # Perfis locais (user_data_dir) não existem na máquina do nó
+        options = build_chrome_options(position, incognito, headless, profile)
+        node = self._reserve()
+        try:
+            driver = GridDriver(self, node, options)
+        except Exception:
+            self._settle(node, opened=False)
+            self.release(node)
+            raise
+        self._settle(node, opened=True)
+        try:
+            block_resources(driver, profile)
+        except Exception as e:
+            print(f"Erro ao bloquear recursos na sessão remota: {e}")
+        return driver
+
+    def release(self, node):
+        with self._changed:
+            node.active = max(0, node.active - 1)
+            self._changed.notify_all()
+
+    def free_slots(self):
+        """Vagas disponíveis por nó, considerando o limite configurado"""
+        self._refresh()
+        with self._changed:
+            return {node.url: self._available(node) for node in self.nodes}
+
+    def close(self):
+        for node in self.nodes:
+            node.connection.close_all()
+
+    def _available(self, node):
+        if not node.online:
+            return 0
+        available = node.free - node.reserved - len(node.opened)
+        if self.max_sessions_per_node:
+            available = min(available, self.max_sessions_per_node - node.active)
+        return available
+
+    def _reserve(self):
+        """Escolhe o nó com mais vagas livres, esperando uma vaga se todos estiverem cheios"""
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            self._refresh_if_stale()
+            with self._changed:
+                node = max(self.nodes, key=self._available, default=None)
+                if node is not None and self._available(node) > 0:
+                    node.reserved += 1
+                    node.active += 1
+                    return node
+                if time.monotonic() > deadline:
+                    raise RuntimeError("Nenhum nó do Grid com vaga livre")
+                # Acordado por uma abertura que terminou, uma sessão fechada ou uma consulta nova
+                self._changed.wait(1.0)
+
+    def _settle(self, node, opened):
+        """Uma abertura terminou; se abriu, a sessão conta como ocupada até aparecer em /status"""
+        with self._changed:
+            node.reserved = max(0, node.reserved - 1)
+            if opened:
+                node.opened.append(time.monotonic())
+            self._changed.notify_all()
+
+    def _refresh_if_stale(self):
+        """Consulta /status se a última consulta venceu e nenhuma outra thread já estiver consultando"""
+        with self._changed:
+            if self._refreshing or time.monotonic() - self._refreshed_at <= self.status_ttl:
+                return
+            self._refreshing = True
+        try:
+            self._refresh()
+        finally:
+            with self._changed:
+                self._refreshing = False
+
+    def _refresh(self):
+        """Consulta /status de todos os nós em paralelo, sem segurar o lock durante as requisições"""
+        started = time.monotonic()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(self.nodes))) as executor:
+            results = list(executor.map(self._fetch_free, self.nodes))
+
+        with self._changed:
+            for node, (free, error) in zip(self.nodes, results):
+                if error is not None:
+                    if node.online:
+                        print(f"Nó do Grid {node.url} indisponível: {error}")
+                    node.online = False
+                    continue
+                node.online = True
+                node.free = free
+                # Aberturas que terminaram antes da consulta já aparecem como ocupadas em /status;
+                # as em andamento continuam em `reserved` até terminarem
+                while node.opened and node.opened[0] < started:
+                    node.opened.popleft()
+            self._refreshed_at = time.monotonic()
+            self._changed.notify_all()
+
+    @staticmethod
+    def _fetch_free(node):
+        """Retorna (vagas livres de Chrome anunciadas pelo nó, None) ou (None, erro)"""
+        try:
+            with urllib.request.urlopen(f"{node.url}/status", timeout=2) as response:
+                status = json.loads(response.read().decode('utf-8'))['value']
+        except Exception as e:
+            return None, e
+
+        free = 0
+        # O hub e o standalone listam os nós em 'nodes'; a URL de um nó responde só com o próprio 'node'
+        grid_nodes = status.get('nodes') or ([status['node']] if status.get('node') else [])
+        for grid_node in grid_nodes:
+            if grid_node.get('availability', 'UP') != 'UP':
+                continue
+            for slot in grid_node.get('slots', []):
+                browser = slot.get('stereotype', {}).get('browserName', 'chrome')
+                if slot.get('session') is None and browser == 'chrome':
+                    free += 1
+        return free, None
+
+def open_session(url, position, incognito, service=None, headless=False, profile=DEFAULT_PROFILE,
+                 user_data_dir=None, driver_factory=create_driver, timings=None):
+    """Cria o driver e abre a URL; se `timings` for um dict, registra 'created' e 'loaded' (perf_counter)"""
+    try:
+        driver = driver_factory(position, incognito, service, headless, profile, user_data_dir)
+        if timings is not None:
+            timings['created'] = time.perf_counter()
+        driver.get(url)
+        if timings is not None:
+            timings['loaded'] = time.perf_counter()
+        return driver
+    except Exception as e:
+        print(f"Erro ao abrir sessão: {e}")
+        return None
+
+def get_driver_memory_mb(driver):
+    """Retorna a memória (RSS) do chromedriver e do Chrome associado, em MB"""
+    if psutil is None:
+        return None
+
+    try:
+        process = psutil.Process(driver.service.process.pid)
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+    except Exception:
+        return None
+
+def summarize_memory(measurements):
+    """Resume a memória das sessões (MB) para a barra de status"""
+    measurements = [mb for mb in measurements if mb is not None]
+    if not measurements:
+        return ""
+
+    total = sum(measurements)
+    return f"{total / len(measurements):.0f} MB/sessão, {total / 1024:.1f} GB no total"
+
+def get_navigation_timing(driver):
+    """Tempos de navegação da página atual (performance.timing), em ms desde o início da navegação"""
+    try:
+        timing = driver.execute_script("return window.performance.timing.toJSON();")
+    except Exception:
+        return None
+    if not isinstance(timing, dict) or not timing.get('navigationStart'):
+        return None
+
+    start = timing['navigationStart']
+
+    def since_start(name):
+        value = timing.get(name) or 0
+        return value - start if value >= start else None
+
+    return {
+        'ttfb_ms': since_start('responseStart'),
+        'dom_content_loaded_ms': since_start('domContentLoadedEventEnd'),
+        'load_ms': since_start('loadEventEnd'),
+    }
+
+def get_chrome_major_version():
+    """Detecta a versão principal do Google Chrome instalado (ex.: '126'), ou None"""
+    if sys.platform.startswith('win'):
+        import winreg
+        for hive in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+            try:
+                with winreg.OpenKey(hive, r"Software\Google\Chrome\BLBeacon") as key:
+                    version = winreg.QueryValueEx(key, "version")[0]
+                    return version.split('.')[0]
+            except OSError:
+                pass
+        return None
+
+    if sys.platform.startswith('darwin'):
+        candidates = ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"]
+    else:
+        candidates = ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser"]
+
+    for binary in candidates:
+        try:
+            output = subprocess.run([binary, '--version'], capture_output=True, text=True, timeout=5).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        # Ex.: "Google Chrome 126.0.6478.126"
+        for part in output.split():
+            if part[:1].isdigit() and '.' in part:
+                return part.split('.')[0]
+    return None
+
+class DriverResolver:
+    """Resolve o caminho do chromedriver com cache local por versão principal do Chrome"""
+
+    def __init__(self, cache_file, configured_path=None, offline=False):
+        self.cache_file = cache_file
+        self.configured_path = configured_path
+        self.offline = offline
+        self._path = None  # Resultado já resolvido nesta execução
+        self._error = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+
+    def prefetch(self):
+        """Resolve em segundo plano para que o caminho esteja pronto antes do primeiro teste"""
+        if self._thread is None and self._path is None:
+            # Nova tentativa depois de uma falha: resolve() deve esperar por ela, e não ler o erro anterior
+            self._error = None
+            self._done.clear()
+            self._thread = threading.Thread(target=self._resolve_once, daemon=True)
+            self._thread.start()
+
+    def resolve(self):
+        """Retorna o caminho do chromedriver; na segunda chamada em diante é só uma leitura"""
+        load_webdriver()  # Quem resolve o caminho em seguida cria um Service
+        if self._path is not None:
+            return self._path
+        if self._thread is not None:
+            self._done.wait()
+        else:
+            self._resolve_once()
+        if self._path is None:
+            raise RuntimeError(self._error or "chromedriver não encontrado")
+        return self._path
+
+    def _resolve_once(self):
+        with self._lock:
+            if self._path is None:
+                try:
+                    self._path = self._lookup()
+                except Exception as e:
+                    self._error = str(e)
+                    # Permitir nova tentativa na próxima chamada
+                    self._thread = None
+            self._done.set()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self, cache):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, indent=2)
+        except OSError as e:
+            print(f"Erro ao salvar cache do chromedriver: {e}")
+
+    def _lookup(self):
+        # 1. Caminho configurado explicitamente
+        if self.configured_path:
+            if os.path.isfile(self.configured_path):
+                return self.configured_path
+            raise RuntimeError(f"chromedriver configurado não existe: {self.configured_path}")
+
+        # 2. Cache local para a versão principal do Chrome instalado
+        major = get_chrome_major_version() or 'desconhecida'
+        cache = self._load_cache()
+        cached = cache.get(major)
+        if cached and os.path.isfile(cached):
+            return cached
+
+        if self.offline:
+            # Sem rede: aceitar qualquer driver já conhecido ou um chromedriver no PATH
+            for path in list(cache.values()) + [shutil.which('chromedriver')]:
+                if path and os.path.isfile(path):
+                    return path
+            raise RuntimeError("Modo offline: nenhum chromedriver em cache ou no PATH")
+
+        # 3. Download/verificação pelo webdriver_manager, apenas quando não há cache
+        load_webdriver()
+        path = ChromeDriverManager().install()
+        cache[major] = path
+        self._save_cache(cache)
+        return path
+
+FICLONE = 0x40049409  # ioctl do Linux para reflink (btrfs, xfs)
+PROFILE_SKIPPED_FILES = {'SingletonLock', 'SingletonCookie', 'SingletonSocket', 'lockfile'}
+PROFILE_SKIPPED_DIRS = {'Crashpad', 'BrowserMetrics', 'Session Storage'}
+# Cookies que o perfil modelo mantém: só os de consentimento (banners de cookies/LGPD/GDPR). Os demais,
+# como tokens de fila e de sessão, dariam a mesma identidade a todas as sessões clonadas
+CONSENT_COOKIE_PATTERN = re.compile(
+    r'consent|gdpr|lgpd|euconsent|cookielaw|cookie_?notice|cookie_?accept|cookiesaccepted|cookie_?policy|optanon|'
+    r'didomi|_iub_cs|cc_cookie|borlabs|cookieyes|cmplz|usprivacy|OTAdditionalConsentString',
+    re.IGNORECASE,
+)
+
+def clone_file(src, dst):
+    """Copia um arquivo do perfil modelo com o menor custo possível de disco"""
+    if sys.platform.startswith('linux'):
+        try:
+            import fcntl
+            with open(src, 'rb') as source, open(dst, 'wb') as target:
+                fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+            return
+        except (ImportError, OSError):
+            pass
+
+    # Arquivos externos do cache (f_xxxxxx) nunca são reescritos, então podem ser compartilhados
+    if os.path.basename(src).startswith('f_') and 'Cache_Data' in src:
+        try:
+            if os.path.exists(dst):
+                os.remove(dst)  # Sobra de uma tentativa de reflink
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+
+    shutil.copy2(src, dst)
+
+class ProfileTemplate:
+    """Perfil do Chrome aquecido uma vez e clonado para cada sessão"""
+
+    def __init__(self, templates_dir, max_age=12 * 3600, settle_time=3):
+        self.templates_dir = templates_dir
+        self.max_age = max_age
+        self.settle_time = settle_time
+        # Clones no mesmo sistema de arquivos do modelo: reflink e hardlink não atravessam sistemas de
+        # arquivos, e numa pasta temporária (tmpfs) cada sessão viraria uma cópia inteira do perfil na memória
+        self.run_dir = os.path.join(templates_dir, f".clones-{os.getpid()}")
+        self._template = None
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def template_dir(self, url):
+        domain = get_domain(url) or 'default'
+        return os.path.join(self.templates_dir, ''.join(c if c.isalnum() or c in '.-' else '_' for c in domain))
+
+    def ensure(self, url, driver_path):
+        """Garante um perfil modelo recente para a URL, criando-o se necessário"""
+        self.remove_stale_clones()
+        template = self.template_dir(url)
+        if not os.path.isdir(template) or time.time() - os.path.getmtime(template) > self.max_age:
+            self.build(url, driver_path)
+        self._template = template
+
+    def build(self, url, driver_path):
+        """Abre a URL uma vez em um perfil novo para preencher o cache e os cookies de consentimento"""
+        template = self.template_dir(url)
+        building = template + '.building'
+        shutil.rmtree(building, ignore_errors=True)
+        os.makedirs(os.path.dirname(template), exist_ok=True)
+
+        driver = create_driver((1280, 800, 0, 0), False, make_service(driver_path), headless=True,
+                               profile='full', user_data_dir=building)
+        try:
+            driver.get(url)
+            time.sleep(self.settle_time)  # Deixar recursos e cookies terminarem de gravar
+            self.strip_identity(driver)
+        finally:
+            driver.quit()
+
+        shutil.rmtree(template, ignore_errors=True)
+        os.replace(building, template)
+        os.utime(template)
+
+    def strip_identity(self, driver):
+        """Apaga do perfil modelo tudo que identifica a visita, mantendo só o cache e os cookies de consentimento"""
+        cookies = driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies']
+        for cookie in cookies:
+            if not CONSENT_COOKIE_PATTERN.search(cookie['name']):
+                driver.execute_cdp_cmd('Network.deleteCookies', {
+                    'name': cookie['name'], 'domain': cookie['domain'], 'path': cookie['path']})
+        # Storage das origens visitadas (tokens de fila também ficam no localStorage e no IndexedDB)
+        origins = {f"{'https' if cookie.get('secure') else 'http'}://{cookie['domain'].lstrip('.')}"
+                   for cookie in cookies}
+        origins.add(driver.execute_script("return window.location.origin;"))
+        for origin in origins:
+            if origin and origin != 'null':
+                driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+                    'origin': origin,
+                    'storageTypes': 'local_storage,indexeddb,websql,service_workers,cache_storage,shader_cache',
+                })
+
+    def remove_stale_clones(self):
+        """Remove clones deixados por execuções que terminaram sem cleanup (ex.: o programa caiu)"""
+        if psutil is None:
+            return
+        try:
+            names = os.listdir(self.templates_dir)
+        except OSError:
+            return
+        for name in names:
+            prefix, _, pid = name.partition('-')
+            if prefix == '.clones' and pid.isdigit() and int(pid) != os.getpid() and not psutil.pid_exists(int(pid)):
+                shutil.rmtree(os.path.join(self.templates_dir, name), ignore_errors=True)
+
+    def clone(self):
+        """Cria uma cópia do perfil modelo para uma nova sessão e retorna o diretório"""
+        with self._lock:
+            self._counter += 1
+            target = os.path.join(self.run_dir, f"sessao-{self._counter}")
+
+        for current, dirs, files in os.walk(self._template):
+            dirs[:] = [d for d in dirs if d not in PROFILE_SKIPPED_DIRS]
+            relative = os.path.relpath(current, self._template)
+            destination = os.path.normpath(os.path.join(target, relative))
+            os.makedirs(destination, exist_ok=True)
+            for name in files:
+                if name not in PROFILE_SKIPPED_FILES:
+                    clone_file(os.path.join(current, name), os.path.join(destination, name))
+
+        return target
+
+    def cleanup(self):
+        """Remove todos os clones desta execução de uma só vez"""
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+
+def make_service(driver_path):
+    """Service do chromedriver; fora do Windows ele abre um grupo de processos próprio, para que
+    kill_pids derrube o Chrome junto mesmo sem psutil"""
+    load_webdriver()
+    if sys.platform.startswith('win'):
+        return Service(driver_path)
+    return Service(driver_path, popen_kw={'start_new_session': True})
+
+def get_driver_pids(driver):
+    """Retorna os PIDs do chromedriver e de todos os processos do Chrome iniciados por ele"""
+    try:
+        pid = driver.service.process.pid
+    except Exception:
+        return []
+
+    pids = [pid]
+    if psutil is not None:
+        try:
+            pids.extend(child.pid for child in psutil.Process(pid).children(recursive=True))
+        except psutil.Error:
+            pass
+    return pids
+
+def kill_pids(pids):
+    """Encerra à força uma lista de processos (chromedriver e Chrome)"""
+    if psutil is not None:
+        for pid in pids:
+            try:
+                psutil.Process(pid).kill()
+            except psutil.Error:
+                pass
+        return
+
+    if not pids:
+        return
+
+    if sys.platform.startswith('win'):
+        # Sem psutil, o taskkill /T derruba a árvore de processos a partir do chromedriver
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(pids[0])],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    else:
+        # Sem psutil não há como listar os filhos: o chromedriver criado por make_service lidera um
+        # grupo de processos que inclui o Chrome, então o grupo inteiro é encerrado
+        try:
+            if os.getpgid(pids[0]) == pids[0]:
+                os.killpg(pids[0], signal.SIGKILL)
+                return
+        except OSError:
+            pass
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+def teardown_drivers(drivers_to_close, deadline=2.0, close=None, on_killed=None):
+    """Fecha todos os drivers em paralelo; os que falharem ou passarem do prazo são encerrados pelo PID.
+
+    `on_killed(driver)` é chamado antes de encerrar à força os que passaram do prazo (ex.: DriverPool.forget,
+    para que um release que termine depois não devolva ao pool um driver já encerrado).
+    Retorna (fechados normalmente, encerrados à força).
+    """
+    drivers_to_close = list(drivers_to_close)
+    if not drivers_to_close:
+        return 0, 0
+
+    close = close or (lambda driver: driver.quit())
+    # Coletar os PIDs antes do quit, enquanto a árvore de processos ainda está intacta
+    pids = {driver: get_driver_pids(driver) for driver in drivers_to_close}
+
+    results = {}  # driver -> True se fechou sem erro
+
+    def close_one(driver):
+        try:
+            close(driver)
+            results[driver] = True
+        except Exception:
+            results[driver] = False
+
+    # Threads daemon: um quit travado não pode impedir a saída do programa
+    threads = [threading.Thread(target=close_one, args=(driver,), daemon=True) for driver in drivers_to_close]
+    for thread in threads:
+        thread.start()
+
+    end = time.monotonic() + deadline
+    for thread in threads:
+        thread.join(max(0, end - time.monotonic()))
+
+    clean = 0
+    killed = 0
+    for driver in drivers_to_close:
+        if results.get(driver):
+            clean += 1
+        else:
+            if on_killed is not None and driver not in results:
+                on_killed(driver)  # Ainda fechando: o close pode terminar depois de encerrado
+            kill_pids(pids[driver])
+            killed += 1
+
+    return clean, killed
+
+class DriverPool:
+    """Mantém drivers Chrome ociosos em about:blank, já posicionados, prontos para uso"""
+
+    def __init__(self, size=0, max_uses=10, max_memory_mb=1024, driver_factory=create_driver):
+        self.driver_factory = driver_factory
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.driver_path = None
+        self.incognito = False
+        self.profile = DEFAULT_PROFILE
+        self.positions = []
+        self._idle = collections.deque()  # (driver, posição)
+        self._uses = {}  # Número de usos de cada driver criado pelo pool
+        self._killed = set()  # Drivers encerrados pelo PID enquanto o release ainda rodava
+        self._creating = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def configure(self, size=None, driver_path=None, incognito=None, positions=None, profile=None):
+        """Atualiza a configuração do pool e descarta drivers incompatíveis"""
+        stale = []
+        with self._lock:
+            if size is not None:
+                self.size = max(0, size)
+            if driver_path is not None:
+                self.driver_path = driver_path
+            if positions is not None:
+                self.positions = list(positions)
+            changed = (incognito is not None and incognito != self.incognito) or \
+                (profile is not None and profile != self.profile)
+            if changed:
+                # Modo anônimo e perfil são definidos na criação do Chrome, então os drivers atuais não servem
+                if incognito is not None:
+                    self.incognito = incognito
+                if profile is not None:
+                    self.profile = profile
+                stale.extend(self._idle)
+                self._idle.clear()
+            while len(self._idle) > self.size:
+                stale.append(self._idle.pop())
+
+        if stale:
+            teardown_drivers([driver for driver, _ in stale], close=self._discard)
+
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        """Inicia a thread de reabastecimento, se ainda não estiver rodando"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._refill_loop, daemon=True)
+            self._thread.start()
+
+    @property
+    def local(self):
+        """O pool só guarda janelas locais: num backend remoto elas ocupariam vagas do Grid ociosas"""
+        return getattr(self.driver_factory, 'local', True)
+
+    def set_driver_factory(self, driver_factory):
+        """Troca o backend; os drivers ociosos criados pelo anterior são encerrados"""
+        with self._lock:
+            if driver_factory is self.driver_factory:
+                return
+            self.driver_factory = driver_factory
+            stale = [driver for driver, _ in self._idle]
+            self._idle.clear()
+        if stale:
+            threading.Thread(target=teardown_drivers, args=(stale,), kwargs={'close': self._discard},
+                             daemon=True).start()
+        self._wakeup.set()
+
+    def matches(self, incognito, profile):
+        """Indica se os drivers do pool foram criados com essas opções (e no backend atual)"""
+        return self.local and self.incognito == incognito and self.profile == profile
+
+    def idle_count(self):
+        with self._lock:
+            return len(self._idle)
+
+    def checkout(self, position):
+        """Retira um driver ocioso do pool, preferindo um que já esteja na posição pedida"""
+        with self._lock:
+            if not self._idle:
+                return None
+
+            chosen = None
+            for item in self._idle:
+                if tuple(item[1]) == tuple(position):
+                    chosen = item
+                    break
+            if chosen is None:
+                chosen = self._idle[0]
+            self._idle.remove(chosen)
+
+        driver, driver_position = chosen
+        self._wakeup.set()
+
+        try:
+            if tuple(driver_position) != tuple(position):
+                driver.set_window_rect(x=position[2], y=position[3], width=position[0], height=position[1])
+            self._uses[driver] = self._uses.get(driver, 0) + 1
+            return driver
+        except Exception:
+            # Driver morreu enquanto estava ocioso
+            teardown_drivers([driver], close=self._discard)
+            return None
+
+    def release(self, driver):
+        """Devolve um driver ao pool ou o encerra se atingiu o limite de usos ou de memória.
+
+        Erros ao encerrar o driver são repassados, para o teardown_drivers encerrá-lo pelo PID.
+        """
+        if driver not in self._uses or self._stopped:
+            self._discard(driver)
+            return
+
+        if self._uses[driver] >= self.max_uses:
+            self._discard(driver)
+            return
+
+        memory = get_driver_memory_mb(driver)
+        if memory is not None and memory > self.max_memory_mb:
+            self._discard(driver)
+            return
+
+        try:
+            reset_browser_state(driver, self.profile)
+            rect = driver.get_window_rect()
+            position = (rect['width'], rect['height'], rect['x'], rect['y'])
+        except Exception:
+            self._discard(driver)
+            return
+
+        with self._lock:
+            if driver in self._killed:
+                # Passou do prazo do teardown e já foi encerrado pelo PID
+                self._killed.discard(driver)
+                self._uses.pop(driver, None)
+                return
+            if len(self._idle) < self.size:
+                self._idle.append((driver, position))
+                return
+
+        self._discard(driver)
+
+    def forget(self, driver):
+        """Marca um driver encerrado pelo PID para que não volte ao pool"""
+        with self._lock:
+            self._killed.add(driver)
+            self._uses.pop(driver, None)
+            for item in self._idle:
+                if item[0] is driver:
+                    self._idle.remove(item)
+                    break
+
+    def shutdown(self):
+        """Para o reabastecimento e retorna os drivers ociosos para serem encerrados"""
+        self._stopped = True
+        self._wakeup.set()
+        with self._lock:
+            idle = [driver for driver, _ in self._idle]
+            self._idle.clear()
+            self._uses.clear()
+            self._killed.clear()
+        return idle
+
+    def _discard(self, driver):
+        """Encerra um driver do pool; erros do quit são repassados ao chamador"""
+        self._uses.pop(driver, None)
+        driver.quit()
+
+    def _next_position(self):
+        """Escolhe a primeira posição configurada que ainda não tem driver ocioso"""
+        taken = [tuple(position) for _, position in self._idle]
+        for position in self.positions:
+            if tuple(position) in taken:
+                taken.remove(tuple(position))
+            else:
+                return position
+        return (800, 600, 0, 0)
+
+    def _refill_loop(self):
+        while not self._stopped:
+            self._wakeup.wait(timeout=5)
+            self._wakeup.clear()
+
+            while not self._stopped:
+                with self._lock:
+                    if self.driver_path is None or not self.local or \
+                            len(self._idle) + self._creating >= self.size:
+                        break
+                    position = self._next_position()
+                    incognito = self.incognito
+                    profile = self.profile
+                    factory = self.driver_factory
+                    self._creating += 1
+
+                try:
+                    driver = factory(position, incognito, make_service(self.driver_path), profile=profile)
+                    driver.get('about:blank')
+                except Exception as e:
+                    print(f"Erro ao pré-carregar sessão: {e}")
+                    driver = None
+                finally:
+                    with self._lock:
+                        self._creating -= 1
+
+                if driver is None:
+                    break
+
+                with self._lock:
+                    if not self._stopped and factory is self.driver_factory and self.matches(incognito, profile) \
+                            and len(self._idle) < self.size:
+                        self._uses[driver] = 0
+                        self._idle.append((driver, position))
+                        driver = None
+
+                if driver is not None:
+                    teardown_drivers([driver], close=self._discard)
+
+class LaunchScheduler:
+    """Mantém uma janela deslizante de inicializações do Chrome, ajustada à carga da máquina"""
+
+    def __init__(self, min_window=1, max_window=None, cpu_high=85, cpu_low=60,
+                 min_free_memory_mb=800, latency_factor=2.0):
+        self.min_window = min_window
+        self.max_window = max_window or min(32, max(4, (os.cpu_count() or 2) * 4))
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.min_free_memory_mb = min_free_memory_mb
+        self.latency_factor = latency_factor
+        self.window = min(self.max_window, max(self.min_window, 2))
+        self.baseline_latency = None
+        self.average_latency = None
+
+    def _overloaded(self, latency, cpu):
+        """Indica se a máquina ou a latência de inicialização estão acima do limite"""
+        if psutil is not None:
+            if cpu > self.cpu_high:
+                return True
+            if psutil.virtual_memory().available / (1024 * 1024) < self.min_free_memory_mb:
+                return True
+        return latency > self.baseline_latency * self.latency_factor
+
+    def _has_headroom(self, cpu):
+        if psutil is None:
+            return True
+        return cpu < self.cpu_low
+
+    def _adjust(self, latency, failed=False):
+        """Ajusta a janela depois de cada inicialização; uma falha conta como sobrecarga"""
+        if failed:
+            # O Chrome que não abriu (ex.: sem memória) não entra na média da latência
+            self.window = max(self.min_window, self.window // 2)
+            return
+
+        # Média móvel da latência; a linha de base é a menor latência observada
+        if self.baseline_latency is None or latency < self.baseline_latency:
+            self.baseline_latency = latency
+        if self.average_latency is None:
+            self.average_latency = latency
+        else:
+            self.average_latency = 0.7 * self.average_latency + 0.3 * latency
+
+        # Uma leitura por ajuste: cpu_percent(None) mede desde a chamada anterior, então uma segunda
+        # leitura logo em seguida cobriria um intervalo quase vazio
+        cpu = psutil.cpu_percent(interval=None) if psutil is not None else None
+        if self._overloaded(self.average_latency, cpu):
+            # Redução multiplicativa para aliviar a máquina rapidamente
+            self.window = max(self.min_window, self.window // 2)
+        elif self._has_headroom(cpu):
+            self.window = min(self.max_window, self.window + 1)
+
+    def run(self, tasks, on_ready, cancelled=None):
+        """Executa as tarefas (funções que retornam um driver) e publica cada driver assim que fica pronto
+
+        Quando `cancelled()` retorna True, as tarefas que ainda não começaram são descartadas.
+        """
+        pending = collections.deque(tasks)
+        in_flight = {}
+
+        if psutil is not None:
+            psutil.cpu_percent(interval=None)  # Inicializar a medição de CPU
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_window) as executor:
+            while pending or in_flight:
+                if cancelled is not None and cancelled():
+                    pending.clear()
+                while pending and len(in_flight) < self.window:
+                    future = executor.submit(pending.popleft())
+                    in_flight[future] = time.monotonic()
+
+                done, _ = concurrent.futures.wait(
+                    in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+
+                for future in done:
+                    latency = time.monotonic() - in_flight.pop(future)
+                    try:
+                        driver = future.result()
+                    except Exception as e:
+                        print(f"Erro ao abrir sessão: {e}")
+                        driver = None
+                    if driver:
+                        on_ready(driver)
+                    self._adjust(latency, failed=not driver)
+
+def default_driver_resolver():
+    """Resolvedor padrão; caminho e modo offline podem ser definidos por variáveis de ambiente"""
+    return DriverResolver(
+        os.path.join(os.path.expanduser('~'), '.multi_chrome_tester', 'chromedriver_cache.json'),
+        configured_path=os.environ.get('MULTI_CHROME_DRIVER_PATH') or None,
+        offline=os.environ.get('MULTI_CHROME_OFFLINE', '').lower() in ('1', 'true', 'sim')
+    )
+
+def default_profile_template():
+    """Perfis modelo aquecidos, guardados por domínio"""
+    return ProfileTemplate(os.path.join(os.path.expanduser('~'), '.multi_chrome_tester', 'templates'))
+
+def export_session_state(driver):
+    """Copia cookies (de todos os domínios), localStorage, sessionStorage e URL atual do driver"""
+    storage = driver.execute_script(
+        "return {local: Object.assign({}, window.localStorage),"
+        " session: Object.assign({}, window.sessionStorage),"
+        " origin: window.location.origin};"
+    )
+    return {
+        'url': driver.current_url,
+        'origin': storage['origin'],
+        'cookies': driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies'],
+        'local_storage': storage['local'],
+        'session_storage': storage['session'],
+    }
+
+def import_session_state(driver, state):
+    """Injeta o estado exportado em outro driver e navega para a URL salva"""
+    if state['cookies']:
+        cookies = []
+        for cookie in state['cookies']:
+            cookie = {k: v for k, v in cookie.items() if k not in ('size', 'session')}
+            # Cookies de sessão vêm com expires = -1, que o Network.setCookies trataria como expirado
+            if cookie.get('expires', 0) < 0:
+                del cookie['expires']
+            cookies.append(cookie)
+        driver.execute_cdp_cmd('Network.setCookies', {'cookies': cookies})
+
+    # O storage só pode ser gravado na própria origem, então é injetado antes dos scripts da página
+    script = (
+        "(function(){"
+        f"if (location.origin !== {json.dumps(state['origin'])}) return;"
+        "if (sessionStorage.getItem('__mct_restored')) return;"
+        f"var local = {json.dumps(state['local_storage'])};"
+        f"var session = {json.dumps(state['session_storage'])};"
+        "for (var k in local) localStorage.setItem(k, local[k]);"
+        "for (var k in session) sessionStorage.setItem(k, session[k]);"
+        "sessionStorage.setItem('__mct_restored', '1');"
+        "})();"
+    )
+    identifier = driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': script})['identifier']
+    try:
+        driver.get(state['url'])
+    finally:
+        driver.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument', {'identifier': identifier})
+
+SNAPSHOT_FIELDS = ('url', 'origin', 'cookies', 'local_storage', 'session_storage')
+SNAPSHOT_INTERVAL = 15  # Passagens do monitor (~1 s cada) entre snapshots das sessões
+
+def _snapshot_digest(value):
+    return hashlib.blake2b(json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8'),
+                           digest_size=8).hexdigest()
+
+class SnapshotStore:
+    """Guarda em disco o estado de cada sessão (export_session_state) para restaurar a execução
+
+    O arquivo é um log JSONL compacto: um registro 'run' com os parâmetros da execução e, a cada
+    snapshot, um registro por lugar da grade só com os campos que mudaram desde o anterior. Quando o
+    log cresce demais ele é reescrito só com o estado atual. Uma última linha cortada por uma queda
+    do programa é ignorada na leitura. Cookies e storage dão acesso às contas, então o arquivo só pode
+    ser lido pelo usuário e é apagado quando a execução termina normalmente (discard).
+    """
+
+    def __init__(self, path, compact_ratio=4, min_compact_bytes=256 * 1024):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.min_compact_bytes = min_compact_bytes
+        self.run = None  # Parâmetros da execução (ver SessionManager.launch)
+        self.states = {}  # lugar -> estado mais recente
+        self._digests = {}  # lugar -> {campo: hash} do que já está no disco
+        self._size = 0  # Tamanho atual do arquivo
+        self._base_size = 0  # Tamanho logo após a última reescrita
+        self._lock = threading.Lock()
+
+    def begin(self, run, states=None):
+        """Começa o arquivo da execução `run`, já com os estados conhecidos (ex.: os restaurados)"""
+        with self._lock:
+            self.run = run
+            self.states = {slot: dict(state) for slot, state in (states or {}).items()}
+            self._digests = {slot: {field: _snapshot_digest(state.get(field)) for field in SNAPSHOT_FIELDS}
+                             for slot, state in self.states.items()}
+            self._rewrite()
+
+    def save(self, states):
+        """Grava de uma vez os campos que mudaram em `states` (lugar -> estado); retorna quantos lugares mudaram"""
+        records = []
+        with self._lock:
+            if self.run is None:
+                return 0
+            for slot, state in states.items():
+                if state.get('cookies'):
+                    # O Chrome não garante a ordem dos cookies; 'size' é derivado dos outros campos
+                    cookies = ({k: v for k, v in cookie.items() if k != 'size'} for cookie in state['cookies'])
+                    state = dict(state, cookies=sorted(cookies, key=lambda cookie: (
+                        cookie.get('domain', ''), cookie.get('path', ''), cookie.get('name', ''))))
+                digests = {field: _snapshot_digest(state.get(field)) for field in SNAPSHOT_FIELDS}
+                known = self._digests.get(slot, {})
+                changed = {field: state.get(field) for field in SNAPSHOT_FIELDS
+                           if digests[field] != known.get(field)}
+                if not changed:
+                    continue
+                self.states.setdefault(slot, {}).update(changed)
+                self._digests[slot] = digests
+                records.append(dict(changed, type='session', slot=slot, time=round(time.time(), 3)))
+            if records:
+                self._append(records)
+                if self._size > max(self.compact_ratio * self._base_size, self.min_compact_bytes):
+                    self._rewrite()
+        return len(records)
+
+    def discard(self):
+        """A execução terminou normalmente: apagar o arquivo, que só serve para restaurar depois de uma queda"""
+        with self._lock:
+            if self.run is None:
+                return  # Arquivo de outra execução (ex.: uma que caiu), ainda não restaurada
+            self.run = None
+            self.states = {}
+            self._digests = {}
+            for path in (self.path, self.path + '.tmp'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def load(self):
+        """Lê o arquivo; retorna (run, {lugar: estado}) da última execução salva, ou (None, {})"""
+        run, states = None, {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # Linha cortada no meio da gravação
+                if record.get('type') == 'run':
+                    run, states = record['run'], {}
+                elif record.get('type') == 'session' and run is not None:
+                    fields = {field: record[field] for field in SNAPSHOT_FIELDS if field in record}
+                    states.setdefault(record['slot'], {}).update(fields)
+        # Só lugares com estado completo podem ser restaurados
+        return run, {slot: state for slot, state in states.items()
+                     if all(field in state for field in SNAPSHOT_FIELDS)}
+
+    def _lines(self, records):
+        return ''.join(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n' for record in records)
+
+    @staticmethod
+    def _open(path, flags):
+        """Abre o arquivo para gravação, criando-o só com permissão de leitura e escrita do usuário"""
+        return os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0) | flags, 0o600), 'wb')
+
+    def _append(self, records):
+        data = self._lines(records).encode('utf-8')
+        with self._open(self.path, os.O_APPEND) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._size += len(data)
+
+    def _rewrite(self):
+        """Reescreve o arquivo com o estado atual; a troca é atômica, então uma queda não perde o anterior"""
+        os.makedirs(os.path.dirname(self.path) or '.', mode=0o700, exist_ok=True)
+        records = [{'type': 'run', 'run': self.run, 'time': round(time.time(), 3)}]
+        records += [dict(state, type='session', slot=slot) for slot, state in sorted(self.states.items())]
+        data = self._lines(records).encode('utf-8')
+        temporary = self.path + '.tmp'
+        try:
+            os.remove(temporary)  # Uma sobra com outra permissão manteria a permissão antiga
+        except FileNotFoundError:
+            pass
+        with self._open(temporary, os.O_EXCL) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        self._size = self._base_size = len(data)
+
+def default_snapshot_store():
+    """Estado das sessões da última execução, para restaurar depois de uma queda"""
+    return SnapshotStore(os.path.join(os.path.expanduser('~'), '.multi_chrome_tester', 'snapshot.jsonl'))
+
+def maximize_window_on_primary(driver):
+    """Maximiza a janela no monitor principal"""
+    monitors = get_screen_info()
+    primary = monitors[0]
+
+    # Primeiro mover para o monitor principal
+    driver.set_window_position(primary['x_offset'], primary['y_offset'])
+
+    # Pequena pausa para permitir que a janela seja movida
+    time.sleep(0.1)
+
+    # Depois maximizar
+    driver.maximize_window()
+
+    # Trazer para frente
+    driver.execute_script("window.focus();")
+
+# Tamanho mínimo legível de cada janela e proporção preferida (largura/altura)
+MIN_WINDOW_WIDTH = 320
+MIN_WINDOW_HEIGHT = 240
+PREFERRED_ASPECT = 4 / 3
+WINDOW_MARGIN = 5
+
+class LayoutPlan:
+    """Posições (largura, altura, x, y) das janelas guardadas em um array compacto de inteiros"""
+
+    __slots__ = ('data', 'monitor_counts')
+
+    def __init__(self, data=None, monitor_counts=None):
+        self.data = data if data is not None else array.array('i')
+        self.monitor_counts = monitor_counts or []  # [(id do monitor, quantidade de janelas)]
+
+    def __len__(self):
+        return len(self.data) // 4
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        base = index * 4
+        return tuple(self.data[base:base + 4])
+
+    def __iter__(self):
+        data = self.data
+        for base in range(0, len(data), 4):
+            yield (data[base], data[base + 1], data[base + 2], data[base + 3])
+
+def monitor_capacity(monitor, min_width, min_height, margin=WINDOW_MARGIN):
+    """Quantas janelas de tamanho mínimo cabem no monitor"""
+    cols = (monitor['width'] - margin) // (min_width + margin)
+    rows = (monitor['height'] - margin) // (min_height + margin)
+    return max(0, cols) * max(0, rows)
+
+def distribute_sessions(num_sessions, monitors, min_width, min_height):
+    """Divide as sessões entre os monitores proporcionalmente à área útil, respeitando a capacidade"""
+    areas = [m['width'] * m['height'] for m in monitors]
+    capacities = [monitor_capacity(m, min_width, min_height) for m in monitors]
+
+    # Se nem com o tamanho mínimo todas cabem, ignorar a capacidade e dividir só pela área
+    if sum(capacities) < num_sessions:
+        capacities = [num_sessions] * len(monitors)
+
+    counts = [0] * len(monitors)
+    remaining = num_sessions
+    open_monitors = [i for i in range(len(monitors)) if capacities[i] > 0]
+
+    while remaining > 0 and open_monitors:
+        total_area = sum(areas[i] for i in open_monitors)
+        shares = {i: remaining * areas[i] / total_area for i in open_monitors}
+
+        # Método do maior resto: parte inteira primeiro, depois os maiores restos
+        assigned = {i: min(int(shares[i]), capacities[i] - counts[i]) for i in open_monitors}
+        leftover = remaining - sum(assigned.values())
+        # Em caso de sobra, o monitor principal (primeiro da lista) tem prioridade
+        for i in sorted(open_monitors, key=lambda i: (i != 0, int(shares[i]) - shares[i])):
+            if leftover <= 0:
+                break
+            if counts[i] + assigned[i] < capacities[i]:
+                assigned[i] += 1
+                leftover -= 1
+
+        for i, amount in assigned.items():
+            counts[i] += amount
+            remaining -= amount
+
+        open_monitors = [i for i in open_monitors if counts[i] < capacities[i]]
+
+    return counts
+
+def choose_grid(count, width, height, min_width, min_height, margin=WINDOW_MARGIN):
+    """Escolhe linhas e colunas para `count` janelas, evitando janelas finas demais"""
+    best = None
+    best_score = None
+
+    # Procurar apenas em torno do número de colunas ideal para a proporção preferida
+    ideal = math.sqrt(count * width / (height * PREFERRED_ASPECT))
+    first = max(1, int(ideal / 2))
+    last = min(count, int(ideal * 2) + 1)
+
+    for cols in range(first, last + 1):
+        rows = -(-count // cols)
+        win_w = (width - (cols + 1) * margin) // cols
+        win_h = (height - (rows + 1) * margin) // rows
+        if win_w <= 0 or win_h <= 0:
+            continue
+
+        # Penalizar proporções distantes da preferida, células vazias e janelas abaixo do mínimo
+        score = abs(math.log((win_w / win_h) / PREFERRED_ASPECT))
+        score += (rows * cols - count) / count
+        if win_w < min_width or win_h < min_height:
+            score += 10
+
+        if best_score is None or score < best_score:
+            best = (rows, cols, win_w, win_h)
+            best_score = score
+
+    return best or (count, 1, max(1, width - 2 * margin), max(1, (height - (count + 1) * margin) // count))
+
+def calculate_positions(num_sessions, auto_arrange, min_width=MIN_WINDOW_WIDTH, min_height=MIN_WINDOW_HEIGHT):
+    """Distribui as janelas por todos os monitores detectados e retorna um LayoutPlan"""
+    if not auto_arrange:
+        return LayoutPlan(array.array('i', (800, 600, 0, 0) * num_sessions))
+
+    # Monitores do cache com as orientações selecionadas pelo usuário
+    monitors = get_oriented_monitors()
+
+    data = array.array('i')
+    monitor_counts = []
+
+    if num_sessions <= 0:
+        return LayoutPlan(data)
+
+    counts = distribute_sessions(num_sessions, monitors, min_width, min_height)
+
+    for monitor, count in zip(monitors, counts):
+        if count <= 0:
+            continue
+
+        rows, cols, width, height = choose_grid(count, monitor['width'], monitor['height'], min_width, min_height)
+        x0 = monitor['x_offset'] + WINDOW_MARGIN
+        y0 = monitor['y_offset'] + WINDOW_MARGIN
+
+        xs = [x0 + col * (width + WINDOW_MARGIN) for col in range(cols)]
+        for row in range(rows):
+            y = y0 + row * (height + WINDOW_MARGIN)
+            for x in xs[:min(cols, count - row * cols)]:
+                data.extend((width, height, x, y))
+
+        monitor_counts.append((monitor['id'], count))
+
+    return LayoutPlan(data, monitor_counts)
+
+def get_domain(url):
+    """Extrai o domínio (host[:porta]) de uma URL"""
+    return url.split('://')[1].split('/')[0] if '://' in url else ""
+
+def parse_url(url):
+    """Decompõe a URL uma única vez: host, hostname, caminho e parâmetros da query"""
+    parts = urllib.parse.urlsplit(url)
+    return types.SimpleNamespace(
+        url=url,
+        host=parts.netloc.lower(),
+        hostname=parts.hostname or '',
+        path=parts.path or '/',
+        query=urllib.parse.parse_qs(parts.query, keep_blank_values=True),
+    )
+
+# Título e presença dos seletores da página em uma única chamada ao navegador
+DOM_PROBE_SCRIPT = """
+var selectors = arguments[0];
+return {
+  title: document.title,
+  found: selectors.map(function (s) {
+    try { return document.querySelector(s) !== null; } catch (e) { return false; }
+  })
+};
+"""
+
+class DetectionRules:
+    """Regras que indicam que uma sessão passou da fila, compiladas uma vez por execução
+
+    Uma regra por linha (ou separadas por ';'); a sessão passou quando todas as condições de
+    alguma regra valem. Condições separadas por espaço, '!' na frente nega:
+      host-changed      saiu do domínio em que abriu (regra padrão)
+      host:loja.com     domínio igual ou subdomínio
+      path:/checkout    caminho começa com o prefixo
+      query:token       parâmetro presente; query:etapa=pagamento exige o valor
+      url~REGEX         expressão regular na URL completa
+      title~REGEX       expressão regular no título da página
+      css:SELETOR       elemento presente na página
+    Valores com espaço ou ';' vão entre aspas duplas (sem aspas duplas dentro; use aspas simples):
+      css:"div .pagamento" title~"Pedido confirmado"; url~"etapa=(2|3)" !css:"#fila .aguarde"
+    """
+
+    DEFAULT = 'host-changed'
+    # Condição com valor entre aspas (css:"div .x", title~"a b") ou qualquer sequência sem espaço
+    CONDITION_PATTERN = re.compile(r'!?[a-z-]+[:~]"[^"]*"|\S+')
+    QUOTED_PATTERN = re.compile(r'(!?[a-z-]+[:~])"([^"]*)"')
+    # ';' e quebras de linha fora das aspas separam as regras
+    RULE_SEPARATOR = re.compile(r'[\n;]+(?=(?:[^"]*"[^"]*")*[^"]*$)')
+
+    def __init__(self, text=None):
+        self.text = (text or '').strip() or self.DEFAULT
+        self.selectors = []  # Seletores CSS de todas as regras, consultados juntos
+        self.needs_title = False
+        self.rules = [(line.strip(), self._compile_rule(line))
+                      for line in self.RULE_SEPARATOR.split(self.text) if line.strip()]
+
+    @property
+    def needs_dom(self):
+        """Se alguma regra depende do conteúdo da página, e não só da URL"""
+        return self.needs_title or bool(self.selectors)
+
+    def probe(self, driver):
+        """Estado da página usado pelas regras de DOM, ou None se não foi possível consultar"""
+        try:
+            return driver.execute_script(DOM_PROBE_SCRIPT, self.selectors)
+        except Exception:
+            return None
+
+    def match(self, url, start, dom=None):
+        """Retorna o texto da primeira regra atendida, ou None
+
+        `url` e `start` vêm de parse_url; `dom` vem de probe e é necessário para as regras de página.
+        """
+        for text, (url_conditions, dom_conditions) in self.rules:
+            if dom_conditions and dom is None:
+                continue
+            if all(test(url, start, dom) != negate for test, negate in url_conditions) and \
+                    all(test(url, start, dom) != negate for test, negate in dom_conditions):
+                return text
+        return None
+
+    def _compile_rule(self, line):
+        url_conditions = []
+        dom_conditions = []
+        for token in self.CONDITION_PATTERN.findall(line):
+            quoted = self.QUOTED_PATTERN.fullmatch(token)
+            if quoted:
+                token = quoted.group(1) + quoted.group(2)
+            elif '"' in token:
+                raise ValueError(f"Aspas sem fechar na condição de detecção: {token}")
+            negate = token.startswith('!')
+            if negate:
+                token = token[1:]
+            test, is_dom = self._compile_condition(token)
+            (dom_conditions if is_dom else url_conditions).append((test, negate))
+        return url_conditions, dom_conditions
+
+    def _compile_condition(self, token):
+        if token == 'host-changed':
+            return (lambda url, start, dom: url.host != start.host), False
+
+        if token.startswith('host:'):
+            host = token[5:].lower()
+            suffix = '.' + host
+            return (lambda url, start, dom: url.hostname == host or url.hostname.endswith(suffix)), False
+
+        if token.startswith('path:'):
+            prefix = token[5:]
+            return (lambda url, start, dom: url.path.startswith(prefix)), False
+
+        if token.startswith('query:'):
+            name, has_value, value = token[6:].partition('=')
+            if has_value:
+                return (lambda url, start, dom: value in url.query.get(name, ())), False
+            return (lambda url, start, dom: name in url.query), False
+
+        if token.startswith('url~'):
+            pattern = self._compile_regex(token[4:])
+            return (lambda url, start, dom: pattern.search(url.url) is not None), False
+
+        if token.startswith('title~'):
+            pattern = self._compile_regex(token[6:])
+            self.needs_title = True
+            return (lambda url, start, dom: pattern.search(dom.get('title') or '') is not None), True
+
+        if token.startswith('css:'):
+            index = len(self.selectors)
+            self.selectors.append(token[4:])
+            return (lambda url, start, dom: bool((dom.get('found') or [])[index:index + 1] == [True])), True
+
+        raise ValueError(f"Condição de detecção desconhecida: {token}")
+
+    @staticmethod
+    def _compile_regex(pattern):
+        try:
+            return re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Expressão regular inválida '{pattern}': {e}")
+
+def parse_url_targets(text):
+    """Lê a especificação de URLs da execução: cada URL seguida opcionalmente de um peso ou quantidade
+
+    Ex.: "fila.com 60% espelho.com 40%" ou "fila.com espelho.com 5" (5 sessões fixas no espelho
+    e o restante na fila). Entradas separadas por espaço, ';' ou quebra de linha.
+    """
+    targets = []
+    for token in re.split(r'[\s;]+', text.strip()):
+        if not token:
+            continue
+        is_weight = re.fullmatch(r'\d+(\.\d+)?%', token) is not None
+        if (is_weight or token.isdigit()) and targets:
+            target = targets[-1]
+            if target['weight'] is not None or target['count'] is not None:
+                raise ValueError(f"{target['url']} tem mais de um peso ou quantidade")
+            if is_weight:
+                target['weight'] = float(token[:-1])
+            else:
+                target['count'] = int(token)
+        else:
+            url = token if token.startswith(('http://', 'https://')) else 'http://' + token
+            targets.append({'url': url, 'weight': None, 'count': None})
+
+    if not targets:
+        raise ValueError("Por favor, insira uma URL válida")
+    return targets
+
+def assign_urls(targets, num_sessions):
+    """Retorna a URL de cada sessão, com os grupos intercalados ao longo da ordem de abertura"""
+    fixed = sum(t['count'] for t in targets if t['count'] is not None)
+    weighted = [i for i, t in enumerate(targets) if t['count'] is None]
+
+    if fixed > num_sessions or (not weighted and fixed != num_sessions):
+        raise ValueError(f"As quantidades fixas somam {fixed}, mas foram pedidas {num_sessions} sessões")
+
+    counts = [t['count'] or 0 for t in targets]
+    remaining = num_sessions - fixed
+
+    if weighted:
+        # URLs sem peso dividem igualmente o que os pesos informados não cobrem
+        given = sum(targets[i]['weight'] for i in weighted if targets[i]['weight'] is not None)
+        missing = [i for i in weighted if targets[i]['weight'] is None]
+        if missing and given >= 100:
+            raise ValueError("Os pesos informados já somam 100%; informe o peso das outras URLs")
+        weights = {i: targets[i]['weight'] if targets[i]['weight'] is not None else (100 - given) / len(missing)
+                   for i in weighted}
+        total = sum(weights.values())
+        if total <= 0:
+            raise ValueError("A soma dos pesos deve ser maior que zero")
+
+        # Método do maior resto; em caso de empate, a URL informada primeiro
+        shares = {i: remaining * weights[i] / total for i in weighted}
+        for i in weighted:
+            counts[i] += int(shares[i])
+        leftover = remaining - sum(int(share) for share in shares.values())
+        for i in sorted(weighted, key=lambda i: int(shares[i]) - shares[i])[:leftover]:
+            counts[i] += 1
+
+    # Intercalar: cada grupo recebe posições espaçadas uniformemente na ordem de abertura
+    order = sorted(((j + 0.5) / count, i) for i, count in enumerate(counts) for j in range(count))
+    return [targets[i]['url'] for _, i in order]
+
+def _server_date(connection, path):
+    """Faz uma requisição HEAD e retorna o cabeçalho Date como timestamp"""
+    try:
+        connection.request('HEAD', path, headers={'Cache-Control': 'no-cache'})
+        response = connection.getresponse()
+        response.read()
+    except (http.client.HTTPException, OSError):
+        # Conexão reaproveitada que o servidor fechou: tentar uma vez numa conexão nova
+        connection.close()
+        connection.request('HEAD', path, headers={'Cache-Control': 'no-cache'})
+        response = connection.getresponse()
+        response.read()
+    date = response.getheader('Date')
+    if not date:
+        raise ValueError("O servidor não informou o cabeçalho Date")
+    return email.utils.parsedate_to_datetime(date).timestamp()
+
+def measure_clock_offset(url, samples=8, precision=0.02, timeout=5):
+    """Diferença entre o relógio do servidor de `url` e o local, pelo cabeçalho Date
+
+    O Date só tem segundos inteiros: cada requisição é enviada para que a virada de segundo do
+    servidor caia no meio do intervalo ainda possível (busca binária), até o intervalo ficar do
+    tamanho de uma ida e volta. Retorna (diferença, incerteza) em segundos, com
+    hora do servidor ≈ time.time() + diferença.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+        raise ValueError(f"URL inválida para medir o relógio: {url}")
+    connection_class = http.client.HTTPSConnection if parsed.scheme == 'https' else http.client.HTTPConnection
+    connection = connection_class(parsed.netloc, timeout=timeout)
+    path = (parsed.path or '/') + (f"?{parsed.query}" if parsed.query else '')
+
+    low, high = -math.inf, math.inf  # Diferenças ainda possíveis
+    rtt = None  # Menor ida e volta medida
+    try:
+        for _ in range(samples):
+            if rtt is not None:
+                # Enviar de modo que a requisição chegue quando o relógio estimado do servidor vira o segundo
+                middle = (low + high) / 2
+                boundary = math.ceil(time.time() + middle + rtt / 2 + 0.01)
+                time.sleep(max(0, boundary - middle - rtt / 2 - time.time()))
+
+            sent = time.time()
+            date = _server_date(connection, path)
+            received = time.time()
+            rtt = received - sent if rtt is None else min(rtt, received - sent)
+
+            # O servidor leu o relógio entre o envio e a resposta, e o Date arredonda para baixo
+            sample_low, sample_high = date - received, date + 1 - sent
+            if sample_low > high or sample_high < low:
+                # Inconsistente com as anteriores (relógio ajustado no meio): recomeçar desta amostra
+                low, high = sample_low, sample_high
+            else:
+                low, high = max(low, sample_low), min(high, sample_high)
+            if high - low <= max(precision, rtt):
+                break
+    finally:
+        connection.close()
+    return (low + high) / 2, (high - low) / 2
+
+def parse_fire_time(text, now=None):
+    """Lê o horário de disparo: 'HH:MM', 'HH:MM:SS[.fff]' (hoje, fuso local) ou '+N' segundos a partir de agora
+
+    Retorna o timestamp, ou None se o texto estiver vazio.
+    """
+    text = text.strip()
+    if not text:
+        return None
+    now = time.time() if now is None else now
+    if text.startswith('+'):
+        try:
+            return now + float(text[1:])
+        except ValueError:
+            raise ValueError(f"Horário de disparo inválido: {text}")
+    for layout in ('%H:%M:%S.%f', '%H:%M:%S', '%H:%M'):
+        try:
+            clock = datetime.datetime.strptime(text, layout).time()
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"Horário de disparo inválido: {text} (use HH:MM, HH:MM:SS ou +segundos)")
+    fire_at = datetime.datetime.combine(datetime.date.fromtimestamp(now), clock).timestamp()
+    if fire_at <= now:
+        raise ValueError(f"O horário de disparo {text} já passou")
+    return fire_at
+
+def wait_until(deadline, cancelled=None):
+    """Espera até o horário local `deadline` (time.time()), com os últimos milissegundos em espera ativa
+
+    Retorna False se `cancelled()` ficar verdadeiro antes.
+    """
+    while True:
+        if cancelled is not None and cancelled():
+            return False
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return True
+        if remaining > 0.03:
+            time.sleep(min(remaining - 0.02, 0.25))
+        else:
+            time.sleep(0)
+
+class NavigationWatcher:
+    """Recebe as navegações de cada janela por eventos do Chrome DevTools Protocol (Page.frameNavigated)"""
+
+    def __init__(self, on_navigate, on_closed):
+        self.on_navigate = on_navigate
+        self.on_closed = on_closed
+        self._sockets = {}  # driver -> conexão websocket com a aba
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def is_watching(self, driver):
+        with self._lock:
+            return driver in self._sockets
+
+    def watch(self, driver):
+        """Conecta ao DevTools da aba do driver; retorna False se não for possível"""
+        if websocket is None:
+            return False
+
+        try:
+            address = driver.capabilities['goog:chromeOptions']['debuggerAddress']
+            # No chromedriver o handle da janela é o id do alvo no DevTools
+            target_id = driver.current_window_handle
+            with urllib.request.urlopen(f"http://{address}/json", timeout=2) as response:
+                targets = json.loads(response.read().decode('utf-8'))
+
+            pages = [t for t in targets if t.get('type') == 'page']
+            page = next((t for t in pages if t.get('id') == target_id), pages[0] if pages else None)
+            if page is None:
+                return False
+
+            sock = websocket.create_connection(page['webSocketDebuggerUrl'], timeout=5, suppress_origin=True)
+            sock.settimeout(None)
+            sock.send(json.dumps({'id': 1, 'method': 'Page.enable'}))
+        except Exception as e:
+            print(f"Erro ao conectar ao DevTools: {e}")
+            return False
+
+        with self._lock:
+            self._sockets[driver] = sock
+
+        threading.Thread(target=self._listen, args=(driver, sock, page.get('id')), daemon=True).start()
+        return True
+
+    def stop(self):
+        self._stopped = True
+        with self._lock:
+            sockets = list(self._sockets.values())
+            self._sockets.clear()
+        for sock in sockets:
+            try:
+                sock.close()
+            except Exception:
+                pass
+
+    def _listen(self, driver, sock, main_frame_id):
+        while not self._stopped:
+            try:
+                message = json.loads(sock.recv())
+            except Exception:
+                break
+
+            method = message.get('method')
+            params = message.get('params', {})
+
+            if method == 'Page.frameNavigated':
+                frame = params.get('frame', {})
+                # Ignorar iframes; só interessa a navegação do documento principal
+                if not frame.get('parentId'):
+                    self.on_navigate(driver, frame.get('url', ''))
+            elif method == 'Page.navigatedWithinDocument' and params.get('frameId') == main_frame_id:
+                self.on_navigate(driver, params.get('url', ''))
+
+        with self._lock:
+            watched = self._sockets.pop(driver, None) is not None
+
+        # A conexão caiu sem que o watcher tenha sido parado: a janela foi fechada
+        if watched and not self._stopped:
+            self.on_closed(driver)
+
+class DriverPoller:
+    """Consulta a URL de todos os drivers em paralelo, com prazo máximo por driver e quarentena"""
+
+    def __init__(self, max_workers=32, deadline=0.5, quarantine_limit=30):
+        self.deadline = deadline
+        self.quarantine_limit = quarantine_limit
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = {}  # driver -> (future, início) de consultas que ainda não terminaram
+        self.latencies = {}  # driver -> duração da última consulta concluída, em ms
+        self.snapshots = {}  # driver -> estado da página da última consulta, quando há `probe`
+
+    def quarantined(self):
+        """Drivers que estouraram o prazo e ainda não responderam"""
+        return list(self._pending)
+
+    def poll(self, drivers_to_poll, probe=None):
+        """Retorna (urls por driver na ordem recebida, drivers mortos)
+
+        Com `probe`, cada consulta também o executa no driver e guarda o resultado em `snapshots`.
+        """
+        now = time.monotonic()
+        futures = {}
+        dead = []
+
+        # Drivers que saíram da lista (fechados, perdidos ou que passaram da fila) não são mais consultados
+        drivers_to_poll = list(drivers_to_poll)
+        polled = set(drivers_to_poll)
+        for table in (self._pending, self.latencies, self.snapshots):
+            for driver in [driver for driver in table if driver not in polled]:
+                del table[driver]
+
+        for driver in drivers_to_poll:
+            if driver in self._pending:
+                # Em quarentena: não acumular novas chamadas em um driver travado
+                future, started = self._pending[driver]
+                if not future.done():
+                    if now - started > self.quarantine_limit:
+                        del self._pending[driver]
+                        dead.append(driver)
+                    continue
+                del self._pending[driver]
+            futures[driver] = (self._executor.submit(self._query, driver, probe), now)
+
+        concurrent.futures.wait([f for f, _ in futures.values()], timeout=self.deadline)
+
+        results = {}
+        for driver, (future, started) in futures.items():
+            if not future.done():
+                self._pending[driver] = (future, started)
+            elif future.exception() is not None:
+                dead.append(driver)
+            else:
+                results[driver], self.latencies[driver], snapshot = future.result()
+                if probe is not None:
+                    self.snapshots[driver] = snapshot
+
+        for driver in dead:
+            self.latencies.pop(driver, None)
+            self.snapshots.pop(driver, None)
+
+        return results, dead
+
+    @staticmethod
+    def _query(driver, probe):
+        started = time.perf_counter()
+        url = driver.current_url
+        latency = (time.perf_counter() - started) * 1000
+        return url, latency, probe(driver) if probe is not None else None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+def set_cpu_throttling(driver, rate):
+    """Deixa a CPU da página `rate` vezes mais lenta (1 = normal)"""
+    driver.execute_cdp_cmd('Emulation.setCPUThrottlingRate', {'rate': rate})
+
+def set_lifecycle_state(driver, state):
+    """Congela ('frozen') ou retoma ('active') timers e tarefas da página"""
+    driver.execute_cdp_cmd('Page.setWebLifecycleState', {'state': state})
+
+def purge_memory(driver):
+    """Pede ao Chrome para liberar caches e memória da página, sem descarregá-la"""
+    driver.execute_cdp_cmd('Memory.simulatePressureNotification', {'level': 'critical'})
+
+GOVERNOR_LIMITS = ('memory_high', 'memory_low', 'cpu_high', 'cpu_low')
+GOVERNOR_DEFAULTS = {
+    'memory_high': 85,  # % da memória do sistema em uso a partir do qual as sessões em espera são congeladas
+    'memory_low': 70,  # Abaixo disso (e da CPU baixa) as sessões voltam ao normal
+    'cpu_high': 85,  # % de CPU do sistema a partir do qual as sessões em espera ficam mais lentas
+    'cpu_low': 60,
+    'throttle_rate': 4,  # Fator de lentidão da CPU das sessões em espera
+    'freeze_seconds': 10,  # Sob pressão de memória, cada sessão fica congelada no máximo este tempo...
+    'thaw_seconds': 3,  # ...e depois ativa este tempo, para a página da fila continuar consultando o servidor
+    'grace_seconds': 10,  # Sessões recém-abertas ou que acabaram de mudar ficam livres por este tempo
+}
+
+class ResourceGovernor:
+    """Reduz o consumo das sessões em espera quando a máquina fica sem memória ou CPU
+
+    Níveis: 0 livre; 1 (CPU acima do limite alto) deixa a CPU das sessões em espera mais lenta;
+    2 (memória acima do limite alto) também congela as sessões em rodízio e libera a memória delas.
+    O nível só baixa quando memória e CPU ficam abaixo dos limites baixos.
+    """
+
+    def __init__(self, options=None, metrics=None):
+        self.options = dict(GOVERNOR_DEFAULTS, **(options or {}))
+        self.metrics = metrics
+        self.level = 0
+        self.memory_percent = None
+        self.cpu_percent = None
+        self._sessions = {}  # driver -> {'mode', 'since', 'grace_until', 'baseline'}
+        self._applied = {}  # driver -> modo já aplicado no Chrome
+        self._applying = set()  # Drivers com um _apply em andamento
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+        self._started = time.monotonic()
+        if psutil is not None:
+            psutil.cpu_percent(None)  # Primeira leitura só define a referência
+
+    def tick(self, drivers_to_govern, exclude=()):
+        """Amostra o sistema e ajusta cada sessão em espera; `exclude` são as que já passaram da fila"""
+        if psutil is None:
+            return
+        self.memory_percent = psutil.virtual_memory().percent
+        self.cpu_percent = psutil.cpu_percent(None)
+        self.level = self._next_level()
+
+        now = time.monotonic()
+        with self._lock:
+            for driver in drivers_to_govern:
+                if driver in exclude:
+                    continue
+                session = self._sessions.setdefault(driver, {
+                    'mode': 'active', 'since': now, 'grace_until': now + self.options['grace_seconds'],
+                    'baseline': None,
+                })
+                if now < session['grace_until']:
+                    continue
+                target = self._target_mode(session, now)
+                if target != session['mode']:
+                    self._transition(driver, session, target, now)
+
+    def wake(self, driver):
+        """A URL ou a página mudou: voltar ao normal na hora e dar um tempo livre"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(driver)
+            if session is None:
+                return
+            session['grace_until'] = now + self.options['grace_seconds']
+            if session['mode'] != 'active':
+                self._transition(driver, session, 'active', now)
+
+    def release(self, driver, restore=True):
+        """Sessão que passou da fila (normal para sempre) ou que foi perdida (`restore=False`)"""
+        if restore:
+            self.wake(driver)
+        with self._lock:
+            self._sessions.pop(driver, None)
+            if not restore or driver not in self._applying:
+                self._applied.pop(driver, None)  # Também interrompe um _apply em andamento da sessão perdida
+
+    def is_frozen(self, driver):
+        with self._lock:
+            session = self._sessions.get(driver)
+            return session is not None and session['mode'] == 'frozen'
+
+    def counts(self):
+        with self._lock:
+            modes = collections.Counter(session['mode'] for session in self._sessions.values())
+        return modes['throttled'], modes['frozen']
+
+    def savings(self):
+        """Estimativa de (MB, % de CPU) economizados: consumo antes de governar menos o consumo atual"""
+        if self.metrics is None:
+            return 0, 0
+        memory = cpu = 0
+        with self._lock:
+            sessions = [(driver, session['baseline']) for driver, session in self._sessions.items()
+                        if session['mode'] != 'active' and session['baseline']]
+        for driver, (base_rss, base_cpu) in sessions:
+            rss, cpu_now = self.metrics.usage(driver)
+            if rss is not None:
+                memory += max(0, base_rss - rss)
+            if cpu_now is not None:
+                cpu += max(0, base_cpu - cpu_now)
+        return memory, cpu
+
+    def summary(self):
+        """Texto para a barra de status"""
+        throttled, frozen = self.counts()
+        if not throttled and not frozen:
+            return ""
+        memory, cpu = self.savings()
+        text = f"governador: {throttled} lentas, {frozen} congeladas"
+        if memory or cpu:
+            text += f", ~{memory:.0f} MB e {cpu:.0f}% CPU economizados"
+        return text
+
+    def stop(self):
+        self._executor.shutdown(wait=False)
+
+    def _next_level(self):
+        memory, cpu = self.memory_percent, self.cpu_percent
+        level = 0
+        if memory >= self.options['memory_high']:
+            level = 2
+        elif cpu >= self.options['cpu_high']:
+            level = 1
+
+        # Histerese: só aliviar abaixo dos limites baixos
+        if level < self.level:
+            if self.level == 2 and memory >= self.options['memory_low']:
+                level = 2
+            elif memory >= self.options['memory_low'] or cpu >= self.options['cpu_low']:
+                level = max(level, 1)
+        return level
+
+    def _target_mode(self, session, now):
+        if self.level == 0:
+            return 'active'
+        if self.level == 1:
+            return 'throttled'
+
+        # Pressão de memória: congelar em rodízio, com janelas ativas para a fila continuar andando
+        elapsed = now - session['since']
+        if session['mode'] == 'frozen':
+            return 'throttled' if elapsed >= self.options['freeze_seconds'] else 'frozen'
+        if session['mode'] == 'throttled' and elapsed < self.options['thaw_seconds']:
+            return 'throttled'
+        return 'frozen'
+
+    def _transition(self, driver, session, mode, now):
+        previous = session['mode']
+        session['mode'] = mode
+        session['since'] = now
+        if previous == 'active' and self.metrics is not None:
+            rss, cpu = self.metrics.usage(driver)
+            session['baseline'] = (rss or 0, cpu or 0)
+        if self.metrics is not None:
+            self.metrics.update(driver, governor={'active': '', 'throttled': 'lenta', 'frozen': 'congelada'}[mode])
+        # Um _apply por driver de cada vez, sempre para o modo mais recente: mudanças rápidas (congelar e
+        # logo acordar) não podem ser aplicadas fora de ordem pelas threads do executor
+        if driver not in self._applying:
+            self._applying.add(driver)
+            self._executor.submit(self._apply_latest, driver)
+
+    def _apply_latest(self, driver):
+        while True:
+            with self._lock:
+                session = self._sessions.get(driver)
+                # Sessão liberada: o último modo pedido foi 'active' (release) ou ela foi perdida
+                mode = session['mode'] if session is not None else 'active'
+                previous = self._applied.get(driver, 'active')
+                if mode == previous or (session is None and driver not in self._applied):
+                    self._applying.discard(driver)
+                    if session is None:
+                        self._applied.pop(driver, None)
+                    return
+                self._applied[driver] = mode
+            self._apply(driver, previous, mode)
+
+    def _apply(self, driver, previous, mode):
+        """Aplica o modo por CDP (fora das threads do monitor)"""
+        try:
+            if previous == 'frozen':
+                set_lifecycle_state(driver, 'active')
+            if mode == 'active':
+                set_cpu_throttling(driver, 1)
+            elif mode == 'throttled':
+                set_cpu_throttling(driver, self.options['throttle_rate'])
+            elif mode == 'frozen':
+                set_cpu_throttling(driver, self.options['throttle_rate'])
+                set_lifecycle_state(driver, 'frozen')
+                purge_memory(driver)
+        except Exception as e:
+            print(f"Erro ao aplicar o modo '{mode}' na sessão: {e}")
+
+SUPERVISOR_DEFAULTS = {
+    'max_failures': 5,  # Falhas seguidas de um lugar da grade antes de desistir dele
+    'restarts_per_minute': 10,  # Reinícios no total por minuto, para uma falha geral não sobrecarregar a máquina
+    'base_delay': 1.0,  # Espera antes da primeira tentativa; dobra a cada falha seguida...
+    'max_delay': 60.0,  # ...até este máximo (s)
+    'stable_seconds': 30,  # Sessão que durou pelo menos isso antes de morrer zera as falhas seguidas
+}
+
+class SessionSupervisor:
+    """Mantém a quantidade de sessões pedida, reabrindo as que falham ou morrem no mesmo lugar da grade
+
+    Cada lugar (posição de calculate_positions e URL) espera mais a cada falha seguida e é abandonado
+    depois de `max_failures`; `restarts_per_minute` limita os reinícios de todos os lugares juntos.
+    `respawn(lugar, reinícios)` abre a sessão (bloqueante) e retorna o driver ou None.
+    """
+
+    def __init__(self, slots, respawn, options=None):
+        self.options = dict(SUPERVISOR_DEFAULTS, **(options or {}))
+        self.slots = slots  # [(posição, URL)]
+        self.respawn = respawn
+        self.restarts = [0] * len(slots)  # Reinícios por lugar
+        self.given_up = set()  # Lugares abandonados
+        self.active = True
+        self._failures = [0] * len(slots)  # Falhas seguidas por lugar
+        self._due = {}  # lugar -> horário da próxima tentativa
+        self._running = set()  # Lugares sendo reabertos agora
+        self._opened_at = {}  # lugar -> horário em que a sessão atual abriu
+        self._recent = collections.deque()  # Horários dos últimos reinícios
+        self._lock = threading.Lock()
+
+    def opened(self, slot):
+        """A sessão do lugar abriu"""
+        with self._lock:
+            self._opened_at[slot] = time.monotonic()
+
+    def failed(self, slot):
+        """A sessão do lugar não abriu ou morreu: agendar uma nova tentativa"""
+        now = time.monotonic()
+        with self._lock:
+            if not self.active or slot in self.given_up or slot in self._due or slot in self._running:
+                return
+            opened_at = self._opened_at.pop(slot, None)
+            if opened_at is not None and now - opened_at >= self.options['stable_seconds']:
+                self._failures[slot] = 0
+            self._failures[slot] += 1
+            failures = self._failures[slot]
+            if failures > self.options['max_failures']:
+                self.given_up.add(slot)
+                print(f"Lugar {slot + 1} abandonado depois de {failures - 1} tentativas")
+                return
+            delay = min(self.options['max_delay'], self.options['base_delay'] * 2 ** (failures - 1))
+            self._due[slot] = now + delay
+
+    def tick(self):
+        """Reabre, em segundo plano, os lugares cuja espera acabou, dentro do limite por minuto"""
+        now = time.monotonic()
+        launch = []
+        with self._lock:
+            if not self.active:
+                return
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            for slot in sorted(slot for slot, due in self._due.items() if due <= now):
+                if len(self._recent) >= self.options['restarts_per_minute']:
+                    break  # Os demais esperam o próximo minuto
+                del self._due[slot]
+                self._running.add(slot)
+                self._recent.append(now)
+                self.restarts[slot] += 1
+                launch.append(slot)
+        for slot in launch:
+            threading.Thread(target=self._run, args=(slot,), daemon=True).start()
+
+    def pending(self):
+        """Lugares esperando ou sendo reabertos"""
+        with self._lock:
+            return len(self._due) + len(self._running)
+
+    def summary(self):
+        """Texto para a barra de status"""
+        total = sum(self.restarts)
+        if not total and not self.given_up:
+            return ""
+        text = f"{total} reinícios"
+        pending = self.pending()
+        if pending:
+            text += f", {pending} aguardando"
+        if self.given_up:
+            text += f", {len(self.given_up)} abandonados"
+        return text
+
+    def stop(self):
+        """Encerra a supervisão: nenhuma sessão é reaberta a partir daqui"""
+        with self._lock:
+            self.active = False
+            self._due.clear()
+
+    def _run(self, slot):
+        driver = None
+        try:
+            driver = self.respawn(slot, self.restarts[slot])
+        except Exception as e:
+            print(f"Erro ao reabrir o lugar {slot + 1}: {e}")
+        with self._lock:
+            self._running.discard(slot)
+        if driver is None:
+            self.failed(slot)
+        else:
+            self.opened(slot)
+
+class SessionMetrics:
+    """Medições por sessão da execução atual: tempos de abertura, navegação, polling e recursos"""
+
+    COLUMNS = ('session', 'status', 'group', 'slot', 'restarts', 'launch_start_s', 'launch_end_s', 'startup_ms',
+               'first_get_ms', 'fire_ms', 'ttfb_ms', 'dom_content_loaded_ms', 'load_ms', 'poll_latency_ms', 'rss_mb',
+               'cpu_percent', 'governor', 'url')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Começa uma nova execução; as medições anteriores são descartadas"""
+        with self._lock:
+            self._started = time.perf_counter()
+            self._rows = {}  # número da sessão -> medições
+            self._sessions = {}  # driver -> número da sessão
+            self._processes = {}  # número da sessão -> {pid: psutil.Process}, para medir CPU entre amostras
+
+    def begin(self, **values):
+        """Registra o início da abertura de uma sessão e retorna o seu número"""
+        with self._lock:
+            session = len(self._rows) + 1
+            row = dict.fromkeys(self.COLUMNS)
+            row.update(values)
+            row.update(session=session, status='abrindo', launch_start_s=self._elapsed())
+            self._rows[session] = row
+            return session
+
+    def finish(self, session, driver, started, timings):
+        """Registra o fim da abertura; `timings` vem de open_session"""
+        with self._lock:
+            row = self._rows[session]
+            row['launch_end_s'] = self._elapsed()
+            if driver is None:
+                row['status'] = 'falhou'
+                return
+            self._sessions[driver] = session
+            row['status'] = 'pronta'
+            created = timings.get('created', started)
+            row['startup_ms'] = round((created - started) * 1000, 1)
+            if 'loaded' in timings:
+                row['first_get_ms'] = round((timings['loaded'] - created) * 1000, 1)
+
+    def update(self, driver, **values):
+        with self._lock:
+            session = self._sessions.get(driver)
+            if session is not None:
+                self._rows[session].update(values)
+
+    def rebind(self, old_driver, new_driver):
+        """A sessão continua a mesma quando o driver é trocado (promoção do modo headless)"""
+        with self._lock:
+            session = self._sessions.pop(old_driver, None)
+            if session is not None:
+                self._sessions[new_driver] = session
+                self._processes.pop(session, None)
+
+    def mark_closed(self, drivers_closed):
+        """Sessões fechadas pelo programa; as que passaram da fila mantêm o status"""
+        with self._lock:
+            for driver in drivers_closed:
+                session = self._sessions.get(driver)
+                if session is not None and self._rows[session]['status'] == 'pronta':
+                    self._rows[session]['status'] = 'fechada'
+
+    def needs_timing(self, driver):
+        with self._lock:
+            session = self._sessions.get(driver)
+            return session is not None and self._rows[session]['load_ms'] is None
+
+    def sample_usage(self, driver):
+        """Mede RSS (MB) e CPU (%) do chromedriver e do Chrome da sessão; retorna o RSS ou None"""
+        if psutil is None:
+            return None
+        with self._lock:
+            session = self._sessions.get(driver)
+            if session is None:
+                return None
+            known = self._processes.setdefault(session, {})
+
+        try:
+            root_pid = driver.service.process.pid
+            current = [psutil.Process(root_pid)]
+            current.extend(current[0].children(recursive=True))
+        except Exception:
+            return None
+
+        rss = 0
+        cpu = 0.0
+        processes = {}
+        for process in current:
+            # Reaproveitar o mesmo objeto Process para que cpu_percent meça desde a amostra anterior
+            process = known.get(process.pid, process)
+            try:
+                rss += process.memory_info().rss
+                cpu += process.cpu_percent(None)
+            except psutil.Error:
+                continue
+            processes[process.pid] = process
+
+        rss_mb = rss / (1024 * 1024)
+        with self._lock:
+            self._processes[session] = processes
+            self._rows[session].update(rss_mb=round(rss_mb, 1), cpu_percent=round(cpu, 1))
+        return rss_mb
+
+    def usage(self, driver):
+        """Última amostra de (RSS em MB, CPU em %) da sessão"""
+        with self._lock:
+            session = self._sessions.get(driver)
+            if session is None:
+                return None, None
+            row = self._rows[session]
+            return row['rss_mb'], row['cpu_percent']
+
+    def rows(self):
+        """Cópia das medições, em ordem de abertura"""
+        with self._lock:
+            return [dict(row) for _, row in sorted(self._rows.items())]
+
+    def export_csv(self, path):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+    def export_jsonl(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in self.rows():
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def export(self, path):
+        """Exporta em JSONL se a extensão for .jsonl, senão em CSV"""
+        if path.lower().endswith('.jsonl'):
+            self.export_jsonl(path)
+        else:
+            self.export_csv(path)
+
+    def _elapsed(self):
+        return round(time.perf_counter() - self._started, 3)
+
+class SessionManager:
+    """Abre, monitora e fecha as sessões do Chrome, avisando o cliente por eventos.
+
+    O `listener` recebe `(evento, dados)`:
+      - 'status': {'message'} — texto para a barra de status
+      - 'session_ready': {'driver', 'ready', 'total'} — uma sessão ficou pronta
+      - 'launched': {'count'} — abertura concluída
+      - 'scheduled': {'fire_at', 'offset', 'uncertainty'} — sessões prontas em about:blank esperando o disparo
+      - 'fired': {'count', 'spread_ms'} — as sessões navegaram para a URL no horário marcado
+      - 'url_changed': {'driver', 'url', 'group', 'rule'} — uma sessão passou da fila
+      - 'session_lost': {'driver'} — uma sessão morreu ou foi fechada
+      - 'session_restarted': {'driver', 'slot', 'restarts'} — o supervisor reabriu a sessão de um lugar da grade
+      - 'closed': {'clean', 'killed'} — sessões fechadas
+      - 'metrics': {'rows'} — medições por sessão atualizadas (ver SessionMetrics)
+      - 'snapshot': {'sessions', 'changed'} — estado das sessões salvo no SnapshotStore
+    """
+
+    def __init__(self, listener=None, driver_factory=create_driver, resolver=None, pool=None, template=None,
+                 snapshots=None):
+        self.listener = listener
+        self.driver_factory = driver_factory
+        self.resolver = resolver or default_driver_resolver()
+        self.pool = pool or DriverPool(driver_factory=driver_factory)
+        self.template = template or default_profile_template()
+        self.snapshots = snapshots or default_snapshot_store()
+        self.drivers = []  # Lista de drivers
+        self.driver_urls = {}  # URL atual de cada driver
+        self.start_urls = {}  # URL (de parse_url) em que cada driver chegou ao abrir; as regras comparam com ela
+        self.parsed_urls = {}  # Última URL de cada driver já decomposta, para não repetir o parse a cada consulta
+        self.rules = DetectionRules()  # Regras de detecção da execução atual
+        self.governor = None  # ResourceGovernor da execução atual, se ativado
+        self.supervisor = None  # SessionSupervisor da execução atual, se ativado
+        self.slots = []  # (posição, URL) de cada lugar da grade da execução atual
+        self.driver_slots = {}  # Lugar da grade de cada driver
+        self.last_dom = {}  # Último estado da página de cada driver (regras de DOM), para acordar o governador
+        self.driver_groups = {}  # URL da especificação que cada driver abriu
+        self.groups = {}  # URL da especificação -> {'sessions', 'detected'}
+        self.detected = set()  # Drivers que já passaram da fila
+        self.headless_drivers = set()  # Drivers rodando sem janela (modo headless)
+        self.options = {'auto_close': True, 'incognito': False, 'event_detection': True, 'headless': False,
+                        'profile': DEFAULT_PROFILE, 'use_template': False, 'driver_path': None, 'snapshot': False}
+        self.memory_summary = ""  # Último resumo de memória por sessão
+        self.metrics = SessionMetrics()  # Medições por sessão da execução atual
+        self.lock = threading.RLock()  # Protege a lista de drivers entre o monitor e os eventos de navegação
+        self._stop_monitor = False
+        self._monitor_run = 0  # Monitores de execuções anteriores se encerram sozinhos
+        self._watcher = None  # NavigationWatcher do monitor atual, para observar as sessões reabertas
+        self._snapshot_lock = threading.Lock()  # Um snapshot por vez
+
+    @property
+    def local_backend(self):
+        """Se as sessões são criadas nesta máquina (chromedriver local) ou num backend remoto"""
+        return getattr(self.driver_factory, 'local', True)
+
+    def set_driver_factory(self, driver_factory):
+        """Troca o backend das próximas sessões (ex.: create_driver ou um GridBackend)"""
+        previous = self.driver_factory
+        self.driver_factory = driver_factory
+        self.pool.set_driver_factory(driver_factory)
+        if previous is not driver_factory and hasattr(previous, 'close'):
+            previous.close()
+
+    def emit(self, event, **data):
+        if self.listener is not None:
+            try:
+                self.listener(event, data)
+            except Exception as e:
+                print(f"Erro ao tratar evento {event}: {e}")
+
+    def status(self, message):
+        self.emit('status', message=message)
+
+    def publish_metrics(self):
+        self.emit('metrics', rows=self.metrics.rows())
+
+    def launch(self, url, num_sessions, auto_close=True, incognito=False, auto_arrange=True, headless=False,
+               profile=DEFAULT_PROFILE, use_template=False, event_detection=True, watch=True, rules=None,
+               governor=None, supervisor=None, fire_at=None, snapshot=False, restore=None):
+        """Abre as sessões e, se `watch`, inicia o monitoramento em segundo plano. Retorna quantas abriram
+
+        `url` pode ser uma URL, uma especificação com várias URLs (ver parse_url_targets) ou a lista
+        de alvos já lida. `rules` é o texto das regras de detecção (ver DetectionRules) ou as regras
+        já compiladas; sem regras, a sessão passa quando sai do domínio em que abriu. `governor` ativa o
+        ResourceGovernor com os limites informados (dict, ver GOVERNOR_DEFAULTS; {} usa os padrões).
+        `supervisor` ativa o SessionSupervisor, que reabre as sessões que falham ou morrem (dict, ver
+        SUPERVISOR_DEFAULTS). Com `fire_at` (timestamp na hora do servidor), as sessões abrem em
+        about:blank e navegam todas juntas nesse horário (ver fire). Com `snapshot`, o estado das sessões
+        é salvo periodicamente no SnapshotStore; `restore` (lugar -> estado) é usado por restore().
+        """
+        try:
+            targets = parse_url_targets(url) if isinstance(url, str) else url
+            session_urls = assign_urls(targets, num_sessions)
+            detection_rules = rules if isinstance(rules, DetectionRules) else DetectionRules(rules)
+        except ValueError as e:
+            self.status(f"Erro: {e}")
+            return 0
+
+        # Limpar sessões anteriores
+        self.close()
+        self.headless_drivers.clear()
+        self.options.update(auto_close=auto_close, incognito=incognito, event_detection=event_detection,
+                            headless=headless, profile=profile, snapshot=snapshot)
+
+        # close() sinaliza a parada do monitor; liberar novamente para esta execução
+        with self.lock:
+            self._stop_monitor = False
+            self._monitor_run += 1
+            run = self._monitor_run
+
+        def cancelled():
+            """close() foi chamado (ex.: /close do coordenador) enquanto esta execução abria"""
+            return self._stop_monitor or run != self._monitor_run
+        self.metrics.reset()
+        self.detected.clear()
+        self.rules = detection_rules
+        self.last_dom.clear()
+        if governor is not None:
+            if psutil is None:
+                print("Governador de recursos desativado: instale o psutil")
+            elif not self.local_backend:
+                print("Governador de recursos desativado: as sessões não rodam nesta máquina")
+            else:
+                self.governor = ResourceGovernor(governor, self.metrics)
+        self.groups = {t['url']: {'sessions': session_urls.count(t['url']), 'detected': 0} for t in targets}
+
+        # Parâmetros da execução no arquivo de snapshots, para que restore() possa repeti-la
+        if snapshot:
+            try:
+                self.snapshots.begin({
+                    'targets': targets, 'sessions': num_sessions,
+                    'options': {'auto_close': auto_close, 'incognito': incognito, 'auto_arrange': auto_arrange,
+                                'headless': headless, 'profile': profile, 'use_template': use_template,
+                                'event_detection': event_detection, 'rules': detection_rules.text,
+                                'governor': governor, 'supervisor': supervisor, 'snapshot': True},
+                }, restore)
+            except OSError as e:
+                print(f"Erro ao iniciar o arquivo de snapshots: {e}")
+                self.options['snapshot'] = False
+
+        # Disparo agendado: medir o relógio do servidor enquanto as sessões abrem
+        clock = None
+        if fire_at is not None:
+            clock = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            clock_offset = clock.submit(measure_clock_offset, targets[0]['url'])
+            clock.shutdown(wait=False)
+
+        # Calcular posições; cada lugar da grade guarda a sua posição e URL para o supervisor
+        positions = calculate_positions(num_sessions, auto_arrange)
+        self.slots = list(zip(positions, session_urls))
+        self.driver_slots.clear()
+        if supervisor is not None:
+            self.supervisor = SessionSupervisor(self.slots, self.respawn, supervisor)
+
+        self.status(f"Iniciando {num_sessions} sessões...")
+
+        # Resolver o chromedriver uma única vez (já em cache); cada sessão recebe seu próprio Service.
+        # Backends remotos (Grid) não usam chromedriver local
+        driver_path = None
+        if self.local_backend:
+            try:
+                driver_path = self.resolver.resolve()
+            except Exception as e:
+                self.status(f"Erro ao preparar o chromedriver: {e}")
+                return 0
+        elif use_template:
+            print("Perfil modelo ignorado: as sessões remotas não têm acesso aos perfis locais")
+            use_template = False
+
+        # Perfil modelo: cache e cookies aquecidos uma vez, clonados para cada sessão nova
+        if use_template:
+            self.status("Preparando perfil modelo...")
+            try:
+                self.template.ensure(targets[0]['url'], driver_path)
+            except Exception as e:
+                print(f"Erro ao preparar o perfil modelo: {e}")
+                use_template = False
+            self.status(f"Iniciando {num_sessions} sessões...")
+        self.options.update(use_template=use_template, driver_path=driver_path)
+        if cancelled():
+            return 0
+
+        # Retirar do pool as janelas já pré-carregadas; só as que faltarem serão criadas do zero
+        pooled = []
+        cold_positions = []
+        if self.pool.matches(incognito, profile) and not headless and not restore:
+            for slot, (pos, session_url) in enumerate(self.slots):
+                driver = self.pool.checkout(pos)
+                if driver:
+                    pooled.append((driver, slot))
+                else:
+                    cold_positions.append(slot)
+        else:
+            cold_positions = list(range(num_sessions))
+
+        def publish(driver):
+            if not self.publish_driver(driver, num_sessions, run):
+                # A execução foi cancelada enquanto a sessão abria: ela não pode ficar aberta sem monitor
+                self.driver_slots.pop(driver, None)
+                threading.Thread(target=teardown_drivers, args=([driver],),
+                                 kwargs={'close': self.pool.release, 'on_killed': self.pool.forget},
+                                 daemon=True).start()
+
+        def open_cold(slot):
+            if cancelled():
+                return None
+            state = restore.get(slot) if restore else None
+            driver = self.open_slot(slot, blank=fire_at is not None or state is not None)
+            if driver is not None and state is not None:
+                driver = self.restore_slot(driver, slot, state)
+            supervisor = self.supervisor  # close() pode zerá-lo a qualquer momento
+            if supervisor is not None:
+                if driver is None:
+                    supervisor.failed(slot)
+                else:
+                    supervisor.opened(slot)
+            return driver
+
+        def navigate(driver, slot):
+            url = self.slots[slot][1]
+            session = self.metrics.begin(slot=slot)
+            started = time.perf_counter()
+            self.driver_groups[driver] = url
+            self.driver_slots[driver] = slot
+            if cancelled():
+                return driver  # publish o devolve ao pool
+            try:
+                if fire_at is None:
+                    driver.get(url)  # No disparo agendado a janela do pool já espera em about:blank
+                # Janela do pool: sem tempo de inicialização, só o driver.get
+                self.metrics.finish(session, driver, started, {'created': started, 'loaded': time.perf_counter()})
+                supervisor = self.supervisor
+                if supervisor is not None:
+                    supervisor.opened(slot)
+                return driver
+            except Exception as e:
+                print(f"Erro ao abrir sessão: {e}")
+                self.metrics.finish(session, None, started, {})
+                self.driver_slots.pop(driver, None)
+                teardown_drivers([driver], close=self.pool.release, on_killed=self.pool.forget)
+                supervisor = self.supervisor
+                if supervisor is not None:
+                    supervisor.failed(slot)
+                return None
+
+        # Sessões do pool: apenas driver.get(url) em paralelo, sem competir com as inicializações
+        pooled_executor = None
+        if pooled:
+            pooled_executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(pooled))
+            for driver, slot in pooled:
+                future = pooled_executor.submit(navigate, driver, slot)
+                future.add_done_callback(lambda f: f.result() and publish(f.result()))
+
+        # Sessões novas: janela deslizante adaptada à CPU, memória livre e latência medida
+        scheduler = LaunchScheduler()
+        scheduler.run([lambda slot=slot: open_cold(slot) for slot in cold_positions], publish, cancelled)
+
+        if pooled_executor:
+            pooled_executor.shutdown(wait=True)
+        if cancelled():
+            return 0
+
+        if clock is not None:
+            try:
+                offset, uncertainty = clock_offset.result()
+            except Exception as e:
+                print(f"Erro ao medir o relógio do servidor: {e}")
+                self.status("Relógio do servidor indisponível; usando o relógio local")
+                offset, uncertainty = 0.0, None
+            if not self.fire(fire_at, offset, uncertainty):
+                return 0
+
+        # Reabastecer o pool em segundo plano para a próxima execução
+        self.pool.configure(driver_path=driver_path, incognito=incognito, profile=profile)
+
+        self.status(f"{len(self.drivers)} sessões ativas")
+        self.emit('launched', count=len(self.drivers))
+
+        # Medir memória, CPU e tempos de navegação por sessão fora do caminho crítico
+        threading.Thread(target=self.update_memory_summary, daemon=True).start()
+
+        # Iniciar monitoramento (no modo headless ele também é necessário para exibir a sessão que passar,
+        # e com o supervisor para reabrir as sessões que falharem)
+        if watch and (auto_close or headless or self.supervisor is not None):
+            threading.Thread(target=self.watch, daemon=True).start()
+
+        return len(self.drivers)
+
+    def open_slot(self, slot, restarts=None, blank=False):
+        """Abre a sessão de um lugar da grade (bloqueante); retorna o driver ou None
+
+        Com `blank`, a sessão fica em about:blank esperando o disparo agendado.
+        """
+        position, url = self.slots[slot]
+        options = self.options
+        session = self.metrics.begin(slot=slot, restarts=restarts)
+        timings = {}
+        started = time.perf_counter()
+        service = make_service(options['driver_path']) if options['driver_path'] else None
+        user_data_dir = None
+        if options['use_template']:
+            try:
+                user_data_dir = self.template.clone()
+            except OSError as e:
+                # Ex.: disco cheio; a sessão abre com um perfil novo em vez de derrubar a abertura das outras
+                print(f"Erro ao clonar o perfil modelo, usando um perfil novo: {e}")
+        driver = open_session('about:blank' if blank else url, position, options['incognito'], service,
+                              options['headless'], options['profile'], user_data_dir,
+                              self.driver_factory, timings)
+        if driver is not None:
+            self.driver_groups[driver] = url
+            self.driver_slots[driver] = slot
+        self.metrics.finish(session, driver, started, timings)
+        return driver
+
+    def restore_slot(self, driver, slot, state):
+        """Injeta cookies e storage salvos numa sessão recém-aberta em about:blank e navega para a URL salva"""
+        started = time.perf_counter()
+        try:
+            import_session_state(driver, state)
+            self.metrics.update(driver, first_get_ms=round((time.perf_counter() - started) * 1000, 1))
+        except Exception as e:
+            # Sem o estado, a sessão ao menos abre a URL do seu lugar
+            print(f"Erro ao restaurar o lugar {slot + 1}: {e}")
+            try:
+                driver.get(self.slots[slot][1])
+            except Exception as e:
+                print(f"Erro ao abrir sessão: {e}")
+                teardown_drivers([driver])
+                return None
+        return driver
+
+    def restore(self, watch=True):
+        """Reabre a última execução salva pelo SnapshotStore, cada sessão com os seus cookies e storage"""
+        try:
+            run, states = self.snapshots.load()
+        except (OSError, ValueError, KeyError) as e:
+            self.status(f"Nada para restaurar: {e}")
+            return 0
+        if run is None:
+            self.status("Nada para restaurar")
+            return 0
+        self.status(f"Restaurando {len(states)} de {run['sessions']} sessões...")
+        return self.launch(run['targets'], run['sessions'], watch=watch, restore=states, **run['options'])
+
+    def save_snapshot(self):
+        """Salva o estado de cada sessão no SnapshotStore; só o que mudou vai para o disco"""
+        if not self._snapshot_lock.acquire(blocking=False):
+            return  # O snapshot anterior ainda não terminou
+        try:
+            with self.lock:
+                drivers = [(driver, self.driver_slots[driver]) for driver in self.drivers
+                           if driver in self.driver_slots]
+            if self.governor is not None:
+                # Página congelada não executa o script de leitura do storage
+                drivers = [(driver, slot) for driver, slot in drivers if not self.governor.is_frozen(driver)]
+            if not drivers:
+                return
+
+            def read(item):
+                driver, slot = item
+                try:
+                    return slot, export_session_state(driver)
+                except Exception:
+                    return slot, None  # Sessão ocupada ou fechando: fica para o próximo snapshot
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(16, len(drivers))) as executor:
+                states = {slot: state for slot, state in executor.map(read, drivers) if state is not None}
+            try:
+                changed = self.snapshots.save(states)
+            except OSError as e:
+                print(f"Erro ao salvar o snapshot das sessões: {e}")
+                return
+            self.emit('snapshot', sessions=len(states), changed=changed)
+        finally:
+            self._snapshot_lock.release()
+
+    def discard_snapshot(self):
+        """Apaga o snapshot da execução que terminou normalmente"""
+        try:
+            self.snapshots.discard()
+        except OSError as e:
+            print(f"Erro ao apagar o arquivo de snapshots: {e}")
+
+    def publish_driver(self, driver, total, run=None):
+        """Coloca um driver pronto em `drivers`, sem esperar os demais
+
+        Com `run`, retorna False sem publicar se close() encerrou essa execução; o chamador fecha o driver.
+        """
+        group = self.driver_groups.get(driver)
+        try:
+            current_url = driver.current_url
+        except Exception:
+            current_url = group
+        with self.lock:
+            if run is not None and (self._stop_monitor or run != self._monitor_run):
+                return False
+            if self.options['headless']:
+                self.headless_drivers.add(driver)
+            self.drivers.append(driver)
+            self.driver_urls[driver] = current_url
+            self.start_urls[driver] = parse_url(current_url)
+            ready = len(self.drivers)
+        self.metrics.update(driver, url=current_url, group=group)
+        self.emit('session_ready', driver=driver, ready=ready, total=total)
+        self.status(f"{ready}/{total} sessões prontas...")
+        self.publish_metrics()
+        return True
+
+    def fire(self, fire_at, offset=0.0, uncertainty=None):
+        """Navega todas as sessões prontas para a sua URL no horário `fire_at` do servidor (bloqueante)
+
+        `offset` vem de measure_clock_offset. Cada sessão tem uma thread já parada no Event de disparo,
+        para que os driver.get comecem juntos. Retorna False se close() cancelar a espera.
+        """
+        deadline = fire_at - offset  # Horário local equivalente
+        when = time.strftime('%H:%M:%S', time.localtime(fire_at)) + f".{int(fire_at % 1 * 1000):03d}"
+        precision = f" ± {uncertainty * 1000:.0f} ms" if uncertainty is not None else ""
+        self.emit('scheduled', fire_at=fire_at, offset=offset, uncertainty=uncertainty)
+        if deadline <= time.time():
+            print(f"O horário de disparo {when} já passou no relógio do servidor; disparando agora")
+
+        drivers = list(self.drivers)
+        go = threading.Event()
+        cancelled = []
+        fired = {}  # perf_counter ajustado do disparo
+        starts = {}
+
+        def navigate(driver):
+            go.wait()
+            if cancelled:
+                return
+            started = time.perf_counter()
+            starts[driver] = started
+            try:
+                driver.get(self.driver_groups[driver])
+                loaded = time.perf_counter()
+                current_url = driver.current_url
+            except Exception as e:
+                print(f"Erro ao navegar no disparo: {e}")
+                # Sem a URL de chegada as regras não comparariam com about:blank
+                self.start_urls.pop(driver, None)
+                return
+            with self.lock:
+                self.driver_urls[driver] = current_url
+                self.start_urls[driver] = parse_url(current_url)
+            self.metrics.update(driver, url=current_url, first_get_ms=round((loaded - started) * 1000, 1),
+                                fire_ms=round((started - fired['at']) * 1000, 1))
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(drivers)))
+        for driver in drivers:
+            executor.submit(navigate, driver)
+
+        # Contagem regressiva na barra de status; o último segundo em espera precisa
+        while not self._stop_monitor and deadline - time.time() > 1.5:
+            self.status(f"{len(self.drivers)} sessões em espera · disparo às {when} do servidor "
+                        f"(relógio {offset:+.3f} s{precision}) em {deadline - time.time():.0f} s")
+            time.sleep(min(1.0, deadline - time.time() - 1.0))
+        if not wait_until(deadline, lambda: self._stop_monitor):
+            cancelled.append(True)
+            go.set()
+            executor.shutdown(wait=False)
+            return False
+        # perf_counter que corresponde ao horário exato do disparo, descontando o atraso da espera
+        fired['at'] = time.perf_counter() - (time.time() - deadline)
+        go.set()
+        executor.shutdown(wait=True)
+
+        spread_ms = (max(starts.values()) - min(starts.values())) * 1000 if starts else 0
+        self.status(f"{len(starts)} sessões disparadas às {when} (dispersão {spread_ms:.1f} ms)")
+        self.emit('fired', count=len(starts), spread_ms=spread_ms)
+        self.publish_metrics()
+        return True
+
+    def respawn(self, slot, restarts):
+        """Reabre a sessão de um lugar da grade (chamado pelo SessionSupervisor)"""
+        run = self._monitor_run
+        # Se a sessão não abrir, o próprio supervisor agenda a próxima tentativa
+        driver = self.open_slot(slot, restarts)
+        if driver is None:
+            return None
+        supervisor = self.supervisor
+        if supervisor is None or not supervisor.active or not self.publish_driver(driver, len(self.slots), run):
+            # A execução acabou (ou uma sessão passou) enquanto a sessão abria
+            self.driver_slots.pop(driver, None)
+            threading.Thread(target=teardown_drivers, args=([driver],), daemon=True).start()
+            return None
+        if self._watcher is not None:
+            self._watcher.watch(driver)
+        self.status(f"Lugar {slot + 1} reaberto ({restarts} reinícios)")
+        self.emit('session_restarted', driver=driver, slot=slot, restarts=restarts)
+        return driver
+
+    def measure_memory(self):
+        """Amostra memória, CPU e tempos de navegação de cada sessão e atualiza o resumo"""
+        measurements = []
+        for driver in list(self.drivers):
+            measurements.append(self.metrics.sample_usage(driver))
+            if self.metrics.needs_timing(driver):
+                timing = get_navigation_timing(driver)
+                if timing:
+                    self.metrics.update(driver, **timing)
+        self.memory_summary = summarize_memory(measurements)
+        self.publish_metrics()
+
+    def update_memory_summary(self):
+        """Atualiza o resumo de memória das sessões mostrado na barra de status"""
+        self.measure_memory()
+        if self.memory_summary:
+            self.status(f"{len(self.drivers)} sessões ativas · {self.memory_summary}")
+
+    def promote(self, headless_driver):
+        """Abre uma janela visível no monitor principal com o mesmo estado da sessão headless"""
+        state = export_session_state(headless_driver)
+        incognito = self.options['incognito']
+
+        primary = get_screen_info()[0]
+        position = (primary['width'], primary['height'], primary['x_offset'], primary['y_offset'])
+
+        # Uma janela do pool evita a inicialização a frio no momento mais crítico
+        driver = self.pool.checkout(position) if self.pool.local and self.pool.incognito == incognito else None
+        if driver is None:
+            service = make_service(self.resolver.resolve()) if self.local_backend else None
+            driver = self.driver_factory(position, incognito, service, profile='full')
+        unblock_resources(driver)
+
+        import_session_state(driver, state)
+        return driver
+
+    def handle_url_change(self, changed_driver, current_url, rule=None):
+        """Maximiza a janela que mudou de domínio e fecha as outras, se configurado"""
+        with self.lock:
+            if changed_driver not in self.drivers or changed_driver in self.detected:
+                return
+
+            group = self.driver_groups.get(changed_driver)
+            self.detected.add(changed_driver)
+            if group in self.groups:
+                self.groups[group]['detected'] += 1
+
+            self.status(f"URL alterada: {current_url}" + (f" (regra: {rule})" if rule else ""))
+            if self.governor is not None:
+                self.governor.release(changed_driver)
+            self.metrics.update(changed_driver, status='passou')
+            self.emit('url_changed', driver=changed_driver, url=current_url, group=group, rule=rule)
+
+            # Maximizar a janela que mudou
+            try:
+                if changed_driver in self.headless_drivers:
+                    # Sessão sem janela: promover para uma janela real mantendo cookies e storage
+                    promoted = self.promote(changed_driver)
+                    self.headless_drivers.discard(changed_driver)
+                    self.drivers[self.drivers.index(changed_driver)] = promoted
+                    self.metrics.rebind(changed_driver, promoted)
+                    self.driver_urls[promoted] = self.driver_urls.pop(changed_driver, current_url)
+                    self.start_urls[promoted] = self.start_urls.pop(changed_driver, None)
+                    self.driver_groups[promoted] = self.driver_groups.pop(changed_driver, group)
+                    if changed_driver in self.driver_slots:
+                        self.driver_slots[promoted] = self.driver_slots.pop(changed_driver)
+                    self.detected.add(promoted)
+                    threading.Thread(target=teardown_drivers, args=([changed_driver],), daemon=True).start()
+                    changed_driver = promoted
+
+                # A janela que passou volta a carregar imagens e fontes
+                unblock_resources(changed_driver)
+                maximize_window_on_primary(changed_driver)
+
+                # Se auto_close estiver ativado, fecha as outras janelas em segundo plano
+                if self.options['auto_close']:
+                    if self.supervisor is not None:
+                        self.supervisor.stop()  # As outras sessões não devem ser reabertas
+                    others = [driver for driver in self.drivers if driver != changed_driver]
+                    self.metrics.mark_closed(others)
+                    threading.Thread(target=teardown_drivers, args=(others,), daemon=True).start()
+                    # Manter apenas o driver que mudou
+                    self.drivers[:] = [changed_driver]
+            except Exception as e:
+                print(f"Erro ao maximizar janela: {e}")
+
+    def check_url(self, driver, current_url, dom=None):
+        """Registra a URL atual do driver e aplica as regras de detecção; `dom` vem de DetectionRules.probe"""
+        previous_url = self.driver_urls.get(driver)
+        self.driver_urls[driver] = current_url
+        if driver in self.detected:
+            return False
+        if self.governor is not None and (previous_url != current_url or
+                                          (dom is not None and dom != self.last_dom.get(driver))):
+            # A página andou: a sessão volta ao normal na hora
+            if previous_url is not None:
+                self.governor.wake(driver)
+        if dom is not None:
+            self.last_dom[driver] = dom
+        if previous_url != current_url:
+            self.metrics.update(driver, url=current_url)
+        elif dom is None:
+            # Mesma URL e nada novo da página: o resultado das regras não muda
+            return False
+
+        start_url = self.start_urls.get(driver)
+        if start_url is None:
+            return False
+
+        parsed = self.parsed_urls.get(driver)
+        if parsed is None or parsed.url != current_url:
+            parsed = self.parsed_urls[driver] = parse_url(current_url)
+
+        # Cada sessão é comparada com a URL em que ela própria chegou, não com as das outras URLs da execução
+        rule = self.rules.match(parsed, start_url, dom)
+        if rule is not None:
+            self.handle_url_change(driver, current_url, rule)
+            return True
+        return False
+
+    def group_summary(self):
+        """Sessões ativas e detecções por URL da especificação, para a barra de status"""
+        if len(self.groups) < 2:
+            return ""
+        active = collections.Counter(self.driver_groups.get(driver) for driver in list(self.drivers))
+        parts = []
+        for group, info in self.groups.items():
+            part = f"{group.split('://', 1)[-1]}: {active.get(group, 0)}"
+            if info['detected']:
+                part += f" ({info['detected']} passou)"
+            parts.append(part)
+        return " | ".join(parts)
+
+    def remove_driver(self, driver):
+        """Sessão fechada ou morta; drivers que não são mais desta execução são ignorados
+
+        (ex.: o driver devolvido ao pool por close(), cuja aba antiga reset_browser_state fecha)
+        """
+        with self.lock:
+            if driver not in self.drivers:
+                return
+            self.drivers.remove(driver)
+        self._lose_driver(driver)
+
+    def _lose_driver(self, driver):
+        with self.lock:
+            slot = self.driver_slots.pop(driver, None)
+        self.metrics.update(driver, status='perdida')
+        if self.governor is not None:
+            self.governor.release(driver, restore=False)
+        self.emit('session_lost', driver=driver)
+        # Sessão que morreu ou foi fechada antes de passar da fila: o supervisor reabre o seu lugar
+        if self.supervisor is not None and slot is not None and driver not in self.detected:
+            self.supervisor.failed(slot)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def watch(self):
+        """Monitora as sessões até todas fecharem ou close() ser chamado (bloqueante)"""
+        run = self._monitor_run
+
+        # Modo por eventos: as navegações chegam pelo DevTools assim que acontecem
+        watcher = None
+        if self.options['event_detection']:
+            watcher = NavigationWatcher(on_navigate=self.check_url, on_closed=self.remove_driver)
+            for driver in list(self.drivers):
+                watcher.watch(driver)
+        self._watcher = watcher
+
+        poller = DriverPoller(max_workers=min(64, len(self.drivers) + 4))
+        pass_count = 0
+
+        try:
+            while not self._stop_monitor and run == self._monitor_run:
+                time.sleep(1)
+
+                if self._stop_monitor or run != self._monitor_run:
+                    break
+
+                # Verificar por polling apenas as janelas que não estão sendo observadas por eventos,
+                # todas em paralelo para que uma janela travada não atrase as outras; regras de página
+                # precisam consultar todas, pois o conteúdo muda sem gerar navegação
+                probe = self.rules.probe if self.rules.needs_dom else None
+                polled = [d for d in self.drivers if probe or not (watcher and watcher.is_watching(d))]
+                results, dead_drivers = poller.poll(polled, probe)
+
+                for driver, latency in poller.latencies.items():
+                    self.metrics.update(driver, poll_latency_ms=round(latency, 1))
+
+                for driver, current_url in results.items():
+                    if self.check_url(driver, current_url, poller.snapshots.get(driver)):
+                        break  # Encontramos uma mudança significativa, interromper a verificação
+
+                for driver in dead_drivers:
+                    # O quit pode travar em um driver que não responde, então não esperar por ele
+                    with self.lock:
+                        owned = driver in self.drivers
+                        if owned:
+                            self.drivers.remove(driver)
+                    if owned:
+                        threading.Thread(target=self._lose_driver, args=(driver,), daemon=True).start()
+
+                pass_count += 1
+                supervisor = self.supervisor
+                if supervisor is not None:
+                    supervisor.tick()
+                if self.options['snapshot'] and pass_count % SNAPSHOT_INTERVAL == 0:
+                    threading.Thread(target=self.save_snapshot, daemon=True).start()
+                if self.governor is not None and pass_count % 2 == 0:
+                    self.governor.tick(list(self.drivers), self.detected)
+                if pass_count % 5 == 0:
+                    threading.Thread(target=self.measure_memory, daemon=True).start()
+                elif polled:
+                    self.publish_metrics()
+
+                status = f"{len(self.drivers)} sessões ativas"
+                quarantined = len(poller.quarantined())
+                if quarantined:
+                    status += f" ({quarantined} sem resposta)"
+                groups = self.group_summary()
+                if groups:
+                    status += f" · {groups}"
+                if self.governor is not None:
+                    governed = self.governor.summary()
+                    if governed:
+                        status += f" · {governed}"
+                if supervisor is not None:
+                    restarted = supervisor.summary()
+                    if restarted:
+                        status += f" · {restarted}"
+                if self.memory_summary:
+                    status += f" · {self.memory_summary}"
+                self.status(status)
+
+                if not self.drivers and not (supervisor is not None and supervisor.pending()):
+                    self.status("Todas as sessões foram fechadas")
+                    self._stop_monitor = True
+                    break
+        finally:
+            poller.shutdown()
+            if watcher:
+                watcher.stop()
+            if self._watcher is watcher:
+                self._watcher = None
+
+    def _stop_watcher(self):
+        """Desconecta o NavigationWatcher antes de fechar os drivers: ao devolver um driver ao pool,
+        reset_browser_state fecha a aba observada, o que o watcher trataria como sessão perdida"""
+        watcher = self._watcher
+        self._watcher = None
+        if watcher is not None:
+            watcher.stop()
+
+    def close(self):
+        """Fecha todas as sessões; drivers do pool voltam para about:blank
+
+        Também cancela uma abertura em andamento (launch em outra thread): as sessões que ainda não
+        começaram não abrem e as que terminarem de abrir depois disso são fechadas.
+        """
+        with self.lock:
+            self._stop_monitor = True
+            self._monitor_run += 1
+            drivers = list(self.drivers)
+            self.drivers.clear()
+        self._stop_watcher()
+        clean = killed = 0
+        if self.supervisor is not None:
+            self.supervisor.stop()
+            self.supervisor = None
+        if self.governor is not None:
+            self.governor.stop()
+            self.governor = None
+
+        if drivers:
+            self.metrics.mark_closed(drivers)
+            clean, killed = teardown_drivers(drivers, close=self.pool.release, on_killed=self.pool.forget)
+
+            self.driver_urls.clear()
+            self.start_urls.clear()
+            self.parsed_urls.clear()
+            self.driver_groups.clear()
+            self.driver_slots.clear()
+            self.template.cleanup()
+        self.discard_snapshot()
+
+        if killed:
+            self.status(f"Sessões fechadas: {clean} normalmente, {killed} à força")
+        else:
+            self.status("Todas as sessões foram fechadas")
+        self.publish_metrics()
+        self.emit('closed', clean=clean, killed=killed)
+        return clean, killed
+
+    def shutdown(self, deadline=2.0):
+        """Encerra sessões e pool de uma vez, para a saída do programa"""
+        with self.lock:
+            self._stop_monitor = True
+            self._monitor_run += 1
+            drivers = list(self.drivers)
+            self.drivers.clear()
+        self._stop_watcher()
+        if self.supervisor is not None:
+            self.supervisor.stop()
+            self.supervisor = None
+        if self.governor is not None:
+            self.governor.stop()
+            self.governor = None
+        clean, killed = teardown_drivers(drivers + self.pool.shutdown(), deadline=deadline)
+        self.template.cleanup()
+        self.discard_snapshot()
+        self.emit('closed', clean=clean, killed=killed)
+        return clean, killed
+
+def main(argv=None):
+    """Linha de comando: abre N sessões e monitora até uma passar da fila ou Ctrl+C"""
+    parser = argparse.ArgumentParser(prog='python -m session_engine',
+                                     description="Abre e monitora várias sessões do Chrome sem interface gráfica")
+    parser.add_argument('urls', nargs='*', metavar='URL',
+                        help="URLs do site, cada uma seguida opcionalmente de um peso (60%%) ou quantidade fixa")
+    parser.add_argument('-n', '--sessions', type=int, default=1, help="número de sessões")
+    parser.add_argument('--keep-others', action='store_true',
+                        help="não fechar as outras janelas quando uma passar da fila")
+    parser.add_argument('--incognito', action='store_true', help="modo anônimo")
+    parser.add_argument('--no-arrange', action='store_true', help="não organizar as janelas automaticamente")
+    parser.add_argument('--headless', action='store_true', help="sessões sem janela")
+    parser.add_argument('--profile', choices=list(LAUNCH_PROFILES), default=DEFAULT_PROFILE,
+                        help="perfil de recursos das sessões")
+    parser.add_argument('--template', action='store_true', help="usar perfil modelo com cache aquecido")
+    parser.add_argument('--polling', action='store_true', help="detectar mudanças só por polling")
+    parser.add_argument('--rule', action='append', metavar='REGRA',
+                        help="regra de detecção (pode repetir), ex.: 'path:/checkout' ou 'css:#pagamento'")
+    parser.add_argument('--grid', action='append', metavar='URL',
+                        help="abrir as sessões num Selenium Grid ou standalone (pode repetir um por nó)")
+    parser.add_argument('--grid-max', type=int, default=0, metavar='N',
+                        help="máximo de sessões simultâneas por nó do Grid")
+    parser.add_argument('--no-governor', action='store_true',
+                        help="não reduzir o consumo das sessões em espera sob pressão de memória ou CPU")
+    for name in GOVERNOR_LIMITS:
+        parser.add_argument('--' + name.replace('_', '-'), type=float, default=GOVERNOR_DEFAULTS[name],
+                            metavar='%', help=f"limite do governador (padrão: {GOVERNOR_DEFAULTS[name]}%%)")
+    parser.add_argument('--no-supervisor', action='store_true',
+                        help="não reabrir as sessões que falharem ou morrerem")
+    parser.add_argument('--max-failures', type=int, default=SUPERVISOR_DEFAULTS['max_failures'], metavar='N',
+                        help="falhas seguidas de um lugar da grade antes de desistir dele")
+    parser.add_argument('--restarts-per-minute', type=int, default=SUPERVISOR_DEFAULTS['restarts_per_minute'],
+                        metavar='N', help="máximo de sessões reabertas por minuto")
+    parser.add_argument('--at', metavar='HORA',
+                        help="abrir as sessões em about:blank e navegar todas juntas neste horário do servidor "
+                             "(HH:MM, HH:MM:SS.fff ou +segundos)")
+    parser.add_argument('--snapshot', action='store_true',
+                        help="salvar periodicamente cookies, storage e URL das sessões para --restore")
+    parser.add_argument('--restore', action='store_true',
+                        help="reabrir a última execução salva com --snapshot, com o estado de cada sessão "
+                             "(ignora as URLs e opções informadas)")
+    parser.add_argument('--metrics', metavar='ARQUIVO',
+                        help="exportar as medições por sessão ao final (.csv ou .jsonl)")
+    args = parser.parse_args(argv)
+    if not args.urls and not args.restore:
+        parser.error("informe ao menos uma URL")
+    try:
+        fire_at = parse_fire_time(args.at or '')
+    except ValueError as e:
+        parser.error(str(e))
+
+    def listener(event, data):
+        if event == 'status':
+            print(f"[{time.strftime('%H:%M:%S')}] {data['message']}", flush=True)
+
+    manager = SessionManager(listener=listener)
+    if args.grid:
+        manager.set_driver_factory(GridBackend(args.grid, max_sessions_per_node=args.grid_max))
+    try:
+        if args.restore:
+            manager.restore(watch=False)
+        else:
+            manager.launch(' '.join(args.urls), args.sessions, auto_close=not args.keep_others,
+                           incognito=args.incognito, auto_arrange=not args.no_arrange, headless=args.headless,
+                           profile=args.profile, use_template=args.template, event_detection=not args.polling,
+                           watch=False, rules='\n'.join(args.rule or []),
+                           governor=None if args.no_governor else {
+                               name: getattr(args, name) for name in GOVERNOR_LIMITS},
+                           supervisor=None if args.no_supervisor else {
+                               'max_failures': args.max_failures, 'restarts_per_minute': args.restarts_per_minute},
+                           fire_at=fire_at, snapshot=args.snapshot)
+        if manager.drivers or (manager.supervisor is not None and manager.supervisor.pending()):
+            manager.watch()
+            # Manter a janela que passou aberta até o usuário encerrar
+            while manager.drivers:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        clean, killed = manager.shutdown()
+        print(f"Sessões fechadas: {clean} normalmente, {killed} à força")
+        if args.grid:
+            manager.driver_factory.close()
+        if args.metrics:
+            manager.metrics.export(args.metrics)
+            print(f"Medições salvas em {args.metrics}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Relatório do tempo de abertura do Multi Chrome Tester (multi_chrome_tester.py --profile-startup).
+
+Mede o tempo de cada import, como `python -X importtime`, mas funcionando também no executável
+empacotado, e os marcos da inicialização (janela criada, primeira pintura, selenium carregado).
+Sem install() as funções não fazem nada.
+"""
+import builtins
+import importlib.util
+import os
+import sys
+import tempfile
+import threading
+import time
+
+_original_import = builtins.__import__
+_installed_at = None  # perf_counter de install()
+_installed_wall = None  # time.time() de install(), para comparar com a criação do processo
+_imports = {}  # módulo -> [tempo total, tempo próprio] em segundos
+_marks = []  # (marco, segundos desde install())
+_local = threading.local()  # Pilha de imports em andamento, por thread
+_lock = threading.Lock()
+
+def install():
+    """Começa a medir; deve ser chamado antes dos imports que se quer medir"""
+    global _installed_at, _installed_wall
+    if _installed_at is None:
+        _installed_at = time.perf_counter()
+        _installed_wall = time.time()
+        builtins.__import__ = _timed_import
+
+def enabled():
+    return _installed_at is not None
+
+def mark(name):
+    """Registra um marco da inicialização"""
+    if _installed_at is not None:
+        with _lock:
+            _marks.append((name, time.perf_counter() - _installed_at))
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    full_name = name
+    if level:
+        try:
+            full_name = importlib.util.resolve_name('.' * level + name, (globals or {}).get('__package__'))
+        except (ImportError, ValueError):
+            pass
+    if full_name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(0.0)  # Tempo gasto nos imports feitos por este
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - started
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with _lock:
+            entry = _imports.setdefault(full_name, [0.0, 0.0])
+            entry[0] += elapsed
+            entry[1] += elapsed - children
+
+def report(top=15):
+    """Texto do relatório: marcos, pacotes pelo tempo próprio somado e módulos pelo tempo total"""
+    if _installed_at is None:
+        return ""
+    with _lock:
+        marks = list(_marks)
+        imports = dict(_imports)
+
+    lines = ["Abertura do programa (ms desde o início da medição):"]
+    try:
+        import psutil
+        # No executável onefile, inclui a descompactação dos arquivos antes do Python começar
+        before = (_installed_wall - psutil.Process().create_time()) * 1000
+        lines.append(f"  {'antes do Python (processo, descompactação)':<45} {before:>8.0f}")
+    except Exception:
+        pass
+    for name, elapsed in marks:
+        lines.append(f"  {name:<45} {elapsed * 1000:>8.0f}")
+
+    packages = {}
+    for module, (_, own) in imports.items():
+        package = module.split('.')[0]
+        packages[package] = packages.get(package, 0) + own
+    lines.append("")
+    lines.append(f"Pacotes que mais demoraram para importar ({len(imports)} módulos medidos):")
+    for package, own in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"  {package:<45} {own * 1000:>8.1f}")
+
+    lines.append("")
+    lines.append("Imports mais lentos (tempo total, incluindo os módulos que eles importam):")
+    for module, (total, _) in sorted(imports.items(), key=lambda item: -item[1][0])[:top]:
+        lines.append(f"  {module:<45} {total * 1000:>8.1f}")
+    return '\n'.join(lines)
+
+def print_report(top=15):
+    """Imprime o relatório; no executável sem console, grava num arquivo na pasta temporária"""
+    text = report(top)
+    if not text:
+        return
+    if sys.stdout is not None:
+        print(text, flush=True)
+    else:
+        path = os.path.join(tempfile.gettempdir(), 'multi_chrome_tester_startup.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')